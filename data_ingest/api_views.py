@@ -7,6 +7,7 @@ from .authentication import TokenAuthenticationWithLogging
 from .parsers import CsvParser
 from .permissions import IsAuthenticatedWithLogging
 from .serializers import UploadSerializer
+from .validators.preview import PREVIEW_MODES
 
 import logging
 
@@ -33,6 +34,9 @@ class UploadViewSet(viewsets.ModelViewSet):
         any) will be marked as deleted.
         """
         upload = self.get_object()
+        if "preview" in (upload.validation_results or {}):
+            message = {"error": "validation of this upload is still in progress"}
+            return response.Response(message, status=status.HTTP_400_BAD_REQUEST)
         upload.status = "STAGED"
         upload.save()
         if upload.replaces:
@@ -83,8 +87,26 @@ class UploadViewSet(viewsets.ModelViewSet):
         Create a `upload_model_class`. Submitter id will be stored with
         this model. Validation errors, if any, will also be stored
         with this model. The object status is set to LOADING by default.
+
+        With the `preview` query parameter ("head", "sample", or "true" for
+        DATA_INGEST['PREVIEW_MODE']), and optionally `preview_rows`, only
+        part of the data is validated before responding; the full result
+        replaces it once every row has been checked.
         """
-        return self._process_upload_model_class(request)
+        preview = request.query_params.get("preview")
+        if preview is None or preview.lower() in ("0", "false"):
+            return self._process_upload_model_class(request)
+
+        mode = None if preview.lower() in ("1", "true") else preview
+        rows = request.query_params.get("preview_rows")
+        if mode not in (None,) + PREVIEW_MODES or (rows is not None and not rows.isdigit()):
+            message = {
+                "error": "preview should be true, head or sample, and preview_rows a number of rows"
+            }
+            return response.Response(message, status=status.HTTP_400_BAD_REQUEST)
+        return self._process_upload_model_class(
+            request, preview={"rows": int(rows) if rows else None, "mode": mode}
+        )
 
     def perform_destroy(self, instance):
         """
@@ -95,13 +117,15 @@ class UploadViewSet(viewsets.ModelViewSet):
         instance.save()
 
     def _process_upload_model_class(
-        self, request, existing_instance=None, replace=False
+        self, request, existing_instance=None, replace=False, preview=None
     ):
         """
         Process an `upload_model_class` instance by validating the request
         data. If `existing_instance` is given, it may be replaced
         in-place (if `replace` is True) or saved as a previous
         instance of the `upload_model_class` (if `replace` is False).
+        If `preview` (arguments for `preview_validators_to`) is given,
+        only a preview is validated before returning.
         """
         data = request.data.copy() or {}
         data["raw"] = request.data
@@ -135,12 +159,28 @@ class UploadViewSet(viewsets.ModelViewSet):
         try:
             # note that we use the original request.data here, since
             # the serializer instance is augmented with other derived fields
-            result = ingestors.apply_validators_to(request.data, request.content_type)
-            instance.validation_results = result
+            # results of unchanged rows are reused from the upload being replaced
+            previous = existing_instance.row_hashes if existing_instance else None
+            row_results = ingestors.RowResults(previous)
+            if preview is None:
+                result = ingestors.apply_validators_to(
+                    request.data, request.content_type, row_results=row_results
+                )
+            else:
+                result = ingestors.preview_validators_to(
+                    request.data, request.content_type, row_results=row_results, **preview
+                )
+            if "preview" not in result:
+                instance.row_hashes = row_results.recorded
+            instance.validation_results = ingest_settings.ingestor_class(instance).stored_results(result)
             instance.status = "LOADING"
             if existing_instance and not replace:
                 instance.replaces = existing_instance
             instance.save()
+            if "preview" in result:
+                ingestors.continue_validation(
+                    instance, request.data, request.content_type, previous
+                )
         except AttributeError:
             message = {"error": "unexpected input"}
             return response.Response(message, status=status.HTTP_400_BAD_REQUEST)
@@ -170,7 +210,22 @@ def validate(request):
 
     Received JSON objects are converted to tabular format wherein all
     observed keys are considered headers/columns.
+
+    An optional `max_errors` query parameter overrides DATA_INGEST['MAX_ERRORS']
+    for this request; validation stops once that many errors are found.
     """
-    result = ingestors.apply_validators_to(request.data, request.content_type)
+    max_errors = request.query_params.get("max_errors")
+    if max_errors is not None:
+        try:
+            max_errors = int(max_errors)
+            if max_errors < 0:
+                raise ValueError
+        except ValueError:
+            message = {"error": "max_errors should be a non-negative integer"}
+            return response.Response(message, status=status.HTTP_400_BAD_REQUEST)
+
+    result = ingestors.apply_validators_to(
+        request.data, request.content_type, max_errors=max_errors
+    )
 
-    return response.Response(result)
+    return response.Response(ingestors.ValidatorOutput.rendered(result))
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.core.exceptions import ImproperlyConfigured
 from .signals import setup_signals
 
 
@@ -7,3 +8,27 @@ class IngestConfig(AppConfig):
 
     def ready(self):
         setup_signals()
+        check_optional_dependencies()
+        prefetch_remote_validators()
+
+
+def check_optional_dependencies():
+    """Fail at startup, rather than at the first upload, if a setting needs a package that isn't installed"""
+    from .ingest_settings import UPLOAD_SETTINGS
+    from .validators.jsonlogic_vector import numpy
+
+    if UPLOAD_SETTINGS['VECTORIZE_JSONLOGIC'] and numpy is None:
+        raise ImproperlyConfigured("DATA_INGEST['VECTORIZE_JSONLOGIC'] requires numpy (`pip install ReVal[numpy]`)")
+
+
+def prefetch_remote_validators():
+    """Download rule files and schemas configured by URL at startup, all at once"""
+    from .ingest_settings import UPLOAD_SETTINGS
+    from .validators.validator import Validator
+    from .validators.remote import remote_cache
+
+    if UPLOAD_SETTINGS['REMOTE_PREFETCH']:
+        remote_cache.prefetch(
+            filename for filename in UPLOAD_SETTINGS['VALIDATORS']
+            if filename and Validator.url_pattern.search(filename)
+        )
@@ -18,6 +18,30 @@ DEFAULT_UPLOAD_SETTINGS = {
     'VALIDATORS': {
         None: 'data_ingest.ingestors.GoodtablesValidator',
     },
+    'REMOTE_CACHE_DIR': None,
+    'REMOTE_CACHE_TTL': 300,
+    'REMOTE_TIMEOUT': 10,
+    'REMOTE_POOL_SIZE': 4,
+    'REMOTE_PREFETCH': False,
+    'VALIDATION_EXECUTOR': None,
+    'VALIDATION_WORKERS': None,
+    'ROWWISE_WORKERS': None,
+    'ROWWISE_MIN_SHARD_ROWS': 10000,
+    'VECTORIZE_JSONLOGIC': False,
+    'SQL_SET_BASED': False,
+    'CAST_BY_SCHEMA': False,
+    'MAX_ERRORS': None,
+    'LAZY_ERROR_MESSAGES': False,
+    'COMPACT_VALIDATION_RESULTS': False,
+    'OMIT_ROW_DATA': False,
+    'PREVIEW': False,
+    'PREVIEW_ROWS': 100,
+    'PREVIEW_MODE': 'head',
+    'PREVIEW_BACKGROUND': True,
+    'RESULT_CACHE': None,
+    'RESULT_CACHE_SIZE': 128,
+    'RESULT_CACHE_DIR': None,
+    'RESULT_CACHE_ALIAS': 'default',
 }
 
 UPLOAD_SETTINGS = dict(DEFAULT_UPLOAD_SETTINGS)
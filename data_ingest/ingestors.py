@@ -3,13 +3,17 @@ import csv
 import json
 import logging
 import os.path
+import threading
 import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 import tabulator
 import yaml
 from django.conf import settings
 from django.core import exceptions, files
+from django.db import connection, transaction
 from django.utils.module_loading import import_string
 
 # forward imports
@@ -17,12 +21,102 @@ from .validators.goodtables import GoodtablesValidator  # noqa: F401
 from .validators.rowwise import RowwiseValidator  # noqa: F401
 from .validators.json import JsonlogicValidator, JsonlogicValidatorFailureConditions, JsonschemaValidator  # noqa: F401
 from .validators.sql import SqlValidator, SqlValidatorFailureConditions  # noqa: F401
-from .validators.validator import ValidatorOutput, UnsupportedContentTypeException, apply_validators_to  # noqa: F401
+from .validators.validator import (  # noqa: F401
+    ParsedTable,
+    RowResults,
+    ValidatorOutput,
+    UnsupportedContentTypeException,
+    apply_validators_to,
+)
+from .validators.result_cache import source_digest
+from .validators.streaming import ValidationStream, stream_validators_to  # noqa: F401
+from .validators.preview import preview_validators_to  # noqa: F401
 
 from .ingest_settings import UPLOAD_SETTINGS
 
 logger = logging.getLogger(__name__)
 
+_preview_executor = None
+_preview_executor_lock = threading.Lock()
+
+# parsed rows of the uploads read most recently, to show their results without parsing them again
+PARSED_ROWS_CACHE_SIZE = 4
+_parsed_rows = OrderedDict()
+_parsed_rows_lock = threading.Lock()
+
+
+def parsed_rows(source, content_type):
+    """
+    Rows of a source by row number, as validated (see `ParsedTable.rows`)
+
+    The rows of the last few sources are kept, keyed by a hash of the source, since the same upload's
+    results are usually read several times in a row.
+    """
+    key = source_digest(source, content_type)
+    with _parsed_rows_lock:
+        if key in _parsed_rows:
+            _parsed_rows.move_to_end(key)
+            return _parsed_rows[key]
+    rows = ParsedTable(source, content_type).rows
+    if key is not None:
+        with _parsed_rows_lock:
+            _parsed_rows[key] = rows
+            while len(_parsed_rows) > PARSED_ROWS_CACHE_SIZE:
+                _parsed_rows.popitem(last=False)
+    return rows
+
+
+def complete_validation(upload_class, pk, source, content_type, previous=None, omit_data=False):
+    """Replace an upload's preview result with the result of validating every row"""
+    try:
+        row_results = RowResults(previous)
+        result = apply_validators_to(source, content_type, row_results=row_results)
+        upload_class.objects.filter(pk=pk).update(
+            validation_results=ValidatorOutput.stored(result, omit_data), row_hashes=row_results.recorded
+        )
+    except Exception as e:
+        logger.exception(f"Unable to complete validation of upload {pk}")
+        # replace the preview anyway, so the upload isn't left waiting for a result that won't come; it is
+        # invalid, so it can be replaced and validated again
+        output = ValidatorOutput([])
+        output.add_whole_table_error(
+            "Error", "validation-error", f"Unable to validate every row: {type(e).__name__}: {e}", []
+        )
+        try:
+            upload_class.objects.filter(pk=pk).update(validation_results=output.get_output())
+        except Exception:
+            logger.exception(f"Unable to save the failed validation of upload {pk}")
+
+
+def continue_validation(upload, source, content_type, previous=None):
+    """
+    Once the preview result of `upload` is saved, validate the whole source and save that result instead
+
+    With UPLOAD_SETTINGS['PREVIEW_BACKGROUND'], this happens in a background thread, so that the preview
+    can be shown right away; otherwise it happens as soon as the current transaction is committed.
+    `previous` is the `row_hashes` of an upload that this one replaces.
+    """
+    args = (type(upload), upload.pk, source, content_type, previous, upload.raw is not None)
+
+    def run_in_background():
+        try:
+            complete_validation(*args)
+        finally:
+            # this thread's own database connection
+            connection.close()
+
+    def schedule():
+        global _preview_executor
+        if UPLOAD_SETTINGS['PREVIEW_BACKGROUND']:
+            with _preview_executor_lock:
+                if _preview_executor is None:
+                    _preview_executor = ThreadPoolExecutor(thread_name_prefix='data_ingest_validation')
+            _preview_executor.submit(run_in_background)
+        else:
+            complete_validation(*args)
+
+    transaction.on_commit(schedule)
+
 
 class Ingestor:
     """The default ingestor assumes that the data source is already rectangular"""
@@ -63,20 +157,76 @@ class Ingestor:
 
         return stream
 
-    def validate(self):
-        source = self.source()
-        content_type = None
+    def content_type(self, source):
         if source['format'] == 'csv':
-            content_type = 'text/csv'
+            return 'text/csv'
         elif source['format'] == 'json':
-            content_type = 'application/json'
+            return 'application/json'
         else:
             # @TODO: This will need to be revisited.
             # Right now pulling the file extension instead of actual ContentType as seen in header.  This will be
             # passed into each validator's validate method and causes an UnsupportedContentTypeException
-            content_type = source['format']
+            return source['format']
+
+    def previous_row_hashes(self):
+        """Recorded row results of the upload this one replaces, if any"""
+        if self.upload.replaces_id is None:
+            return None
+        return self.upload.replaces.row_hashes
 
-        return apply_validators_to(self.source(), content_type)
+    def validate(self):
+        """
+        Validate the upload, and set its `row_hashes` so that an upload replacing it can be validated
+        incrementally.  Errors of row-wise validators are reused for rows that did not change since
+        the upload it replaces.
+        """
+        source = self.source()
+        row_results = RowResults(self.previous_row_hashes())
+        result = apply_validators_to(source, self.content_type(source), row_results=row_results)
+        self.upload.row_hashes = row_results.recorded
+        return result
+
+    def stored_results(self, result):
+        """
+        `result` as it should be saved to the upload (see `ValidatorOutput.stored`); row data can be left out
+        if the upload keeps its `raw` source to read it from again
+        """
+        return ValidatorOutput.stored(result, omit_data=self.upload.raw is not None)
+
+    def rows(self):
+        """Rows of the upload by row number, read from `raw` again as they were validated"""
+        source = self.source()
+        if isinstance(source['source'], memoryview):
+            source['source'] = bytes(source['source'])
+        return parsed_rows(source, self.content_type(source))
+
+    def results(self):
+        """The upload's validation results in the full format, with row data read from `raw` if it was left out"""
+        results = self.upload.validation_results
+        return ValidatorOutput.expanded(results, None if ValidatorOutput.has_row_data(results) else self.rows())
+
+    def validate_preview(self, rows=None, mode=None):
+        """
+        Like `validate`, but only checks the first rows, or a sample of the rows (see `preview_validators_to`).
+        A provisional result has a `preview` item; `continue_validation` replaces it with the full result.
+        A final one sets `row_hashes`, as `validate` does.
+        """
+        source = self.source()
+        row_results = RowResults(self.previous_row_hashes())
+        result = preview_validators_to(source, self.content_type(source), rows, mode, row_results=row_results)
+        if "preview" not in result:
+            self.upload.row_hashes = row_results.recorded
+        return result
+
+    def validate_stream(self, max_errors=None):
+        """
+        Like `validate`, but returns a ValidationStream that yields each row's result as it is validated,
+        so that large uploads can be validated without building the whole result in memory.
+
+        :param max_errors: stop checking rows after this many errors; defaults to UPLOAD_SETTINGS['MAX_ERRORS']
+        """
+        source = self.source()
+        return stream_validators_to(source, self.content_type(source), max_errors)
 
     def meta_named(self, core_name):
 
@@ -86,7 +236,9 @@ class Ingestor:
     def data(self):
         """Combines row data and file metadata from validation results"""
 
-        t0 = self.upload.validation_results['tables'][0]
+        results = self.upload.validation_results
+        t0 = results['tables'][0]
+        rows = None if ValidatorOutput.has_row_data(results) else self.rows()
         result = {
             self.meta_named(k): v
             for (k, v) in self.upload.file_metadata.items()
@@ -95,7 +247,7 @@ class Ingestor:
             self.meta_named('row_number'): r['row_number'],
             self.meta_named('upload_id'): self.upload.id,
             **r['data']
-        } for r in t0['rows'] if not r['errors']]
+        } for r in ValidatorOutput.table_rows(t0, rows) if not r['errors']]
         return result
 
     def flattened_data(self):
@@ -0,0 +1,19 @@
+# Generated by Django 2.2 on 2026-10-17 05:10
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingest', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='defaultupload',
+            name='row_hashes',
+            field=django.contrib.postgres.fields.jsonb.JSONField(null=True),
+        ),
+    ]
@@ -36,6 +36,8 @@ class Upload(models.Model):
     file = models.FileField()
     raw = models.BinaryField(null=True)
     validation_results = JSONField(null=True)
+    # errors of row-wise validators by row content, to re-validate replacements of this upload quickly
+    row_hashes = JSONField(null=True)
     status = models.CharField(
         max_length=10,
         choices=STATUS_CHOICES,
@@ -1,5 +1,6 @@
 from . import ingest_settings
 from rest_framework import serializers
+from .validators.validator import ValidatorOutput
 
 
 class UploadSerializer(serializers.ModelSerializer):
@@ -16,3 +17,12 @@ class UploadSerializer(serializers.ModelSerializer):
             'file_metadata',
             'validation_results',
         )
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        # API clients get results in the full format, with deferred error messages rendered
+        if representation.get('validation_results'):
+            representation['validation_results'] = ValidatorOutput.rendered(
+                ingest_settings.ingestor_class(instance).results()
+            )
+        return representation
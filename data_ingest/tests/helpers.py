@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from data_ingest.validators.validator import UPLOAD_SETTINGS
+
+GOODTABLES = "data_ingest.ingestors.GoodtablesValidator"
+JSONLOGIC = "data_ingest.ingestors.JsonlogicValidator"
+JSONSCHEMA = "data_ingest.ingestors.JsonschemaValidator"
+
+# The rule most tests validate budgets with: a row may not spend more than its budget
+BUDGET_RULE = {
+    "code": {"<=": [{"var": "dollars_spent"}, {"var": "dollars_budgeted"}]},
+    "message": "spent {dollars_spent}",
+    "columns": ["dollars_spent", "dollars_budgeted"],
+}
+
+
+def write_rules(filename, rules, mtime=None):
+    """Write rules to a rule file, and set its modification time if `mtime` is given"""
+    with open(filename, "w") as outfile:
+        json.dump(rules, outfile)
+    if mtime:
+        os.utime(filename, (mtime, mtime))
+
+
+class RuleFileMixin:
+    """
+    For test cases that validate with rule files of their own; files and settings are cleaned up after each test
+    """
+
+    def make_rule_file(self, rules=None, suffix=".json"):
+        """Write rules (by default, BUDGET_RULE) to a temporary file, and return its name"""
+        handle, filename = tempfile.mkstemp(suffix=suffix)
+        os.close(handle)
+        self.addCleanup(os.remove, filename)
+        write_rules(filename, [BUDGET_RULE] if rules is None else rules)
+        return filename
+
+    def use_validators(self, validators, **settings):
+        """Use `validators` as UPLOAD_SETTINGS['VALIDATORS'], along with any other settings, until the test ends"""
+        patcher = patch.dict(UPLOAD_SETTINGS, dict({"VALIDATORS": validators}, **settings))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def use_budget_rules(self, rules=None, **settings):
+        """
+        Validate with the Table Schema and a JsonlogicValidator of `rules` (by default, BUDGET_RULE)
+
+        Returns:
+        the name of the rule file
+        """
+        rule_file = self.make_rule_file(rules)
+        self.use_validators({None: GOODTABLES, rule_file: JSONLOGIC}, **settings)
+        return rule_file
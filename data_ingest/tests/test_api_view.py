@@ -3,11 +3,15 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from ..ingest_settings import UPLOAD_SETTINGS
+from ..ingestors import apply_validators_to
+from ..validators.validator import DeferredMessage, ValidatorOutput
 from ..models import DefaultUpload
 from ..api_views import UploadViewSet
 from ..urls import router
 
 import json
+from unittest.mock import patch
 
 
 User = get_user_model()
@@ -55,6 +59,106 @@ class ApiValidateTests(APITestCase):
         response = self.client.post(url, data, content_type="application/json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_api_validate_max_errors(self):
+        """
+        Ensure validation can be limited to a number of errors per request.
+        """
+        url = reverse("validate") + "?max_errors=1"
+        data = "a,b\n,\n,\n"
+        token = "this1s@t0k3n"
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token)
+        response = self.client.post(url, data, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["truncated"])
+
+        response = self.client.post(
+            reverse("validate") + "?max_errors=lots", data, content_type="text/csv"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_renders_deferred_messages(self):
+        """
+        Ensure API clients get error messages, even when they are stored unrendered.
+        """
+        output = ValidatorOutput({2: {"a": "1"}}, headers=["a"])
+        output.add_row_error(2, "Error", "code", DeferredMessage("a is {a}", {"a": "1"}), ["a"])
+        output = output.get_output()
+        self.assertNotIn("message", output["tables"][0]["rows"][0]["errors"][0])
+        expected = {"severity": "Error", "code": "code", "message": "a is 1", "fields": ["a"]}
+
+        token = "this1s@t0k3n"
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token)
+        with patch("data_ingest.ingestors.apply_validators_to", return_value=output):
+            response = self.client.post(reverse("validate"), "a\n1\n", content_type="text/csv")
+        self.assertEqual(response.json()["tables"][0]["rows"][0]["errors"], [expected])
+
+        instance = self.create_instance()
+        instance.validation_results = output
+        instance.save()
+        response = self.client.get(self.get_url("detail", [instance.id]))
+        self.assertEqual(response.json()["validation_results"]["tables"][0]["rows"][0]["errors"], [expected])
+
+        # results stored in the compact format are given in the full format
+        instance.validation_results = ValidatorOutput.compact(output)
+        instance.save()
+        response = self.client.get(self.get_url("detail", [instance.id]))
+        self.assertEqual(response.json()["validation_results"]["tables"][0]["rows"][0]["errors"], [expected])
+        self.assertNotIn("version", response.json()["validation_results"])
+
+    def test_api_create_preview(self):
+        """
+        Create an upload with a preview result, which is replaced by the full result.
+        """
+        url = self.get_url("list") + "?preview=head&preview_rows=2"
+        data = b"Name,Title\nGuido,BDFL\nTony,Engineer\n,\n"
+        token = "this1s@t0k3n"
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token)
+        with patch.dict(UPLOAD_SETTINGS, {"PREVIEW_BACKGROUND": False}), patch(
+            "django.db.transaction.on_commit", side_effect=lambda func: func()
+        ), patch("data_ingest.ingestors.apply_validators_to", wraps=apply_validators_to) as full:
+            response = self.client.post(url, data, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = json.loads(response.content)["validation_results"]
+        self.assertEqual(result["preview"], {"mode": "head", "rows": 2, "total_rows": None})
+        self.assertTrue(result["valid"])
+        self.assertEqual(len(result["tables"][0]["rows"]), 2)
+
+        full.assert_called_once()
+        upload = DefaultUpload.objects.get(pk=json.loads(response.content)["id"])
+        self.assertNotIn("preview", upload.validation_results)
+        self.assertFalse(upload.validation_results["valid"])
+
+        # an upload can't be staged before all of it is validated
+        response = self.client.post(url, data, content_type="text/csv")
+        stage_url = self.get_url("stage", args=[json.loads(response.content)["id"]])
+        response = self.client.post(stage_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        url = self.get_url("list") + "?preview=everything"
+        response = self.client.post(url, data, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_create_preview_failed(self):
+        """
+        If the full validation fails, the preview result is replaced by an error, so the upload isn't stuck.
+        """
+        url = self.get_url("list") + "?preview=head&preview_rows=2"
+        data = b"Name,Title\nGuido,BDFL\nTony,Engineer\n,\n"
+        self.client.credentials(HTTP_AUTHORIZATION="Token this1s@t0k3n")
+        with patch.dict(UPLOAD_SETTINGS, {"PREVIEW_BACKGROUND": False}), patch(
+            "django.db.transaction.on_commit", side_effect=lambda func: func()
+        ), patch("data_ingest.ingestors.apply_validators_to", side_effect=MemoryError("out of memory")):
+            response = self.client.post(url, data, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        upload = DefaultUpload.objects.get(pk=json.loads(response.content)["id"])
+        self.assertNotIn("preview", upload.validation_results)
+        self.assertFalse(upload.validation_results["valid"])
+        self.assertEqual(
+            upload.validation_results["tables"][0]["whole_table_errors"][0]["message"],
+            "Unable to validate every row: MemoryError: out of memory",
+        )
+
     def test_api_delete_instance(self):
         """
         Soft delete an instance.
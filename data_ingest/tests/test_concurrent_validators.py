@@ -0,0 +1,107 @@
+import threading
+import time
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.ingestors import apply_validators_to
+from data_ingest.validators import validator as validator_module
+from data_ingest.validators.validator import UPLOAD_SETTINGS, Validator, ValidatorRegistry, registry
+from .helpers import GOODTABLES, JSONLOGIC, RuleFileMixin
+
+
+class BrokenValidator(Validator):
+    def load_file(self):
+        return []
+
+    def validate(self, source, content_type):
+        raise ValueError("broken")
+
+
+class TestConcurrentValidators(RuleFileMixin, SimpleTestCase):
+
+    source = {
+        "source": b"category,dollars_budgeted,dollars_spent\npencils,1,500\npens,20,10\n,,\n",
+        "format": "csv",
+        "headers": 1,
+    }
+
+    def setUp(self):
+        sql = self.make_rule_file(
+            [{"code": "category != 'pens'", "message": "no pens", "columns": ["category"]}]
+        )
+        self.validators = {
+            None: GOODTABLES,
+            self.make_rule_file(): JSONLOGIC,
+            sql: "data_ingest.ingestors.SqlValidator",
+        }
+
+    def settings(self, validators, executor):
+        return patch.dict(
+            UPLOAD_SETTINGS,
+            {"VALIDATORS": validators, "VALIDATION_EXECUTOR": executor, "VALIDATION_WORKERS": 2},
+        )
+
+    def test_same_result_as_sequential(self):
+        with self.settings(self.validators, None):
+            expected = apply_validators_to(self.source, "text/csv")
+        self.assertFalse(expected["valid"])
+        self.assertEqual(expected["tables"][0]["invalid_row_count"], 3)
+
+        for executor in ("thread", "process"):
+            with self.settings(self.validators, executor):
+                self.assertEqual(apply_validators_to(self.source, "text/csv"), expected)
+
+    def test_failing_validator_is_isolated(self):
+        validators = dict(self.validators)
+        validators["broken"] = "data_ingest.tests.test_concurrent_validators.BrokenValidator"
+
+        with self.settings(self.validators, None):
+            expected = apply_validators_to(self.source, "text/csv")
+        with self.settings(validators, "thread"):
+            result = apply_validators_to(self.source, "text/csv")
+
+        self.assertEqual(result["tables"][0]["rows"], expected["tables"][0]["rows"])
+        self.assertEqual(
+            result["tables"][0]["whole_table_errors"],
+            [
+                {
+                    "severity": "Error",
+                    "code": "validator-error",
+                    "message": "data_ingest.tests.test_concurrent_validators.BrokenValidator: ValueError: broken",
+                    "fields": [],
+                }
+            ],
+        )
+
+    def test_rules_loaded_once(self):
+        registry.clear()
+        with self.settings(self.validators, "thread"):
+            with patch.object(ValidatorRegistry, "build", wraps=ValidatorRegistry.build) as build:
+                # the set that validating one validator after another, and the result cache, use
+                validator_set = registry.validators(self.validators)
+                apply_validators_to(self.source, "text/csv")
+                apply_validators_to(self.source, "text/csv")
+        self.assertIs(registry.validators(self.validators), validator_set)
+        self.assertEqual(build.call_count, len(self.validators))
+
+    def test_one_pool_per_setting(self):
+        def slow_pool(max_workers):
+            time.sleep(0.05)
+            return object()
+
+        pools = []
+        self.addCleanup(validator_module._executors.pop, ("thread", 99), None)
+        with patch.object(validator_module, "ThreadPoolExecutor", side_effect=slow_pool) as pool_class:
+            threads = [
+                threading.Thread(target=lambda: pools.append(validator_module.executor("thread", 99)))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(pool_class.call_count, 1)
+        self.assertEqual(len({id(pool) for pool in pools}), 1)
@@ -1,3 +1,4 @@
+import goodtables
 from django.test import SimpleTestCase
 from unittest.mock import patch, mock_open
 from json import dumps
@@ -9,6 +10,7 @@ from data_ingest.ingestors import (
     GoodtablesValidator,
     UnsupportedContentTypeException,
 )
+from data_ingest.validators.validator import ParsedTable
 
 
 class TestGoodtablesValidator(SimpleTestCase):
@@ -46,3 +48,18 @@ class TestGoodtablesValidator(SimpleTestCase):
         self.assertEqual(len(messages), 2)
         self.assertEqual(messages[0], "There is an extra header in column 4 (extra1)")
         self.assertEqual(messages[1], "There is an extra header in column 5 (extra2)")
+
+    @patch("builtins.open", new_callable=mock_open, read_data=csv_rule)
+    def test_formatted_from_source(self, mock_file):
+        gtv = GoodtablesValidator("GoodtablesValidator", "mocked_filename.csv")
+        data = {
+            "source": b"category,dollars_budgeted,dollars_spent\npencils,1,500\n,,\n",
+            "format": "csv",
+            "headers": 1,
+        }
+        table = ParsedTable(data, "text/csv")
+        unformatted = goodtables.validate(**gtv.validate_params(table.data))
+
+        # the source in tabulator form, as `formatted` took it before ParsedTable
+        self.assertEqual(gtv.formatted(table.data, unformatted), gtv.formatted(table, unformatted))
+        self.assertEqual(gtv.formatted(table, unformatted), gtv.validate(data, "text/csv"))
@@ -0,0 +1,103 @@
+import os
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.ingestors import JsonlogicValidator, RowResults, apply_validators_to
+from data_ingest.validators.validator import UPLOAD_SETTINGS, registry
+from .helpers import BUDGET_RULE, GOODTABLES, JSONLOGIC, RuleFileMixin, write_rules
+
+
+class TestRowResults(RuleFileMixin, SimpleTestCase):
+
+    csv = b"category,dollars_budgeted,dollars_spent\npencils,1,5\npens,2,2\nclips,5,9\n,,\n"
+
+    def setUp(self):
+        self.rule_file = self.use_budget_rules()
+
+    def write_rules(self, message, mtime=None):
+        write_rules(self.rule_file, [dict(BUDGET_RULE, message=message)], mtime)
+
+    def source(self, csv):
+        return {"source": csv, "format": "csv", "headers": 1}
+
+    def validate(self, csv, previous=None):
+        row_results = RowResults(previous)
+        with patch.object(
+            JsonlogicValidator, "evaluate", autospec=True, side_effect=JsonlogicValidator.evaluate
+        ) as evaluate:
+            result = apply_validators_to(self.source(csv), "text/csv", row_results=row_results)
+        return (result, row_results, evaluate.call_count)
+
+    def test_only_changed_rows_are_evaluated(self):
+        (result, row_results, evaluated) = self.validate(self.csv)
+        self.assertEqual(evaluated, 4)
+        self.assertEqual(len(row_results.recorded["rows"]), 4)
+
+        # one row fixed, one row added, rows moved around
+        changed = b"category,dollars_budgeted,dollars_spent\n,,\npencils,5,5\npens,2,2\nclips,5,9\nink,1,1\n"
+        (result, again, evaluated) = self.validate(changed, row_results.recorded)
+        self.assertEqual(evaluated, 2)
+        self.assertEqual(again.reused, 3)
+        self.assertEqual(result, apply_validators_to(self.source(changed), "text/csv"))
+
+    def test_changed_rules_are_evaluated_again(self):
+        (result, row_results, evaluated) = self.validate(self.csv)
+        self.write_rules("overspent {dollars_spent}", mtime=os.stat(self.rule_file).st_mtime + 10)
+
+        (result, again, evaluated) = self.validate(self.csv, row_results.recorded)
+        self.assertEqual(evaluated, 4)
+        self.assertEqual(again.reused, 0)
+        self.assertEqual(result["tables"][0]["rows"][0]["errors"][0]["message"], "overspent 5")
+
+    def test_rules_are_compared_by_content(self):
+        (result, row_results, evaluated) = self.validate(self.csv)
+        stat = os.stat(self.rule_file)
+
+        # as on another host, or after a restart: the same rules with another mtime are reused
+        registry.clear()
+        self.write_rules("spent {dollars_spent}", mtime=stat.st_mtime + 10)
+        (result, again, evaluated) = self.validate(self.csv, row_results.recorded)
+        self.assertEqual(evaluated, 0)
+        self.assertEqual(again.reused, 4)
+
+        # while other rules of the same size and mtime are not
+        registry.clear()
+        self.write_rules("Spent {dollars_spent}", mtime=stat.st_mtime + 10)
+        self.assertEqual(os.stat(self.rule_file).st_size, stat.st_size)
+        (result, again, evaluated) = self.validate(self.csv, row_results.recorded)
+        self.assertEqual(evaluated, 4)
+        self.assertEqual(again.reused, 0)
+        self.assertEqual(result["tables"][0]["rows"][0]["errors"][0]["message"], "Spent 5")
+
+    def test_changed_settings_are_evaluated_again(self):
+        schema = {
+            "fields": [
+                {"name": "category", "type": "string"},
+                {"name": "dollars_budgeted", "type": "number"},
+                {"name": "dollars_spent", "type": "number"},
+            ]
+        }
+        schema_file = self.make_rule_file(schema)
+        self.use_validators({schema_file: GOODTABLES, self.rule_file: JSONLOGIC}, CAST_BY_SCHEMA=True)
+        (result, row_results, evaluated) = self.validate(self.csv)
+        (result, again, evaluated) = self.validate(self.csv, row_results.recorded)
+        self.assertEqual(again.reused, 4)
+
+        # the Table Schema casts values differently
+        schema["fields"][2]["type"] = "string"
+        write_rules(schema_file, schema, mtime=os.stat(schema_file).st_mtime + 10)
+        (result, again, evaluated) = self.validate(self.csv, row_results.recorded)
+        self.assertEqual(again.reused, 0)
+
+        # messages are rendered later
+        with patch.dict(UPLOAD_SETTINGS, {"LAZY_ERROR_MESSAGES": True}):
+            (result, lazy, evaluated) = self.validate(self.csv, again.recorded)
+        self.assertEqual(lazy.reused, 0)
+
+    def test_truncated_results_are_not_recorded(self):
+        row_results = RowResults()
+        apply_validators_to(self.source(self.csv), "text/csv", max_errors=1, row_results=row_results)
+        self.assertEqual(row_results.recorded["validators"], {})
@@ -1,10 +1,15 @@
 from collections import OrderedDict
 from django.test import SimpleTestCase
+from unittest.mock import patch, mock_open
+from json import dumps, loads
+import tracemalloc
+from types import SimpleNamespace
 
 # This ingest_settings file is imported because there was a weird order that this needs to be imported before
 # ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
 import data_ingest.ingest_settings
-from data_ingest.ingestors import ValidatorOutput
+from data_ingest.ingestors import Ingestor, ValidatorOutput, GoodtablesValidator, JsonlogicValidator
+from data_ingest.validators.validator import ParsedTable, Validator
 
 
 class TestValidationOutput(SimpleTestCase):
@@ -489,3 +494,177 @@ class TestValidationOutput(SimpleTestCase):
         }
         result1 = ValidatorOutput.combine(output3, output4)
         self.assertDictEqual(exp_result1, result1)
+
+    def test_error_records(self):
+        rows = OrderedDict((rn, {"a": str(rn)}) for rn in range(2, 10002))
+
+        def add_errors(output):
+            for rn in range(2, 10002, 2):
+                # equal messages that are not the same string, as rendered for each row
+                output.add_row_error(rn, "Error", "E1", " ".join(["not", "a", "number"]), ["a"])
+
+        # a micro-benchmark of the memory errors take until the output is generated
+        tracemalloc.start()
+        output = ValidatorOutput(rows, headers=["a"])
+        add_errors(output)
+        (records, _) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        tracemalloc.start()
+        dictionaries = [
+            {rn: [ValidatorOutput.create_error("Error", "E1", " ".join(["not", "a", "number"]), ["a"])]}
+            for rn in range(2, 10002, 2)
+        ]
+        (expected, _) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(records, expected / 2)
+
+        (first, second) = (output.error_records[2][0], output.error_records[4][0])
+        self.assertIs(first.message, second.message)
+        self.assertIs(first.fields, second.fields)
+        self.assertEqual(first, dictionaries[0][2][0])
+        self.assertEqual(output.row_errors[2], dictionaries[0][2])
+
+        result = output.get_output()
+        self.assertEqual(result["tables"][0]["rows"][0]["errors"], dictionaries[0][2])
+        self.assertIs(type(result["tables"][0]["rows"][0]["errors"][0]), dict)
+        table = result["tables"][0]
+        self.assertEqual((table["valid_row_count"], table["invalid_row_count"]), (5000, 5000))
+        self.assertEqual(output.invalid_rows[:4], bytearray([1, 0, 1, 0]))
+
+    def test_merge(self):
+        def output(row_numbers, errors):
+            result = ValidatorOutput(OrderedDict((rn, {"a": str(rn)}) for rn in row_numbers), headers=["a"])
+            for (rn, message) in errors:
+                result.add_row_error(rn, "Error", None, message, ["a"])
+            return result.get_output()
+
+        outputs = [
+            output([2, 3, 4], [(3, "first")]),
+            # a validator that failed, without any rows
+            ValidatorOutput([]).get_output(),
+            output([2, 3, 4], [(3, "second"), (4, "third")]),
+            # rows numbered differently
+            output([0, 1], [(1, "fourth")]),
+            {},
+        ]
+        result = ValidatorOutput.merge(outputs)
+        table = result["tables"][0]
+        self.assertEqual(table["headers"], ["a"])
+        self.assertEqual([row["row_number"] for row in table["rows"]], [0, 1, 2, 3, 4])
+        self.assertEqual(
+            [[error["message"] for error in row["errors"]] for row in table["rows"]],
+            [[], ["fourth"], [], ["first", "second"], ["third"]],
+        )
+        self.assertEqual((table["valid_row_count"], table["invalid_row_count"]), (2, 3))
+        self.assertFalse(result["valid"])
+
+        # the outputs are left as they were
+        self.assertEqual(len(outputs[0]["tables"][0]["rows"][1]["errors"]), 1)
+        self.assertEqual(ValidatorOutput.merge([]), {})
+        self.assertEqual(ValidatorOutput.combine(outputs[0], outputs[2]), ValidatorOutput.merge(outputs[:3]))
+
+    def test_compact(self):
+        headers = ["b", "a"]
+        rows = OrderedDict((rn, OrderedDict([("b", str(rn)), ("a", "x")])) for rn in [2, 3, 4, 6, 7])
+        output = ValidatorOutput(rows, headers=headers)
+        output.add_row_error(3, "Error", "E1", "bad", ["a"])
+        output.add_whole_table_error("Warning", "W1", "odd", [])
+        result = output.get_output()
+
+        # stored as JSON, which would not keep the order of keys
+        compact = loads(dumps(ValidatorOutput.compact(result)))
+        table = compact["tables"][0]
+        self.assertEqual(compact["version"], ValidatorOutput.COMPACT_VERSION)
+        self.assertNotIn("rows", table)
+        self.assertEqual(table["row_numbers"], [[2, 4], [6, 7]])
+        self.assertEqual(table["data"][1], ["3", "x"])
+        self.assertEqual(table["invalid_rows"], [{"row_number": 3, "errors": result["tables"][0]["rows"][1]["errors"]}])
+
+        self.assertEqual(ValidatorOutput.expanded(compact), result)
+        self.assertEqual(list(ValidatorOutput.expanded(compact)["tables"][0]["rows"][0]["data"]), headers)
+        self.assertIs(ValidatorOutput.expanded(result), result)
+        self.assertIs(ValidatorOutput.compact(compact), compact)
+
+        upload = SimpleNamespace(id=1, file_metadata={}, validation_results=compact)
+        self.assertEqual([row["row_number"] for row in Ingestor(upload).data()["rows"]], [2, 4, 6, 7])
+
+        # rows that aren't aligned with the headers, as validated by JSON Schema
+        output = ValidatorOutput([{"a": 1}, {"b": [2]}], headers=[])
+        output.add_row_error(1, "Error", "E1", "bad", [])
+        result = output.get_output()
+        compact = ValidatorOutput.compact(result)
+        self.assertFalse(compact["tables"][0]["aligned"])
+        self.assertEqual(ValidatorOutput.expanded(compact), result)
+
+    def test_omit_row_data(self):
+        raw = b"category,dollars_budgeted,dollars_spent\npencils,1,500\npens,20,10\n"
+        table = ParsedTable({"source": raw, "format": "csv", "headers": 1}, "text/csv")
+        output = ValidatorOutput(table.rows, headers=table.headers)
+        output.add_row_error(2, "Error", "E1", "overspent", ["dollars_spent"])
+        result = output.get_output()
+
+        upload = SimpleNamespace(id=1, file_metadata={}, file_type="csv", raw=raw, validation_results=None)
+        with patch.dict(data_ingest.ingest_settings.UPLOAD_SETTINGS, {"OMIT_ROW_DATA": True}):
+            stored = loads(dumps(Ingestor(upload).stored_results(result)))
+            kept = Ingestor(SimpleNamespace(raw=None)).stored_results(result)
+        self.assertNotIn("data", stored["tables"][0])
+        self.assertFalse(ValidatorOutput.has_row_data(stored))
+        self.assertIs(kept, result)
+        with self.assertRaises(ValueError):
+            ValidatorOutput.expanded(stored)
+
+        # as read from the database
+        upload.raw = memoryview(raw)
+        upload.validation_results = stored
+        data_ingest.ingestors._parsed_rows.clear()
+        with patch("data_ingest.ingestors.ParsedTable", wraps=ParsedTable) as parse:
+            self.assertEqual(Ingestor(upload).results(), result)
+            self.assertEqual([row["row_number"] for row in Ingestor(upload).data()["rows"]], [3])
+        # parsed only once
+        self.assertEqual(parse.call_count, 1)
+
+        # without the setting, row data is always kept
+        self.assertIs(Ingestor(upload).stored_results(result), result)
+
+
+class TestParsedTable(SimpleTestCase):
+
+    source = {
+        "source": b"category,dollars_budgeted,dollars_spent\npencils,1,500\npens,20,10\n",
+        "format": "csv",
+        "headers": 1,
+    }
+
+    def test_headers_and_rows(self):
+        table = ParsedTable(self.source, "text/csv")
+        self.assertEqual(table.headers, ["category", "dollars_budgeted", "dollars_spent"])
+        self.assertEqual(list(table.rows.keys()), [2, 3])
+        self.assertEqual(
+            table.rows[3],
+            OrderedDict([("category", "pens"), ("dollars_budgeted", "20"), ("dollars_spent", "10")]),
+        )
+
+    rules = dumps(
+        [
+            {
+                "code": {"<=": [{"var": "dollars_spent"}, {"var": "dollars_budgeted"}]},
+                "message": "spent {dollars_spent}",
+                "columns": ["dollars_spent", "dollars_budgeted"],
+            }
+        ]
+    )
+
+    @patch("builtins.open", new_callable=mock_open, read_data=rules)
+    def test_parsed_once(self, mock_file):
+        validators = [
+            GoodtablesValidator("GoodtablesValidator", None),
+            JsonlogicValidator("JsonlogicValidator", "mocked_filename.json"),
+        ]
+        table = ParsedTable(self.source, "text/csv")
+        with patch.object(Validator, "rows_from_source", wraps=Validator.rows_from_source) as parse:
+            results = [validator.validate_table(table) for validator in validators]
+            self.assertEqual(parse.call_count, 1)
+
+        self.assertTrue(results[0]["valid"])
+        self.assertEqual(results[1]["tables"][0]["invalid_row_count"], 1)
+        self.assertEqual(results[1]["tables"][0]["rows"][0]["errors"][0]["message"], "spent 500")
@@ -1,6 +1,8 @@
+import jsonschema
+from django.core import exceptions
 from django.test import SimpleTestCase
 from unittest.mock import patch, mock_open
-from json import dumps
+from json import dumps, loads
 
 # This ingest_settings file is imported because there was a weird order that this needs to be imported before
 # ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
@@ -38,3 +40,27 @@ class TestJsonschemaValidator(SimpleTestCase):
             "Content type pdf is not supported by JsonschemaValidator",
         ):
             jtv.validate("fake_source", "pdf")
+
+    schema = dumps(
+        {
+            "definitions": {"amount": {"type": "number", "minimum": 0}},
+            "type": "array",
+            "items": {"type": "object", "properties": {"spent": {"$ref": "#/definitions/amount"}}},
+        }
+    )
+
+    @patch("builtins.open", new_callable=mock_open, read_data=schema)
+    def test_schema_checked_once(self, mock_file):
+        validator_class = jsonschema.validators.validator_for(loads(self.schema))
+        with patch.object(validator_class, "check_schema", wraps=validator_class.check_schema) as check_schema:
+            jtv = JsonschemaValidator("JsonschemaValidator", "mocked_filename.json")
+            results = [jtv.validate([{"spent": 1}, {"spent": -1}], "application/json") for _ in range(3)]
+        self.assertEqual(check_schema.call_count, 1)
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(results[0]["tables"][0]["invalid_row_count"], 1)
+        self.assertEqual(results[0]["tables"][0]["rows"][1]["errors"][0]["code"], "minimum")
+
+    @patch("builtins.open", new_callable=mock_open, read_data=dumps({"type": "no_such_type"}))
+    def test_invalid_schema(self, mock_file):
+        with self.assertRaisesMessage(exceptions.ImproperlyConfigured, "is not a valid JSON Schema"):
+            JsonschemaValidator("JsonschemaValidator", "mocked_filename.json")
@@ -0,0 +1,150 @@
+import importlib
+import json
+import os
+from django.test import SimpleTestCase
+from unittest.mock import call, patch, mock_open
+
+import json_logic
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.ingestors import JsonlogicValidator
+from data_ingest.validators import jsonlogic_compiler
+from data_ingest.validators.jsonlogic_compiler import compile_logic
+
+
+RULES = [
+    {"<=": [{"var": "dollars_spent"}, {"var": "dollars_budgeted"}]},
+    {"!=": [{"var": "category"}, "pens"]},
+    {"==": [{"var": ["missing", "default"]}, "default"]},
+    {"var": "nested.inner"},
+    {"var": "list.1"},
+    {"var": ""},
+    {"and": [{">": [{"var": "a"}, 1]}, {"<": [{"var": "a"}, 10]}]},
+    {"or": [{"==": [{"var": "a"}, 0]}, {"var": "b"}]},
+    {"if": [{">": [{"var": "a"}, 5]}, "big", {">": [{"var": "a"}, 2]}, "medium", "small"]},
+    {"if": [{"var": "b"}, "yes"]},
+    {"?:": [{"var": "b"}, 1, 2]},
+    {"!": [{"var": "b"}]},
+    {"!!": [{"var": "category"}]},
+    {"<": [0, {"var": "a"}, 10]},
+    {"+": [{"var": "a"}, 1, 2]},
+    {"-": [{"var": "a"}]},
+    {"in": [{"var": "category"}, ["pens", "pencils"]]},
+    {"cat": ["x", {"var": "category"}]},
+    {"missing": ["a", "nope"]},
+    {"missing_some": [1, ["a", "nope"]]},
+    {"filter": [{"var": "list"}, {">": [{"var": ""}, 1]}]},
+    {"map": [{"var": "list"}, {"*": [{"var": ""}, 2]}]},
+    {"reduce": [{"var": "list"}, {"+": [{"var": "accumulator"}, {"var": "current"}]}, 0]},
+    {"reduce": [{"var": "nope"}, {"+": [{"var": "accumulator"}, {"var": "current"}]}, 5]},
+    {"all": [{"var": "list"}, {">=": [{"var": ""}, 1]}]},
+    {"all": [[], {">=": [{"var": ""}, 1]}]},
+    {"some": [{"var": "list"}, {"==": [{"var": ""}, 3]}]},
+    {"none": [{"var": "list"}, {"==": [{"var": ""}, 3]}]},
+    [{"var": "a"}, 3],
+    "constant",
+]
+
+DATA = [
+    {"dollars_spent": "10", "dollars_budgeted": "20", "category": "pens", "a": 3, "b": True, "list": [1, 2, 3]},
+    {"dollars_spent": "30", "dollars_budgeted": "20", "category": "pencils", "a": 7, "b": 0, "list": []},
+    {"a": 0, "nested": {"inner": "here"}, "list": "not a list"},
+    {},
+    None,
+]
+
+
+def outcome(function, data):
+    """The result of function(data), or the type of exception it raises"""
+    try:
+        return function(data)
+    except Exception as e:
+        return type(e)
+
+
+class TestCompileLogic(SimpleTestCase):
+    def test_matches_interpreter(self):
+        for rule in RULES:
+            compiled = compile_logic(rule)
+            for data in DATA:
+                with self.subTest(rule=rule, data=data):
+                    self.assertEqual(
+                        outcome(compiled, data), outcome(lambda data: json_logic.jsonLogic(rule, data), data)
+                    )
+
+    def test_errors_match_interpreter(self):
+        for rule in ({"unknown": [1]}, {"var": ["a", 1, 2]}):
+            with self.subTest(rule=rule):
+                with self.assertRaises(Exception) as expected:
+                    json_logic.jsonLogic(rule, {"a": [1]})
+                with self.assertRaises(type(expected.exception)):
+                    compile_logic(rule)({"a": [1]})
+
+    def test_missing_internals(self):
+        # a version of json_logic without the internal operations the compiler reuses
+        try:
+            with patch.dict(json_logic.__dict__):
+                del json_logic.__dict__["_get_values"]
+                importlib.reload(jsonlogic_compiler)
+            for rule in RULES:
+                compiled = jsonlogic_compiler.compile_logic(rule)
+                for data in DATA:
+                    with self.subTest(rule=rule, data=data):
+                        expected = outcome(lambda data: json_logic.jsonLogic(rule, data), data)
+                        # every rule is handed to jsonLogic as it is
+                        with patch("json_logic.jsonLogic", wraps=json_logic.jsonLogic) as interpreter:
+                            self.assertEqual(outcome(compiled, data), expected)
+                        self.assertEqual(interpreter.call_args_list[0], call(rule, data))
+        finally:
+            importlib.reload(jsonlogic_compiler)
+
+    def test_p03_budgets_rules(self):
+        rules_file = os.path.join(os.path.dirname(__file__), "..", "..", "examples", "p03_budgets", "rules.json")
+        with open(rules_file) as infile:
+            rules = json.load(infile)
+
+        rows = [
+            {"dollars_spent": spent, "dollars_budgeted": budgeted}
+            for spent in ("0", "9", "10", "100", "", "1,000")
+            for budgeted in ("0", "9", "10", "100", "", "1,000")
+        ]
+        for rule in rules:
+            compiled = compile_logic(rule["code"])
+            for row in rows:
+                self.assertEqual(compiled(row), json_logic.jsonLogic(rule["code"], row))
+
+
+class TestJsonlogicValidatorCompiled(SimpleTestCase):
+
+    rules = json.dumps(
+        [
+            {
+                "code": {"<=": [{"var": "dollars_spent"}, {"var": "dollars_budgeted"}]},
+                "message": "{category} spent {dollars_spent}",
+                "columns": ["dollars_spent", "dollars_budgeted"],
+            },
+        ]
+    )
+
+    def test_rules_are_compiled_once(self):
+        with patch("builtins.open", new_callable=mock_open, read_data=self.rules):
+            validator = JsonlogicValidator("data_ingest.ingestors.JsonlogicValidator", "rules.json")
+        self.assertEqual(len(validator.compiled), 1)
+
+        source = {
+            "source": b"category,dollars_budgeted,dollars_spent\npens,5,3\npens,5,7\n",
+            "format": "csv",
+            "headers": 1,
+        }
+        with patch("data_ingest.validators.json.json_logic.jsonLogic") as interpreter:
+            result = validator.validate(source, "text/csv")
+        interpreter.assert_not_called()
+        self.assertEqual(result["tables"][0]["invalid_row_count"], 1)
+        self.assertEqual(result["tables"][0]["rows"][1]["errors"][0]["message"], "pens spent 7")
+
+    def test_evaluate_uncompiled_rule(self):
+        with patch("builtins.open", new_callable=mock_open, read_data=self.rules):
+            validator = JsonlogicValidator("data_ingest.ingestors.JsonlogicValidator", "rules.json")
+        self.assertTrue(validator.evaluate({"==": [{"var": "a"}, 1]}, {"a": 1}))
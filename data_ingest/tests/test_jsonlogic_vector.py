@@ -0,0 +1,142 @@
+from unittest import skipIf
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+import json_logic
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.apps import check_optional_dependencies
+from data_ingest.ingestors import JsonlogicValidator, JsonlogicValidatorFailureConditions
+from data_ingest.validators.jsonlogic_vector import Columns, Unvectorizable, compile_vector, numpy
+from .helpers import RuleFileMixin
+from data_ingest.validators.rowwise import UPLOAD_SETTINGS
+
+
+RULES = [
+    {"<=": [{"var": "dollars_spent"}, {"var": "dollars_budgeted"}]},
+    {"<=": [{"var": "dollars_spent"}, 100]},
+    {">": [{"var": "dollars_spent"}, "9"]},
+    {"==": [{"var": "dollars_spent"}, 10]},
+    {"!=": [{"var": "category"}, "pens"]},
+    {"<": [{"+": [{"var": "dollars_spent"}, {"var": "dollars_budgeted"}]}, 150]},
+    {">=": [{"/": [{"var": "dollars_spent"}, {"var": "dollars_budgeted"}]}, 0.5]},
+    {"==": [{"*": [{"var": "dollars_spent"}, 2]}, {"var": "dollars_budgeted"}]},
+    {"==": [{"-": [{"var": "dollars_spent"}]}, "-10"]},
+    {"and": [{"!": [{"var": "category"}]}, {"<": [{"var": "dollars_spent"}, 50]}]},
+    {"or": [{"==": [{"var": "category"}, "pens"]}, {"!!": [{"var": "dollars_spent"}]}]},
+    {"if": [{"==": [{"var": "category"}, "pens"]}, {"<": [{"var": "dollars_spent"}, 20]}, True]},
+    {"in": [{"var": "category"}, ["pens", "pencils", 1]]},
+    {"in": ["en", {"var": "category"}]},
+]
+
+ROWS = [
+    {"category": "pens", "dollars_spent": "10", "dollars_budgeted": "20"},
+    {"category": "pencils", "dollars_spent": "100", "dollars_budgeted": "20"},
+    {"category": "", "dollars_spent": "10.0", "dollars_budgeted": "50"},
+    {"category": "paper", "dollars_spent": "", "dollars_budgeted": "0"},
+    {"category": "pens", "dollars_spent": "1,000", "dollars_budgeted": " 7 "},
+    {"category": "pens", "dollars_spent": "9007199254740993", "dollars_budgeted": "1"},
+    {"category": "pens", "dollars_budgeted": "1"},
+]
+
+
+def outcome(rule, row):
+    try:
+        return bool(json_logic.jsonLogic(rule, row))
+    except Exception as e:
+        return type(e)
+
+
+@skipIf(numpy is None, "numpy isn't installed")
+class TestCompileVector(SimpleTestCase):
+    def test_matches_interpreter(self):
+        for rule in RULES:
+            with self.subTest(rule=rule):
+                results = compile_vector(rule)(Columns(ROWS))
+                self.assertEqual(len(results), len(ROWS))
+                self.assertTrue(any(result is not None for result in results))
+                for (row, result) in zip(ROWS, results):
+                    if result is not None:
+                        self.assertEqual(result, outcome(rule, row))
+
+    def test_undecided_rows(self):
+        results = compile_vector({"<": [{"var": "dollars_spent"}, 50]})(Columns(ROWS))
+        # "", "1,000" raise a ValueError, 2 ** 53 + 1 isn't exact as a float, and a missing value
+        self.assertEqual(results, [True, False, True, None, None, None, None])
+
+    def test_numbers(self):
+        rows = [{"a": 1, "b": 2.5}, {"a": 3, "b": 3.0}, {"a": 2 ** 60, "b": 1}, {"b": 1}]
+        for rule in RULES[:1] + [{"<": [{"var": "a"}, {"var": "b"}]}, {"==": [{"var": "b"}, "3.0"]}]:
+            results = compile_vector(rule)(Columns(rows))
+            for (row, result) in zip(rows, results):
+                if result is not None:
+                    self.assertEqual(result, outcome(rule, row))
+
+    def test_unsupported(self):
+        for rule in (
+            {"var": "a.b"},
+            {"cat": ["a", {"var": "a"}]},
+            {"==": [{"var": "a"}, None]},
+            {"map": [{"var": "a"}, {"var": ""}]},
+        ):
+            with self.subTest(rule=rule):
+                with self.assertRaises(Unvectorizable):
+                    compile_vector(rule)(Columns(ROWS))
+
+        with self.assertRaises(Unvectorizable):
+            compile_vector({"<": [{"var": "a"}, 1]})(Columns([{"a": "1"}, {"a": 1}]))
+
+    def test_missing_internals(self):
+        # a version of json_logic without the internal operations this module reuses
+        with patch("data_ingest.validators.jsonlogic_vector._get_operator", None):
+            with self.assertRaises(Unvectorizable):
+                compile_vector({"<": [{"var": "a"}, 1]})
+
+
+class TestVectorizedJsonlogicValidator(RuleFileMixin, SimpleTestCase):
+    def validator(self, rules, validator_class=JsonlogicValidator):
+        return validator_class("data_ingest.ingestors.JsonlogicValidator", self.make_rule_file(rules))
+
+    @skipIf(numpy is None, "numpy isn't installed")
+    def test_same_output(self):
+        rules = [
+            {
+                "code": rule,
+                "error_code": f"rule{index}",
+                "message": "{category} spent {dollars_spent}",
+                "columns": ["dollars_spent", "dollars_budgeted"],
+            }
+            for (index, rule) in enumerate(RULES)
+        ]
+        rules.append({"code": {"<": [{"var": "other"}, 1]}, "columns": ["other"]})
+
+        lines = ["category,dollars_budgeted,dollars_spent"]
+        lines.extend(f"{'pens' if i % 3 else ''},{i % 40 * 5},{i % 7 * 9}" for i in range(60))
+        lines.append("pens,,1.5")
+        source = {"source": "\n".join(lines).encode(), "format": "csv", "headers": 1}
+
+        for validator_class in (JsonlogicValidator, JsonlogicValidatorFailureConditions):
+            validator = self.validator(rules, validator_class)
+            expected = validator.validate(source, "text/csv")
+            with patch.dict(UPLOAD_SETTINGS, {"VECTORIZE_JSONLOGIC": True}):
+                with patch.object(validator, "evaluate", wraps=validator.evaluate) as evaluate:
+                    self.assertEqual(validator.validate(source, "text/csv"), expected)
+                # only rows that couldn't be vectorized are evaluated one at a time
+                self.assertLess(evaluate.call_count, 60)
+
+    def test_missing_numpy(self):
+        validator = self.validator([{"code": {"var": "a"}, "columns": ["a"]}])
+        with patch.dict(UPLOAD_SETTINGS, {"VECTORIZE_JSONLOGIC": True}):
+            with patch("data_ingest.validators.json.numpy", None):
+                with self.assertRaises(ImproperlyConfigured):
+                    validator.evaluate_rows(["a"], [{"a": "1"}])
+            # which is checked when the app starts
+            with patch("data_ingest.validators.jsonlogic_vector.numpy", None):
+                with self.assertRaises(ImproperlyConfigured):
+                    check_optional_dependencies()
+        with patch("data_ingest.validators.jsonlogic_vector.numpy", None):
+            # numpy is only needed with the setting
+            check_optional_dependencies()
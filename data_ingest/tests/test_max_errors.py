@@ -0,0 +1,74 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.ingestors import apply_validators_to
+from data_ingest.validators.validator import UPLOAD_SETTINGS, ValidatorOutput
+from .helpers import GOODTABLES, JSONLOGIC, RuleFileMixin
+
+
+class TestMaxErrors(RuleFileMixin, SimpleTestCase):
+
+    source = {
+        "source": b"category,dollars_budgeted,dollars_spent\n"
+        + b"".join(b"item%d,1,%d\n" % (i, i + 2) for i in range(20)),
+        "format": "csv",
+        "headers": 1,
+    }
+
+    def setUp(self):
+        self.validators = {None: GOODTABLES, self.make_rule_file(): JSONLOGIC}
+
+    def settings(self, **kwargs):
+        return patch.dict(UPLOAD_SETTINGS, dict({"VALIDATORS": self.validators}, **kwargs))
+
+    def errors(self, result):
+        return [(row["row_number"], error["code"]) for row in result["tables"][0]["rows"] for error in row["errors"]]
+
+    def test_no_limit(self):
+        with self.settings():
+            result = apply_validators_to(self.source, "text/csv")
+        self.assertNotIn("truncated", result)
+        self.assertEqual(len(self.errors(result)), 20)
+
+    def test_stops_at_max_errors(self):
+        with self.settings(MAX_ERRORS=5):
+            result = apply_validators_to(self.source, "text/csv")
+        table = result["tables"][0]
+
+        self.assertTrue(result["truncated"])
+        self.assertFalse(result["valid"])
+        self.assertEqual([rn for (rn, code) in self.errors(result)], [2, 3, 4, 5, 6])
+        self.assertEqual(table["invalid_row_count"], 5)
+        self.assertEqual(table["valid_row_count"], 15)
+        self.assertEqual(
+            table["whole_table_errors"],
+            [ValidatorOutput.create_error("Error", "max-errors", "Validation stopped after 5 errors", [])],
+        )
+
+    def test_per_request_override(self):
+        with self.settings(MAX_ERRORS=5):
+            self.assertEqual(len(self.errors(apply_validators_to(self.source, "text/csv", max_errors=3))), 3)
+            # 0 turns the limit off
+            result = apply_validators_to(self.source, "text/csv", max_errors=0)
+        self.assertNotIn("truncated", result)
+        self.assertEqual(len(self.errors(result)), 20)
+
+    def test_concurrent(self):
+        with self.settings(MAX_ERRORS=5):
+            expected = apply_validators_to(self.source, "text/csv")
+        with self.settings(MAX_ERRORS=5, VALIDATION_EXECUTOR="thread"):
+            self.assertEqual(apply_validators_to(self.source, "text/csv"), expected)
+
+    def test_goodtables_error_limit(self):
+        source = {
+            "source": b"a,b\n" + b",\n" * 10,
+            "format": "csv",
+            "headers": 1,
+        }
+        with self.settings(VALIDATORS={None: "data_ingest.ingestors.GoodtablesValidator"}):
+            result = apply_validators_to(source, "text/csv", max_errors=4)
+        self.assertTrue(result["truncated"])
+        self.assertEqual(self.errors(result), [(rn, "blank-row") for rn in range(2, 6)])
@@ -0,0 +1,125 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.ingestors import RowResults, apply_validators_to, preview_validators_to
+from data_ingest.validators.validator import UPLOAD_SETTINGS
+from .helpers import RuleFileMixin
+
+
+class TestPreview(RuleFileMixin, SimpleTestCase):
+
+    csv = b"category,dollars_budgeted,dollars_spent\n" + b"".join(
+        b"item%d,5,%d\n" % (i, i) for i in range(20)
+    )
+
+    def setUp(self):
+        self.use_budget_rules()
+
+    def source(self):
+        return {"source": self.csv, "format": "csv", "headers": 1}
+
+    def assertRowsMatch(self, preview, full):
+        """Every row in the preview has the same number, data and errors as in the full result"""
+        full_rows = {row["row_number"]: row for row in full["tables"][0]["rows"]}
+        for row in preview["tables"][0]["rows"]:
+            self.assertEqual(row, full_rows[row["row_number"]])
+
+    def test_head(self):
+        full = apply_validators_to(self.source(), "text/csv")
+        preview = preview_validators_to(self.source(), "text/csv", rows=5, mode="head")
+
+        self.assertEqual(preview["preview"], {"mode": "head", "rows": 5, "total_rows": None})
+        self.assertEqual([row["row_number"] for row in preview["tables"][0]["rows"]], [2, 3, 4, 5, 6])
+        self.assertTrue(preview["valid"])
+        self.assertRowsMatch(preview, full)
+
+    def test_sample(self):
+        full = apply_validators_to(self.source(), "text/csv")
+        preview = preview_validators_to(self.source(), "text/csv", rows=5, mode="sample")
+
+        self.assertEqual(preview["preview"], {"mode": "sample", "rows": 5, "total_rows": 20})
+        row_numbers = [row["row_number"] for row in preview["tables"][0]["rows"]]
+        self.assertEqual(row_numbers, sorted(row_numbers))
+        self.assertRowsMatch(preview, full)
+        # the same sample every time
+        self.assertEqual(preview, preview_validators_to(self.source(), "text/csv", rows=5, mode="sample"))
+
+    def test_sample_messages(self):
+        # every third row is the same, so sampled rows are duplicates of sampled rows before them
+        csv = b"category,dollars_budgeted,dollars_spent\n" + b"".join(
+            b"pens,5,1\n" if i % 3 == 0 else b"item%d,5,%d\n" % (i, i % 5) for i in range(60)
+        )
+        source = {"source": csv, "format": "csv", "headers": 1}
+        preview = preview_validators_to(source, "text/csv", rows=10, mode="sample")
+
+        rows = preview["tables"][0]["rows"]
+        pens = [row["row_number"] for row in rows if row["data"]["category"] == "pens"]
+        self.assertGreater(len(pens), 1)
+        for row in rows:
+            if row["row_number"] in pens[1:]:
+                earlier = ", ".join(str(number) for number in pens if number < row["row_number"])
+                self.assertEqual(
+                    row["errors"][0]["message"], f"Row {row['row_number']} is duplicated to row(s) {earlier}"
+                )
+            else:
+                self.assertEqual([error["code"] for error in row["errors"]], [])
+
+    def test_small_source_is_fully_validated(self):
+        with patch.dict(UPLOAD_SETTINGS, {"PREVIEW_ROWS": 20}):
+            preview = preview_validators_to(self.source(), "text/csv")
+        self.assertEqual(preview, apply_validators_to(self.source(), "text/csv"))
+
+    def test_small_source_records_row_results(self):
+        row_results = RowResults()
+        apply_validators_to(self.source(), "text/csv", row_results=row_results)
+
+        again = RowResults(row_results.recorded)
+        preview = preview_validators_to(self.source(), "text/csv", rows=20, row_results=again)
+        self.assertNotIn("preview", preview)
+        self.assertEqual(again.reused, 20)
+        self.assertEqual(again.recorded, row_results.recorded)
+
+        # a provisional result records nothing
+        provisional = RowResults(row_results.recorded)
+        preview_validators_to(self.source(), "text/csv", rows=5, row_results=provisional)
+        self.assertEqual(provisional.recorded, {"rows": [], "validators": {}})
+
+    def test_json(self):
+        source = {
+            "source": [
+                {"category": f"item{i}", "dollars_budgeted": 10, "dollars_spent": i} for i in range(20)
+            ]
+        }
+        full = apply_validators_to(source, "application/json")
+        preview = preview_validators_to(source, "application/json", rows=4, mode="sample")
+
+        self.assertEqual(preview["preview"]["total_rows"], 20)
+        self.assertEqual(len(preview["tables"][0]["rows"]), 4)
+        self.assertRowsMatch(preview, full)
+
+    def test_stream_args(self):
+        # a comment line, skipped as STREAM_ARGS say
+        lines = self.csv.splitlines(keepends=True)
+        source = {
+            "source": b"".join(lines[:8] + [b"# a comment\n"] + lines[8:]),
+            "format": "csv",
+            "headers": 1,
+            "skip_rows": ["#"],
+        }
+        full = apply_validators_to(source, "text/csv")
+        preview = preview_validators_to(source, "text/csv", rows=10, mode="head")
+
+        self.assertEqual(
+            [row["row_number"] for row in preview["tables"][0]["rows"]], [2, 3, 4, 5, 6, 7, 8, 10, 11, 12]
+        )
+        self.assertRowsMatch(preview, full)
+
+    def test_memoryview(self):
+        # as an upload's `raw` is read from Postgres
+        source = dict(self.source(), source=memoryview(self.csv))
+        preview = preview_validators_to(source, "text/csv", rows=5, mode="head")
+
+        self.assertEqual(preview, preview_validators_to(self.source(), "text/csv", rows=5, mode="head"))
@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.validators.remote import RemoteDocumentCache
+
+RULES = json.dumps([{"code": {"==": [1, 1]}, "message": "always valid", "columns": []}])
+
+
+class RuleHandler(BaseHTTPRequestHandler):
+    """Serves RULES with an ETag, and records the conditional headers it receives"""
+
+    requests_seen = []
+
+    def do_GET(self):
+        RuleHandler.requests_seen.append(self.headers.get("If-None-Match"))
+        if self.path == "/missing.json":
+            self.send_response(404)
+            self.end_headers()
+        elif self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+        else:
+            body = RULES.encode()
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRemoteDocumentCache(SimpleTestCase):
+    def setUp(self):
+        RuleHandler.requests_seen = []
+        self.server = HTTPServer(("127.0.0.1", 0), RuleHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = "http://127.0.0.1:{}/rules.json".format(self.server.server_port)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.stop_server()
+        shutil.rmtree(self.directory)
+
+    def stop_server(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def test_fetch_within_ttl(self):
+        cache = RemoteDocumentCache(directory=self.directory, ttl=300)
+        self.assertEqual(cache.fetch(self.url), RULES)
+        self.assertEqual(cache.fetch(self.url), RULES)
+        self.assertEqual(RuleHandler.requests_seen, [None])
+
+        # a new cache (i.e. a new process) reads the copy on disk
+        other = RemoteDocumentCache(directory=self.directory, ttl=300)
+        self.assertEqual(other.fetch(self.url), RULES)
+        self.assertEqual(RuleHandler.requests_seen, [None])
+
+    def test_revalidate_after_ttl(self):
+        cache = RemoteDocumentCache(directory=self.directory, ttl=0)
+        signature = cache.signature(self.url)
+        self.assertEqual(cache.fetch(self.url), RULES)
+        self.assertEqual(cache.signature(self.url), signature)
+        self.assertEqual(RuleHandler.requests_seen, [None, '"v1"', '"v1"'])
+
+    def test_serve_stale_copy_when_host_is_down(self):
+        cache = RemoteDocumentCache(directory=self.directory, ttl=0, timeout=1)
+        cache.fetch(self.url)
+        self.stop_server()
+        self.assertEqual(cache.fetch(self.url), RULES)
+
+    def test_prefetch(self):
+        cache = RemoteDocumentCache(directory=self.directory, ttl=300)
+        missing = self.url.replace("rules.json", "missing.json")
+        self.assertEqual(cache.prefetch([self.url, missing]), {self.url: True, missing: False})
+        self.assertEqual(cache.fetch(self.url), RULES)
+        self.assertEqual(len(RuleHandler.requests_seen), 2)
+
+    def test_private_directory(self):
+        with patch("tempfile.gettempdir", return_value=self.directory):
+            cache = RemoteDocumentCache(ttl=300)
+            self.assertEqual(os.stat(cache.directory).st_mode & 0o777, 0o700)
+            cache.fetch(self.url)
+
+            # a directory others could have planted documents in is not read
+            os.chmod(cache.directory, 0o777)
+            other = RemoteDocumentCache(ttl=300)
+            self.assertIsNone(other.directory)
+            self.assertEqual(other.fetch(self.url), RULES)
+        self.assertEqual(RuleHandler.requests_seen, [None, None])
+
+    def test_concurrent_writes(self):
+        cache = RemoteDocumentCache(directory=self.directory, ttl=300)
+        bodies = [str(index) * 100000 for index in range(8)]
+        threads = [
+            threading.Thread(target=cache._write, args=(self.url, {"fetched_at": 0}, body)) for body in bodies
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        other = RemoteDocumentCache(directory=self.directory, ttl=300)
+        self.assertIn(other._read(self.url)[1], bodies)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+import time
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.ingestors import JsonlogicValidator, RowResults, apply_validators_to
+from data_ingest.validators.result_cache import (
+    DjangoResultCache,
+    FileResultCache,
+    MemoryResultCache,
+    ResultCache,
+    result_cache,
+    source_digest,
+)
+from data_ingest.validators.validator import UPLOAD_SETTINGS
+from .helpers import BUDGET_RULE, RuleFileMixin, write_rules
+
+
+class TestResultCacheBackends(SimpleTestCase):
+    def check_lru(self, cache, tick=lambda: None):
+        cache.set("a", {"n": 1})
+        tick()
+        cache.set("b", {"n": 2})
+        tick()
+        self.assertEqual(cache.get("a"), {"n": 1})
+        tick()
+        cache.set("c", {"n": 3})
+
+        # "b" was the least recently used
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"n": 1})
+        self.assertEqual(cache.get("c"), {"n": 3})
+        self.assertEqual(cache.stats(), {"hits": 3, "misses": 1, "hit_rate": 0.75})
+
+    def test_memory(self):
+        cache = MemoryResultCache(size=2)
+        self.check_lru(cache)
+
+        # cached results can't be changed through what `get` returned
+        cache.get("a")["n"] = 10
+        self.assertEqual(cache.get("a"), {"n": 1})
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = FileResultCache(directory=directory, size=2)
+        # files are ordered by modification time, so leave some time between uses
+        self.check_lru(cache, tick=lambda: time.sleep(0.05))
+        self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_file_default_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with patch("tempfile.gettempdir", return_value=directory):
+            cache = FileResultCache()
+            self.assertEqual(os.stat(cache.directory).st_mode & 0o777, 0o700)
+
+            # results planted by someone else would be trusted
+            os.chmod(cache.directory, 0o777)
+            with self.assertRaises(ImproperlyConfigured):
+                FileResultCache()
+
+    def test_backends_implement_every_method(self):
+        with self.assertRaises(TypeError):
+            ResultCache()
+
+    def test_django(self):
+        cache = DjangoResultCache()
+        cache.clear()
+        cache.set("a", {"n": 1})
+        self.assertEqual(cache.get("a"), {"n": 1})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["hit_rate"], 0.5)
+
+    def test_source_digest(self):
+        csv = {"source": b"a,b\n1,2\n", "format": "csv", "headers": 1}
+        self.assertEqual(source_digest(csv, "text/csv"), source_digest(dict(csv), "text/csv"))
+        changed = dict(csv, source=b"a,b\n1,3\n")
+        self.assertNotEqual(source_digest(csv, "text/csv"), source_digest(changed, "text/csv"))
+        self.assertEqual(
+            source_digest({"source": [{"a": 1, "b": 2}]}, "application/json"),
+            source_digest({"source": [{"b": 2, "a": 1}]}, "application/json"),
+        )
+        with open(__file__, "rb") as infile:
+            self.assertIsNone(source_digest({"source": infile}, "text/csv"))
+
+
+class TestCachedValidation(RuleFileMixin, SimpleTestCase):
+
+    source = {
+        "source": b"category,dollars_budgeted,dollars_spent\npencils,1,5\npens,2,2\n",
+        "format": "csv",
+        "headers": 1,
+    }
+
+    def setUp(self):
+        self.rule_file = self.use_budget_rules(RESULT_CACHE="memory")
+        result_cache().clear()
+
+    def write_rules(self, message, mtime=None):
+        write_rules(self.rule_file, [dict(BUDGET_RULE, message=message)], mtime)
+
+    def validate(self, **kwargs):
+        with patch.object(
+            JsonlogicValidator, "evaluate", autospec=True, side_effect=JsonlogicValidator.evaluate
+        ) as evaluate:
+            result = apply_validators_to(dict(self.source), "text/csv", **kwargs)
+        return (result, evaluate.call_count)
+
+    def test_same_source_is_validated_once(self):
+        (first, evaluated) = self.validate()
+        self.assertEqual(evaluated, 2)
+        (second, evaluated) = self.validate()
+        self.assertEqual(evaluated, 0)
+        self.assertEqual(first, second)
+
+        # a different max_errors gives a different result
+        (truncated, evaluated) = self.validate(max_errors=1)
+        self.assertTrue(truncated["truncated"])
+
+        with patch.dict(UPLOAD_SETTINGS, {"RESULT_CACHE": None}):
+            self.assertEqual(apply_validators_to(dict(self.source), "text/csv"), first)
+
+    def test_changed_rules(self):
+        (first, evaluated) = self.validate()
+        self.write_rules("overspent {dollars_spent}", mtime=os.stat(self.rule_file).st_mtime + 10)
+        (second, evaluated) = self.validate()
+        self.assertEqual(evaluated, 2)
+        self.assertEqual(second["tables"][0]["rows"][0]["errors"][0]["message"], "overspent 5")
+
+    def test_changed_settings(self):
+        self.validate()
+        for settings in ({"LAZY_ERROR_MESSAGES": True}, {"CAST_BY_SCHEMA": True}):
+            with self.subTest(**settings), patch.dict(UPLOAD_SETTINGS, settings):
+                (result, evaluated) = self.validate()
+                self.assertEqual(evaluated, 2)
+
+    def test_row_results_are_cached(self):
+        row_results = RowResults()
+        self.validate(row_results=row_results)
+        self.assertEqual(len(row_results.recorded["rows"]), 2)
+
+        again = RowResults()
+        (result, evaluated) = self.validate(row_results=again)
+        self.assertEqual(evaluated, 0)
+        self.assertEqual(again.recorded, row_results.recorded)
@@ -1,13 +1,18 @@
 from collections import OrderedDict
 from django.test import SimpleTestCase
+from unittest.mock import patch
 
 # This ingest_settings file is imported because there was a weird order that this needs to be imported before
 # ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
 import data_ingest.ingest_settings  # noqa: F401
-from data_ingest.ingestors import RowwiseValidator
+from data_ingest.ingestors import RowwiseValidator, JsonlogicValidator
+from data_ingest.validators.messages import message_template, substitute_fields
+from data_ingest.validators.rowwise import UPLOAD_SETTINGS
+from data_ingest.validators.validator import ValidatorOutput
+from .helpers import BUDGET_RULE, RuleFileMixin
 
 
-class TestRowwiseValidator(SimpleTestCase):
+class TestRowwiseValidator(RuleFileMixin, SimpleTestCase):
     def test_cast_values(self):
         self.assertEqual(
             RowwiseValidator.cast_values(
@@ -97,3 +102,100 @@ class TestRowwiseValidator(SimpleTestCase):
         self.assertEqual(
             RowwiseValidator.replace_message(message, row_dict), exp_result
         )
+
+    def test_message_template(self):
+        message = "{category}: {dollars_spent / dollars_budgeted:2} of {dollars_budgeted}"
+        self.assertIs(message_template(message), message_template(message))
+
+        row_dict = {"category": "pens", "dollars_spent": "30", "dollars_budgeted": "20", "other": "{category}"}
+        for message in (
+            "{category}: {dollars_spent / dollars_budgeted:2} of {dollars_budgeted}",
+            "{dollars_spent * 2} {category + 1} {unknown} {category}",
+            "{dollars_spent - 1:x} {category}",
+            # a field inside another one, and a value that looks like a field, are replaced in order
+            "{category} {{category}",
+            "{other} {category}",
+            "no fields { here",
+        ):
+            with self.subTest(message=message):
+                self.assertEqual(
+                    RowwiseValidator.replace_message(message, row_dict), substitute_fields(message, row_dict)
+                )
+
+        with self.assertRaises(ZeroDivisionError):
+            RowwiseValidator.replace_message("{dollars_spent / 0}", row_dict)
+
+    def test_lazy_error_messages(self):
+        rule_file = self.make_rule_file(
+            [
+                dict(
+                    BUDGET_RULE,
+                    message="{category} spent {dollars_spent / dollars_budgeted:1} times the budget",
+                    severity="Warning",
+                )
+            ]
+        )
+        validator = JsonlogicValidator("data_ingest.ingestors.JsonlogicValidator", rule_file)
+        source = {
+            "source": b"category,dollars_budgeted,dollars_spent,notes\npens,5,7,x\npens,0,3,y\npens,5,1,z\n",
+            "format": "csv",
+            "headers": 1,
+        }
+
+        expected = validator.validate(source, "text/csv")
+        with patch.dict(UPLOAD_SETTINGS, {"LAZY_ERROR_MESSAGES": True}):
+            lazy = validator.validate(source, "text/csv")
+        error = lazy["tables"][0]["rows"][0]["errors"][0]
+        self.assertNotIn("message", error)
+        # only the values the message uses are kept
+        self.assertEqual(error["params"], {"category": "pens", "dollars_spent": "7", "dollars_budgeted": "5"})
+
+        # including the division by zero, which is an error of its own
+        self.assertEqual(ValidatorOutput.rendered(lazy), expected)
+        self.assertEqual(ValidatorOutput.message(error), "pens spent 1.4 times the budget")
+        self.assertIs(ValidatorOutput.rendered(expected), expected)
+
+    def test_sharded_validation(self):
+        rule_file = self.make_rule_file(
+            [
+                dict(BUDGET_RULE, message="{category} spent {dollars_spent}"),
+                {"code": {"!=": [{"var": "category"}, "pens"]}, "message": "no pens", "columns": ["category"]},
+            ]
+        )
+
+        lines = ["category,dollars_budgeted,dollars_spent"]
+        lines.extend(f"{'pens' if i % 7 == 0 else 'pencils'},{i % 5},{i % 3}" for i in range(45))
+        source = {"source": "\n".join(lines).encode(), "format": "csv", "headers": 1}
+
+        validator = JsonlogicValidator("data_ingest.ingestors.JsonlogicValidator", rule_file)
+        expected = validator.validate(source, "text/csv")
+        self.assertEqual(expected["tables"][0]["invalid_row_count"], 15)
+
+        with patch.dict(UPLOAD_SETTINGS, {"ROWWISE_WORKERS": 3, "ROWWISE_MIN_SHARD_ROWS": 10}):
+            shards = RowwiseValidator.shards(OrderedDict((i, {}) for i in range(45)))
+            self.assertEqual([len(shard) for shard in shards], [15, 15, 15])
+            self.assertEqual(shards[1][0][0], 15)
+
+            self.assertEqual(validator.validate(source, "text/csv"), expected)
+
+    def test_known_rows_are_not_evaluated(self):
+        validator = JsonlogicValidator("data_ingest.ingestors.JsonlogicValidator", self.make_rule_file([BUDGET_RULE]))
+        headers = ["category", "dollars_budgeted", "dollars_spent"]
+        numbered_rows = [
+            (rn, OrderedDict(zip(headers, values)))
+            for (rn, values) in [(2, ["pens", "5", "7"]), (3, ["pencils", "5", "9"]), (4, ["clips", "5", "8"])]
+        ]
+        known = {"severity": "Error", "code": None, "message": "known", "fields": []}
+
+        output = ValidatorOutput(OrderedDict(numbered_rows), headers=headers)
+        # results of the evaluated rows: the first passes
+        results = {0: [True, False]}
+        with patch.object(JsonlogicValidator, "evaluate_rows", autospec=True, return_value=results) as evaluate_rows:
+            validator.validate_rows(headers, numbered_rows, output, known_errors={3: [known]})
+        evaluate_rows.assert_called_once_with(validator, headers, [numbered_rows[0][1], numbered_rows[2][1]])
+
+        rows = output.get_output()["tables"][0]["rows"]
+        self.assertEqual([row["row_number"] for row in rows], [2, 3, 4])
+        self.assertEqual([len(row["errors"]) for row in rows], [0, 1, 1])
+        self.assertEqual(rows[1]["errors"][0]["message"], "known")
+        self.assertNotEqual(rows[2]["errors"][0]["message"], "known")
@@ -1,7 +1,14 @@
+import os
+import pickle
+import threading
 from django.test import SimpleTestCase
 from unittest.mock import patch
 
-from data_ingest.ingestors import SqlValidator, UnsupportedContentTypeException
+from data_ingest import utils
+from data_ingest.ingestors import SqlValidator, SqlValidatorFailureConditions, UnsupportedContentTypeException
+from data_ingest.validators.rowwise import UPLOAD_SETTINGS
+from data_ingest.validators.validator import ParsedTable, ValidatorOutput
+from .helpers import RuleFileMixin
 
 
 class TestSqlValidator(SimpleTestCase):
@@ -14,3 +21,204 @@ class TestSqlValidator(SimpleTestCase):
             "Content type pdf is not supported by SqlValidator",
         ):
             stv.validate("fake_source", "pdf")
+
+
+class TestSetBasedSqlValidator(RuleFileMixin, SimpleTestCase):
+
+    rules = [
+        {
+            "code": "dollars_spent <= dollars_budgeted",
+            "error_code": "spend01",
+            "message": "{category} spent {dollars_spent}",
+            "columns": ["dollars_spent", "dollars_budgeted"],
+        },
+        {"code": "category", "columns": ["category"]},
+        {"code": "nullif(dollars_spent, 0)", "columns": ["dollars_spent"]},
+        {"code": "'0.0'", "columns": []},
+        {"code": "count(*) > 1", "columns": []},
+        {"code": "row_number() over () < 3", "columns": []},
+        {"code": "no_such_column > 1", "columns": []},
+        {"code": "", "columns": []},
+    ]
+
+    def validator(self, validator_class, rules):
+        return validator_class("data_ingest.ingestors.SqlValidator", self.make_rule_file(rules))
+
+    def test_same_output(self):
+        lines = ["category,dollars_budgeted,dollars_spent"]
+        lines.extend(
+            f"{['pens', '', '0', 'abc'][i % 4]},{i % 50},{['', 'x', str(i % 60), '1,000', '2.5'][i % 5]}"
+            for i in range(100)
+        )
+        table = ParsedTable({"source": "\n".join(lines).encode(), "format": "csv", "headers": 1}, "text/csv")
+
+        for validator_class in (SqlValidator, SqlValidatorFailureConditions):
+            for rule in self.rules:
+                with self.subTest(validator_class=validator_class, rule=rule["code"]):
+                    validator = self.validator(validator_class, [rule])
+                    expected = validator.validate_table(table)
+                    with patch.dict(UPLOAD_SETTINGS, {"SQL_SET_BASED": True}):
+                        self.assertEqual(validator.validate_table(table), expected)
+
+    def test_one_query_per_rule(self):
+        validator = self.validator(SqlValidator, self.rules[:1])
+        source = {
+            "source": b"category,dollars_budgeted,dollars_spent\npens,5,3\npens,5,7\npens,5,5\n",
+            "format": "csv",
+            "headers": 1,
+        }
+        with patch.dict(UPLOAD_SETTINGS, {"SQL_SET_BASED": True}):
+            with patch.object(validator, "evaluate") as evaluate:
+                result = validator.validate(source, "text/csv")
+        evaluate.assert_not_called()
+        self.assertEqual(result["tables"][0]["invalid_row_count"], 1)
+        self.assertEqual(result["tables"][0]["rows"][1]["errors"][0]["message"], "pens spent 7")
+
+    def test_row_dependent_rules(self):
+        validator = self.validator(SqlValidator, self.rules)
+        rows = [{"category": "pens", "dollars_budgeted": "5", "dollars_spent": "3"}] * 3
+        with patch.dict(UPLOAD_SETTINGS, {"SQL_SET_BASED": True}):
+            results = validator.evaluate_rows(["category", "dollars_budgeted", "dollars_spent"], rows)
+        # aggregates, window functions and errors are left to `evaluate`
+        self.assertEqual(sorted(results), [0, 1, 2, 3, 7])
+        self.assertEqual(results[3], [True, True, True])
+
+
+class TestSqlStatements(RuleFileMixin, SimpleTestCase):
+    def validator(self, rules):
+        return SqlValidator("data_ingest.ingestors.SqlValidator", self.make_rule_file(rules))
+
+    def test_binds_named_columns(self):
+        validator = self.validator([])
+        row = {"a": "1", "B": "2", "unused": "x"}
+        self.assertTrue(validator.evaluate('a < "b"', row))
+        self.assertFalse(validator.evaluate("[a] > b", row))
+        self.assertEqual(validator.statements[('a < "b"', tuple(row))][1], ["a", "B"])
+        self.assertEqual(validator.statements[("[a] > b", tuple(row))][1], ["a", "B"])
+
+        self.assertTrue(validator.evaluate("1", row))
+        self.assertEqual(validator.statements[("1", tuple(row))], ("select 1", []))
+
+    def test_same_errors(self):
+        validator = self.validator([])
+        # columns can't be left out where binding every column doesn't compile
+        for (rule, row) in (
+            ("a < 2", {"a": "1", "c d": "3"}),
+            ("a < 2; select 1", {"a": "1", "b": "3"}),
+            ("no_such_column", {"a": "1", "b": "3"}),
+        ):
+            with self.subTest(rule=rule):
+                with self.assertRaises(Exception) as expected:
+                    validator.db_cursor.execute(validator.aliased_sql(rule, row), tuple(row.values()))
+                with self.assertRaisesMessage(type(expected.exception), str(expected.exception)):
+                    validator.evaluate(rule, row)
+                self.assertIsNone(validator.statements[(rule, tuple(row))][1])
+
+
+class TestSqlConnections(RuleFileMixin, SimpleTestCase):
+    def validator(self):
+        rule_file = self.make_rule_file([{"code": "a < 2", "columns": ["a"]}])
+        return SqlValidator("data_ingest.ingestors.SqlValidator", rule_file)
+
+    def test_connection_per_thread(self):
+        validator = self.validator()
+        cursors = [validator.db_cursor]
+        self.assertIs(validator.db_cursor, cursors[0])
+        self.assertIs(validator.db, cursors[0].connection)
+        results = []
+
+        def validate():
+            cursors.append(validator.db_cursor)
+            self.assertIs(validator.db, validator.db_cursor.connection)
+            results.append([validator.evaluate("a < 2", {"a": value}) for value in range(500)])
+
+        threads = [threading.Thread(target=validate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(cursor.connection) for cursor in cursors}), len(cursors))
+        self.assertEqual(results, [[value < 2 for value in range(500)]] * 4)
+
+    def test_connection_per_process(self):
+        validator = self.validator()
+        cursor = validator.db_cursor
+        with patch("data_ingest.validators.sql.os.getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(validator.db_cursor, cursor)
+            self.assertTrue(validator.evaluate("a < 2", {"a": 1}))
+
+    def test_pickle(self):
+        validator = self.validator()
+        self.assertTrue(validator.evaluate("a < 2", {"a": 1}))
+        copy = pickle.loads(pickle.dumps(validator))
+        self.assertIsNot(copy.db_cursor, validator.db_cursor)
+        self.assertEqual(copy.statements, validator.statements)
+        self.assertFalse(copy.evaluate("a < 2", {"a": 3}))
+
+
+class TestTypedRows(RuleFileMixin, SimpleTestCase):
+    def validator(self, rules):
+        return SqlValidator("data_ingest.ingestors.SqlValidator", self.make_rule_file(rules))
+
+    def test_rows_cast_once(self):
+        spent = self.validator(
+            [
+                {"code": "spent <= budget", "message": "{spent - budget} over", "columns": ["spent", "budget"]},
+                {"code": "spent > 0", "columns": ["spent"]},
+            ]
+        )
+        category = self.validator([{"code": "category != 'pens'", "columns": ["category"]}])
+        source = {"source": b"category,budget,spent\npens,5,3\npencils,5,7.5\n", "format": "csv", "headers": 1}
+        table = ParsedTable(source, "text/csv")
+        table.preload()
+
+        with patch("data_ingest.utils.cast_value", wraps=utils.cast_value) as cast_value:
+            results = [validator.validate_table(table) for validator in (spent, category)]
+        cast = sorted(call.args[0] for call in cast_value.call_args_list if isinstance(call.args[0], str))
+        # each value once, and not again for the message, which only tries its operands as numbers
+        self.assertEqual(cast, sorted(["pens", "5", "3", "pencils", "5", "7.5", "spent", "budget"]))
+        self.assertEqual(table.typed_rows[3], {"category": "pencils", "budget": 5, "spent": 7.5})
+
+        self.assertEqual(results[0]["tables"][0]["rows"][1]["errors"][0]["message"], "2.5 over")
+        self.assertEqual(results[1]["tables"][0]["invalid_row_count"], 1)
+
+    def test_evaluate_casts_rows(self):
+        validator = self.validator([])
+        # rows as received are cast, as before rows were cast ahead of time
+        self.assertTrue(validator.evaluate("typeof(a) = 'integer' and a = 1000", {"a": "1,000"}))
+        # cast rows are taken as they are, i.e. by the Table Schema's types
+        self.assertTrue(validator.evaluate_typed("typeof(a) = 'text'", {"a": "007"}))
+
+    def test_schema_types(self):
+        validator = self.validator(
+            [
+                {"code": "code = '007'", "columns": ["code"]},
+                {"code": "spent IS NOT NULL", "columns": ["spent"]},
+            ]
+        )
+        source = {"source": b"code,spent\n007,1.5\n007,n/a\n", "format": "csv", "headers": 1}
+        schema = {"fields": [{"name": "code", "type": "string"}, {"name": "spent", "type": "number"}]}
+
+        result = validator.validate(source, "text/csv")
+        # without the schema, "007" is 7, and "n/a" a string
+        self.assertEqual(result["tables"][0]["invalid_row_count"], 2)
+
+        with patch.dict(UPLOAD_SETTINGS, {"CAST_BY_SCHEMA": True}):
+            with patch("data_ingest.utils.get_schema", return_value=schema):
+                result = validator.validate(source, "text/csv")
+        self.assertEqual(result["tables"][0]["invalid_row_count"], 1)
+        self.assertEqual(result["tables"][0]["rows"][1]["errors"][0]["fields"], ["spent"])
+
+    def test_schema_types_in_messages(self):
+        validator = self.validator([{"code": "a + b > 10", "message": "sum is {a + b}", "columns": ["a", "b"]}])
+        source = {"source": b"a,b\n1,2\n", "format": "csv", "headers": 1}
+        schema = {"fields": [{"name": "a", "type": "string"}, {"name": "b", "type": "string"}]}
+
+        with patch.dict(UPLOAD_SETTINGS, {"CAST_BY_SCHEMA": True}):
+            with patch("data_ingest.utils.get_schema", return_value=schema):
+                eager = validator.validate(source, "text/csv")
+                with patch.dict(UPLOAD_SETTINGS, {"LAZY_ERROR_MESSAGES": True}):
+                    lazy = validator.validate(source, "text/csv")
+        # messages show values as received, whatever the rules compared them as
+        self.assertEqual(eager["tables"][0]["rows"][0]["errors"][0]["message"], "sum is 3")
+        self.assertEqual(ValidatorOutput.rendered(lazy), eager)
@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import tempfile
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.ingestors import apply_validators_to, stream_validators_to
+from data_ingest.validators.validator import UPLOAD_SETTINGS
+from .helpers import GOODTABLES, JSONLOGIC, JSONSCHEMA, RuleFileMixin
+
+
+class TestValidationStream(RuleFileMixin, SimpleTestCase):
+
+    csv = b"category,dollars_budgeted,dollars_spent\npencils,1,500\n\npens,20,10,extra\n,,\nclips,5,5\n"
+
+    def setUp(self):
+        self.rule_file = self.use_budget_rules()
+
+    def assertStreamed(self, source, max_errors=None):
+        expected = apply_validators_to(dict(source), "text/csv", max_errors=max_errors)
+
+        stream = stream_validators_to(source, "text/csv", max_errors)
+        rows = list(stream)
+        result = stream.get_output()
+
+        self.assertEqual(rows, expected["tables"][0]["rows"])
+        self.assertEqual(result["valid"], expected["valid"])
+        self.assertEqual(result.get("truncated"), expected.get("truncated"))
+        for key in ("headers", "whole_table_errors", "valid_row_count", "invalid_row_count"):
+            self.assertEqual(result["tables"][0][key], expected["tables"][0][key])
+        return result
+
+    def test_same_rows_as_apply_validators_to(self):
+        self.assertStreamed({"source": self.csv, "format": "csv", "headers": 1})
+
+    def test_max_errors(self):
+        source = {"source": self.csv, "format": "csv", "headers": 1}
+        self.assertTrue(self.assertStreamed(source, max_errors=2)["truncated"])
+        with patch.dict(UPLOAD_SETTINGS, {"MAX_ERRORS": 1}):
+            self.assertTrue(self.assertStreamed(source)["truncated"])
+
+    def test_columns_in_schema_order(self):
+        schema = self.make_rule_file(
+            {"fields": [{"name": name} for name in ("category", "dollars_budgeted", "dollars_spent")]}
+        )
+        self.use_validators({schema: GOODTABLES, self.rule_file: JSONLOGIC})
+        csv = b"dollars_spent,category,dollars_budgeted\n500,pencils,1\n10,pens,20\n"
+        handle, csv_file = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "wb") as outfile:
+            outfile.write(csv)
+        self.addCleanup(os.remove, csv_file)
+
+        result = self.assertStreamed({"source": csv, "format": "csv", "headers": 1})
+        self.assertEqual(result["tables"][0]["headers"], ["category", "dollars_budgeted", "dollars_spent"])
+        rows = list(stream_validators_to({"source": csv_file, "format": "csv", "headers": 1}, "text/csv"))
+        self.assertEqual(list(rows[0]["data"]), ["category", "dollars_budgeted", "dollars_spent"])
+        self.assertEqual(rows[0]["errors"][0]["message"], "spent 500")
+        # the prepared copy of the file is removed
+        self.assertEqual(os.listdir(tempfile.gettempdir()).count(os.path.basename(csv_file)), 1)
+
+    def test_file_path(self):
+        handle, csv_file = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "wb") as outfile:
+            outfile.write(self.csv)
+        self.addCleanup(os.remove, csv_file)
+
+        stream = stream_validators_to({"source": csv_file, "format": "csv", "headers": 1}, "text/csv")
+        row_numbers = [row["row_number"] for row in stream]
+
+        self.assertEqual(row_numbers, [2, 3, 4, 5, 6])
+        self.assertEqual(stream.get_output()["tables"][0]["valid_row_count"], 1)
+
+
+class TestJsonValidationStream(RuleFileMixin, SimpleTestCase):
+
+    data = [{"spent": 1, "name": "pens"}, {"spent": -1}, {"spent": 2.5, "name": 3}, {"spent": "none"}]
+
+    def use_schema(self, schema):
+        self.use_validators({self.make_rule_file(schema): JSONSCHEMA})
+
+    def assertStreamed(self, document, expected_valid_rows):
+        expected = apply_validators_to(document, "application/json")
+
+        stream = stream_validators_to({"source": json.dumps(document).encode()}, "application/json")
+        rows = list(stream)
+        result = stream.get_output()
+
+        self.assertEqual(rows, expected["tables"][0]["rows"])
+        self.assertEqual(result["valid"], expected["valid"])
+        self.assertEqual(result["tables"][0]["valid_row_count"], expected_valid_rows)
+        for key in ("whole_table_errors", "valid_row_count", "invalid_row_count"):
+            self.assertEqual(result["tables"][0][key], expected["tables"][0][key])
+
+    def test_array_elements(self):
+        self.use_schema(
+            {
+                "definitions": {"amount": {"type": "number", "minimum": 0}},
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"spent": {"$ref": "#/definitions/amount"}, "name": {"type": "string"}},
+                },
+            }
+        )
+        with patch("data_ingest.validators.json.JsonschemaValidator.validate") as validate:
+            stream = stream_validators_to({"source": json.dumps(self.data).encode()}, "application/json")
+            rows = list(stream)
+        validate.assert_not_called()
+        self.assertEqual([row["row_number"] for row in rows], [0, 1, 2, 3])
+        self.assertEqual(rows[2]["data"], {"spent": 2.5, "name": 3})
+        self.assertEqual([error["code"] for error in rows[2]["errors"]], ["type"])
+        self.assertEqual(rows[2]["errors"][0]["fields"], ["name"])
+
+        self.assertStreamed(self.data, 1)
+        with patch("data_ingest.validators.streaming.ijson", None):
+            self.assertStreamed(self.data, 1)
+
+    def test_whole_array_schema(self):
+        self.use_schema({"type": "array", "minItems": 5, "items": {"type": "object"}})
+        self.assertStreamed(self.data, 3)
+
+    def test_not_an_array(self):
+        self.use_schema({"type": "object", "required": ["spent"]})
+        self.assertStreamed({"name": "pens"}, 0)
+
+    def test_file_object(self):
+        self.use_schema({"type": "array", "items": {"required": ["name"]}})
+        stream = stream_validators_to({"source": io.BytesIO(json.dumps(self.data).encode())}, "application/json")
+        self.assertEqual([bool(row["errors"]) for row in stream], [False, True, False, True])
@@ -1,8 +1,12 @@
 from django.test import SimpleTestCase
 from unittest.mock import patch
 import json
+from decimal import Decimal
 
 from data_ingest.utils import (
+  cast_rows,
+  cast_value,
+  get_schema_casts,
   get_schema_headers,
   get_ordered_headers,
   reorder_csv,
@@ -104,3 +108,72 @@ class TestReorderCSV(SimpleTestCase):
                    {'STREAM_ARGS': {'headers': ['c', 'a', 'b']}}):
             data = {'source': b'$q,$r,$e\n1,2,3\n4,5,6\n'}
             self.assertEqual({'source': b'c,a,b\n1,2,3\n4,5,6\n'}, reorder_csv(data))
+
+
+class TestCastValue(SimpleTestCase):
+
+    def test_same_as_decimal(self):
+        def through_decimal(value):
+            dvalue = Decimal(value.strip().replace(',', ''))
+            (ivalue, fvalue) = (int(dvalue), float(dvalue))
+            return ivalue if ivalue == fvalue else fvalue
+
+        for value in ('12', ' -7 ', '+3', '007', '1,234', '1_000', '2.5', '-.5', '-0.0', '10.', '2e3',
+                      '9007199254740993', '9007199254740993.0', '0.99999999999999999999', '1e400'):
+            with self.subTest(value=value):
+                result = cast_value(value)
+                self.assertEqual(result, through_decimal(value))
+                self.assertIs(type(result), type(through_decimal(value)))
+
+    def test_not_numbers(self):
+        for value in ('', ' abc ', 'NaN', '1 2', '1..2', '-'):
+            with self.subTest(value=value):
+                self.assertEqual(cast_value(value), value.strip())
+        self.assertIsNone(cast_value(None))
+        self.assertEqual(cast_value(2.5), 2.5)
+
+
+@patch("data_ingest.utils.UPLOAD_SETTINGS", {'CAST_BY_SCHEMA': True})
+@patch("data_ingest.utils.get_schema")
+class TestSchemaCasts(SimpleTestCase):
+
+    schema = {
+        'fields': [
+            {'name': 'count', 'type': 'integer'},
+            {'name': 'amount', 'type': 'number'},
+            {'name': 'flag', 'type': 'boolean', 'trueValues': ['yes'], 'falseValues': ['no']},
+            {'name': 'code', 'type': 'string'},
+            {'name': 'other', 'type': 'any'},
+        ]
+    }
+
+    def test_cast_by_type(self, mock_schema):
+        mock_schema.return_value = self.schema
+        rows = [
+            {'count': '3', 'amount': '2.5', 'flag': 'yes', 'code': ' 007', 'other': '1,000', 'extra': '2.0'},
+            {'count': '', 'amount': '1,000', 'flag': 'maybe', 'code': '', 'other': 'x', 'extra': 'y'},
+            {'count': '4', 'amount': '10', 'flag': 'no'},
+        ]
+        self.assertEqual(
+            cast_rows(rows, get_schema_casts()),
+            [
+                {'count': 3, 'amount': 2.5, 'flag': True, 'code': ' 007', 'other': 1000, 'extra': 2},
+                {'count': None, 'amount': 1000, 'flag': None, 'code': '', 'other': 'x', 'extra': 'y'},
+                {'count': 4, 'amount': 10, 'flag': False},
+            ],
+        )
+        self.assertIs(type(cast_rows(rows, get_schema_casts())[2]['amount']), int)
+
+    def test_json_values(self, mock_schema):
+        mock_schema.return_value = self.schema
+        rows = [{'count': 2.5, 'amount': 3.0, 'flag': True}, {'count': 7, 'amount': None, 'flag': 'yes'}]
+        self.assertEqual(
+            cast_rows(rows, get_schema_casts()),
+            [{'count': None, 'amount': 3, 'flag': True}, {'count': 7, 'amount': None, 'flag': True}],
+        )
+
+    def test_off(self, mock_schema):
+        mock_schema.return_value = self.schema
+        with patch.dict("data_ingest.utils.UPLOAD_SETTINGS", {'CAST_BY_SCHEMA': False}):
+            self.assertEqual(get_schema_casts(), {})
+        self.assertEqual(cast_rows([{'code': ' 007'}]), [{'code': 7}])
@@ -0,0 +1,49 @@
+import os
+from django.test import SimpleTestCase
+
+# This ingest_settings file is imported because there was a weird order that this needs to be imported before
+# ingestor so that it will not run into a data_ingest.ingestors.Ingestor not found when importing Ingestor
+import data_ingest.ingest_settings  # noqa: F401
+from data_ingest.validators.validator import ValidatorRegistry
+from .helpers import GOODTABLES, JSONLOGIC, RuleFileMixin, write_rules
+
+
+class TestValidatorRegistry(RuleFileMixin, SimpleTestCase):
+    def setUp(self):
+        self.registry = ValidatorRegistry()
+        self.rule_file = self.make_rule_file([{"code": {"==": [1, 1]}, "message": "first", "columns": []}])
+
+    def write_rules(self, rules, mtime=None):
+        write_rules(self.rule_file, rules, mtime)
+
+    def test_validators_built_once(self):
+        config = {None: GOODTABLES, self.rule_file: JSONLOGIC}
+        first = self.registry.validators(config)
+        second = self.registry.validators(config)
+
+        self.assertEqual(len(first), 2)
+        self.assertIs(first, second)
+        self.assertEqual(self.registry.stats(), {"hits": 1, "misses": 1, "reloads": 0})
+
+    def test_reload_on_change(self):
+        config = {None: GOODTABLES, self.rule_file: JSONLOGIC}
+        (goodtables, jsonlogic) = self.registry.validators(config)
+        self.assertEqual(jsonlogic.validator[0]["message"], "first")
+
+        self.write_rules(
+            [{"code": {"==": [1, 1]}, "message": "second", "columns": []}],
+            mtime=os.stat(self.rule_file).st_mtime + 10,
+        )
+        (new_goodtables, new_jsonlogic) = self.registry.validators(config)
+
+        self.assertEqual(new_jsonlogic.validator[0]["message"], "second")
+        self.assertIsNot(new_jsonlogic, jsonlogic)
+        # validators whose rule files did not change are carried over
+        self.assertIs(new_goodtables, goodtables)
+        self.assertEqual(self.registry.stats(), {"hits": 0, "misses": 1, "reloads": 1})
+
+    def test_get(self):
+        validator = self.registry.get(self.rule_file, JSONLOGIC)
+        self.assertIs(validator, self.registry.get(self.rule_file, JSONLOGIC))
+        self.registry.clear()
+        self.assertIsNot(validator, self.registry.get(self.rule_file, JSONLOGIC))
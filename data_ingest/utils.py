@@ -1,25 +1,43 @@
 import csv
+import gc
 import json
 import io
 import logging
+import math
+import os
+import stat
+import tempfile
 from collections import OrderedDict
-from django.utils.module_loading import import_string
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ImproperlyConfigured
 from .ingest_settings import UPLOAD_SETTINGS
 
 logger = logging.getLogger('ReVAL')
 
 
-def get_schema_headers():
-    ordered_header = []
-
+def get_schema_validator():
+    """The first GoodtablesValidator in UPLOAD_SETTINGS['VALIDATORS'] with a Table Schema, or None"""
     good_table_validator = 'data_ingest.ingestors.GoodtablesValidator'
     schema = [loc for loc, val_type in UPLOAD_SETTINGS['VALIDATORS'].items()
               if val_type == good_table_validator and loc is not None]
     if schema:
-        validator = import_string(good_table_validator)(name=good_table_validator, filename=schema[0])
-        contents = validator.get_validator_contents()
-        ordered_header = [field['name'] for field in contents.get('fields', [])]
-    return ordered_header
+        # imported here since the validators module imports this one
+        from .validators.validator import registry
+        return registry.get(schema[0], good_table_validator)
+    return None
+
+
+def get_schema():
+    """The Table Schema of the first GoodtablesValidator in UPLOAD_SETTINGS['VALIDATORS'], or {}"""
+    validator = get_schema_validator()
+    if validator:
+        return validator.get_validator_contents()
+    return {}
+
+
+def get_schema_headers():
+    return [field['name'] for field in get_schema().get('fields', [])]
 
 
 def get_ordered_headers(headers):
@@ -97,6 +115,17 @@ def reorder_csv(incoming):
     csvbuffer = io.StringIO(data['source'].decode('UTF-8'))
 
     output = io.StringIO()
+    write_reordered_csv(csvbuffer, output)
+
+    data['source'] = output.getvalue().encode('UTF-8')
+    return data
+
+
+def write_reordered_csv(csvbuffer, output):
+    """
+    Write the CSV read from the text file `csvbuffer` to the text file `output`, with its columns in order
+    (see `get_ordered_headers`), as `reorder_csv` does; one line is read at a time
+    """
     headers = []
     header_mapping = {}
     writer = None
@@ -121,5 +150,240 @@ def reorder_csv(incoming):
         else:
             writer.writerow(OrderedDict([(header_mapping.get(k, k), v) for k, v in row.items()]))
 
-    data['source'] = output.getvalue().encode('UTF-8')
-    return data
+
+# Integers that are exact as floats
+EXACT = 2 ** 53
+
+
+def cast_value(value):
+    """
+    Clean a value and cast it to its type, i.e. "123" is an integer, so it becomes 123
+
+    Strings are stripped and thousands separators dropped.  A number is an int when it has no fraction,
+    i.e. "-12.0" becomes -12, and a float otherwise; anything else is left as the stripped string.
+
+    :param value: value to cast; only strings are changed
+    :return: the value as an integer, float or string
+    """
+    if type(value) is not str:
+        return value
+    value = value.strip()
+    number = value.replace(',', '') if ',' in value else value
+    if not number:
+        return value
+
+    # Plain integers and fractions don't need Decimal: int() and float() read them just the same
+    if number[0] in '0123456789+-.':
+        try:
+            if '.' in number:
+                fnumber = float(number)
+                if math.isfinite(fnumber) and not fnumber.is_integer():
+                    return fnumber
+            else:
+                inumber = int(number)
+                if -EXACT < inumber < EXACT:
+                    return inumber
+        except ValueError:
+            pass
+
+    try:
+        dnumber = Decimal(number)
+        try:
+            inumber = int(dnumber)
+            fnumber = float(dnumber)
+            return inumber if inumber == fnumber else fnumber
+        except ValueError:
+            # will take the stripped value
+            pass
+    except InvalidOperation:
+        # will take the stripped value
+        pass
+    return value
+
+
+def cast_row(row, casts=None):
+    """
+    Cast every value of a row with `cast_value`, or with its column's cast from `get_schema_casts`
+
+    :param row: dictionary of header -> value
+    :param casts: (optional) dictionary of header -> (column cast, value cast), see `get_schema_casts`
+    :return: a new dictionary with the same keys, in the same order
+    """
+    if not casts:
+        return {key: cast_value(value) for (key, value) in row.items()}
+    return {key: casts[key][1](value) if key in casts else cast_value(value) for (key, value) in row.items()}
+
+
+def cast_rows(rows, casts=None):
+    """
+    Cast every value of many rows, as `cast_row` does, a column at a time
+
+    Columns of strings with a column cast are cast by it in one pass, and value by value only if it fails.
+
+    :param rows: list of dictionaries of header -> value
+    :param casts: (optional) dictionary of header -> (column cast, value cast), see `get_schema_casts`
+    :return: a list of new dictionaries
+    """
+    if not casts or not rows:
+        return [cast_row(row, casts) for row in rows]
+
+    keys = tuple(rows[0])
+    uniform = [tuple(row) == keys for row in rows]
+    columns = []
+    for key in keys:
+        values = [row[key] for (row, same) in zip(rows, uniform) if same]
+        if key not in casts:
+            columns.append([cast_value(value) for value in values])
+            continue
+        (column_cast, cast) = casts[key]
+        try:
+            if set(map(type, values)) != {str}:
+                raise TypeError
+            columns.append(column_cast(values))
+        except (ValueError, TypeError, KeyError, OverflowError):
+            columns.append([cast(value) for value in values])
+
+    typed = iter(zip(*columns))
+    return [dict(zip(keys, next(typed))) if same else cast_row(row, casts) for (row, same) in zip(rows, uniform)]
+
+
+def integral(number):
+    """A float as an int when it has no fraction, as `cast_value` gives it"""
+    if type(number) is float and number.is_integer() and -EXACT < number < EXACT:
+        return int(number)
+    return number
+
+
+def to_numbers(values):
+    """A number column of strings as ints and floats, as `to_number` gives them; raises ValueError otherwise"""
+    return [
+        int(number) if number.is_integer() and -EXACT < number < EXACT else number
+        for number in map(float, values)
+    ]
+
+
+def to_integer(value):
+    """An integer column's value as an int, or None"""
+    if type(value) is int:
+        return value
+    if type(value) is str:
+        try:
+            return int(value)
+        except ValueError:
+            value = cast_value(value)
+            if type(value) is int:
+                return value
+    return None
+
+
+def to_number(value):
+    """A number column's value as an int or float, or None"""
+    if type(value) in (int, float):
+        return integral(value)
+    if type(value) is str:
+        try:
+            return integral(float(value))
+        except ValueError:
+            value = cast_value(value)
+            if type(value) in (int, float):
+                return value
+    return None
+
+
+def get_schema_casts():
+    """
+    How to cast the columns whose type the Table Schema declares, if UPLOAD_SETTINGS['CAST_BY_SCHEMA'] is set
+
+    integer and year columns become ints, number columns numbers (as ints when they have no fraction, like
+    `cast_value` gives them), and boolean columns True or False, by the field's trueValues and falseValues.
+    Values that aren't of the column's type, including missing ones, become None.  Columns of other types
+    (string, date...) keep their values as received.  Columns of type any, and columns the schema doesn't
+    have, are left out, so `cast_value` guesses their types.
+
+    :return: dictionary of column name -> (column cast, value cast); the column cast takes a list of strings
+             and may raise, the value cast takes any one value and never raises
+    """
+    if not UPLOAD_SETTINGS['CAST_BY_SCHEMA']:
+        return {}
+
+    casts = {}
+    for field in get_schema().get('fields', []):
+        field_type = field.get('type', 'string')
+        if field_type in ('integer', 'year'):
+            casts[field['name']] = (lambda values: list(map(int, values)), to_integer)
+        elif field_type == 'number':
+            casts[field['name']] = (to_numbers, to_number)
+        elif field_type == 'boolean':
+            booleans = dict.fromkeys(field.get('falseValues', ['false', 'False', 'FALSE', '0']), False)
+            booleans.update(dict.fromkeys(field.get('trueValues', ['true', 'True', 'TRUE', '1']), True))
+            casts[field['name']] = (
+                lambda values, booleans=booleans: list(map(booleans.__getitem__, values)),
+                lambda value, booleans=booleans: value if type(value) is bool else booleans.get(str(value)),
+            )
+        elif field_type != 'any':
+            casts[field['name']] = (list, lambda value: value)
+    return casts
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector while building many objects that can't form cycles (i.e. the rows of a
+    validation output), since collections triggered by them would only walk every live object in vain
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def private_directory(name):
+    """
+    A directory in the system's temporary directory that only the current user can use, for caches that
+    weren't given a directory of their own
+
+    The temporary directory is shared, so the directory is created with mode 0700, and refused if it
+    already exists but belongs to another user or is open to others (anything in it could have been
+    planted there).
+
+    :param name: name of the directory; the user id is added to it
+    :return: path of the directory
+    :raises: ImproperlyConfigured if the directory can't be trusted
+    """
+    uid = os.getuid() if hasattr(os, 'getuid') else None
+    directory = os.path.join(tempfile.gettempdir(), name if uid is None else f'{name}-{uid}')
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        raise ImproperlyConfigured(f'Unable to create {directory}: {e}')
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode) or (
+        uid is not None and (status.st_uid != uid or status.st_mode & 0o077)
+    ):
+        raise ImproperlyConfigured(f'{directory} is not a directory private to this user')
+    return directory
+
+
+def write_atomically(path, text):
+    """
+    Write a text file so that readers never see it half-written: to a temporary file of its own (so that
+    concurrent writers don't mix their content), which then replaces `path`
+    """
+    outfile = tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', dir=os.path.dirname(path), suffix='.tmp', delete=False
+    )
+    try:
+        with outfile:
+            outfile.write(text)
+        os.replace(outfile.name, path)
+    except BaseException:
+        try:
+            os.remove(outfile.name)
+        except OSError:
+            pass
+        raise
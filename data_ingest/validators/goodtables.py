@@ -1,26 +1,35 @@
 import io
+from collections import defaultdict
 
 import goodtables
 
 from .validator import (
+    ParsedTable,
     Validator,
     ValidatorOutput,
     UnsupportedException,
     UnsupportedContentTypeException,
 )
-from .. import utils
 
 
 class GoodtablesValidator(Validator):
     def validate(self, source, content_type):
+        return self.validate_table(ParsedTable(source, content_type))
 
-        if content_type == "application/json":
-            data = utils.to_tabular(source)
-        elif content_type == "text/csv":
-            data = utils.reorder_csv(source)
-        else:
-            raise UnsupportedContentTypeException(content_type, type(self).__name__)
+    def validate_table(self, table, max_errors=None, known_errors=None):
+
+        if table.content_type not in ("application/json", "text/csv"):
+            raise UnsupportedContentTypeException(table.content_type, type(self).__name__)
 
+        params = self.validate_params(table.data)
+        if max_errors:
+            # one more than needed, so that we can tell whether anything was left out
+            params["error_limit"] = max_errors + 1
+        result = goodtables.validate(**params)
+        return self.formatted(table, result, max_errors)
+
+    def validate_params(self, data):
+        """Arguments for `goodtables.validate` for a source in tabulator form"""
         try:
             data["source"].decode()
             byteslike = True
@@ -31,13 +40,105 @@ class GoodtablesValidator(Validator):
             validate_params = data.copy()
             validate_params["schema"] = self.validator
             validate_params["source"] = io.BytesIO(data["source"])
+        elif isinstance(data, dict) and (
+            isinstance(data.get("source"), str) or hasattr(data.get("source"), "read")
+        ):
+            # a file path or file object, left for goodtables to read
+            validate_params = dict(data, schema=self.validator)
         else:
             validate_params = {"source": data, "schema": self.validator, "headers": 1}
+        return validate_params
+
+    def errors_by_row(self, source, content_type):
+        """
+        Index goodtables errors by row without parsing the rows themselves, for streamed validation.
+
+        The source is checked as it is given; `ValidationStream` gives it with its columns in order, as
+        `validate` checks it.
+        """
+        if content_type != "text/csv":
+            return super().errors_by_row(source, content_type)
 
-        result = goodtables.validate(**validate_params)
-        return self.formatted(data, result)
+        unformatted = goodtables.validate(**self.validate_params(source))
+        row_errors = defaultdict(list)
+        whole_table_errors = []
+        for (row_number, error) in self.errors(unformatted, None):
+            if row_number:
+                row_errors[row_number].append(error)
+            else:
+                whole_table_errors.append(error)
+        return (row_errors, whole_table_errors)
 
-    def formatted(self, source, unformatted):
+    def errors(self, unformatted, headers, row_number=None):
+        """
+        Iterate over goodtables errors in ReVAL's format
+
+        Parameters:
+        unformatted - output of `goodtables.validate`
+        headers - header names to mention in messages; defaults to the headers goodtables found
+        row_number - (optional) function of a row number in the validated source -> the row number to report,
+                     in errors and their messages (see `ParsedTable.row_number`)
+
+        Returns:
+        an iterator of (row number or None for whole table errors, error dictionary)
+        """
+        if len(unformatted["tables"]) > 1:
+            raise UnsupportedException("Input with > 1 table not supported.")
+
+        unformatted_table = unformatted["tables"][0]
+        if headers is None:
+            headers = unformatted_table.get("headers") or []
+
+        for err in unformatted_table["errors"]:
+            if row_number:
+                err = self.renumbered(err, row_number)
+            fields = []
+            message = err["message"]
+            # This is to include the header name with the column number and to define fields
+            if err.get("column-number"):
+                column_number = err["column-number"]
+                if len(headers) >= column_number:
+                    header = headers[column_number - 1]
+                    fields = [header]
+                    column_num = "column " + str(column_number)
+                    message = err["message"].replace(
+                        column_num, column_num + " (" + header + ")"
+                    )
+
+            yield (
+                err.get("row-number"),
+                ValidatorOutput.create_error("Error", err["code"], message, fields),
+            )
+
+    @staticmethod
+    def renumbered(err, row_number):
+        """
+        A goodtables error with its row numbers, and its message, mapped by `row_number`
+
+        Messages are made again from goodtables' templates; errors of checks goodtables doesn't know keep
+        theirs.
+        """
+        data = dict(err.get("message-data") or {})
+        if "row_numbers" in data:
+            data["row_numbers"] = ", ".join(
+                str(row_number(int(number))) if number.strip().isdigit() else number
+                for number in str(data["row_numbers"]).split(",")
+            )
+        err = dict(err, **{"message-data": data})
+        if err.get("row-number"):
+            err["row-number"] = row_number(err["row-number"])
+
+        template = goodtables.spec["errors"].get(err["code"], {}).get("message")
+        if template:
+            try:
+                err["message"] = template.format(
+                    row_number=err.get("row-number"), column_number=err.get("column-number"), **data
+                )
+            except (KeyError, IndexError, ValueError):
+                pass
+        return err
+
+    def formatted(self, table, unformatted, max_errors=None):
         """
         Transforms validation results to data-federation-ingest's expected format.
 
@@ -70,33 +171,25 @@ class GoodtablesValidator(Validator):
                 'valid_row_count': 2}],
             'valid': False}
     ``
-        """
-        if len(unformatted["tables"]) > 1:
-            raise UnsupportedException("Input with > 1 table not supported.")
 
-        unformatted_table = unformatted["tables"][0]
-        (headers, rows) = Validator.rows_from_source(source)
-        output = ValidatorOutput(rows, headers=unformatted_table.get("headers", []))
-
-        for err in unformatted_table["errors"]:
-            fields = []
-            message = err["message"]
-            # This is to include the header name with the column number and to define fields
-            if err.get("column-number"):
-                column_number = err["column-number"]
-                if len(headers) >= column_number:
-                    header = headers[column_number - 1]
-                    fields = [header]
-                    column_num = "column " + str(column_number)
-                    message = err["message"].replace(
-                        column_num, column_num + " (" + header + ")"
-                    )
+        `table` is the ParsedTable that was validated; the source in tabulator form (what `ParsedTable.data`
+        gives) is accepted too, and parsed again.
+        """
+        if isinstance(table, ParsedTable):
+            (headers, rows) = (table.headers, table.rows)
+        else:
+            (headers, rows) = Validator.rows_from_source(table)
+        output = ValidatorOutput(
+            rows, headers=unformatted["tables"][0].get("headers", []), max_errors=max_errors
+        )
 
-            if err.get("row-number"):
-                output.add_row_error(
-                    err["row-number"], "Error", err["code"], message, fields
-                )
+        renumber = table.row_number if isinstance(table, ParsedTable) and table.positions is not None else None
+        for (row_number, error) in self.errors(unformatted, headers, renumber):
+            if not output.count_error():
+                break
+            if row_number:
+                output.error_records[row_number].append(error)
             else:
-                output.add_whole_table_error("Error", err["code"], message, fields)
+                output.whole_table_errors.append(error)
 
         return output.get_output()
@@ -1,13 +1,60 @@
 import json_logic
 import jsonschema
+from django.core import exceptions
 
+from .jsonlogic_compiler import compile_logic
+from .jsonlogic_vector import Columns, Unvectorizable, compile_vector, numpy
 from .validator import Validator, ValidatorOutput, UnsupportedContentTypeException
 from .rowwise import RowwiseValidator
+from ..ingest_settings import UPLOAD_SETTINGS
 
 
 class JsonlogicValidator(RowwiseValidator):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Compile each rule once, rather than interpreting it for every row; keyed by the rule's
+        # `code` object, since rules themselves are left as loaded
+        self.compiled = {}
+        # rule index -> function of the columns of many rows, for UPLOAD_SETTINGS['VECTORIZE_JSONLOGIC']
+        self.vectorized = {}
+        for (index, rule) in enumerate(self.validator if isinstance(self.validator, list) else ()):
+            if isinstance(rule, dict) and rule.get("code"):
+                self.compiled[id(rule["code"])] = compile_logic(rule["code"])
+                try:
+                    self.vectorized[index] = compile_vector(rule["code"])
+                except Unvectorizable:
+                    pass
+
     def evaluate(self, rule, row):
-        return json_logic.jsonLogic(rule, row)
+        compiled = self.compiled.get(id(rule))
+        if compiled is None:
+            return json_logic.jsonLogic(rule, row)
+        return compiled(row)
+
+    def evaluate_rows(self, headers, rows):
+        """
+        Evaluate rules over NumPy columns, if UPLOAD_SETTINGS['VECTORIZE_JSONLOGIC'] is set
+
+        Rules with operators that can't be vectorized, or with columns missing from `headers`, are left
+        to `evaluate`, as are rows whose values can't be vectorized exactly.
+        """
+        if not UPLOAD_SETTINGS["VECTORIZE_JSONLOGIC"]:
+            return {}
+        if numpy is None:
+            raise exceptions.ImproperlyConfigured(
+                "DATA_INGEST['VECTORIZE_JSONLOGIC'] requires numpy"
+            )
+
+        columns = Columns(rows)
+        results = {}
+        for (index, vectorized) in self.vectorized.items():
+            if set(self.validator[index]["columns"]).issubset(headers):
+                try:
+                    results[index] = vectorized(columns)
+                except Unvectorizable:
+                    pass
+        return results
 
 
 class JsonlogicValidatorFailureConditions(JsonlogicValidator):
@@ -18,27 +65,80 @@ class JsonlogicValidatorFailureConditions(JsonlogicValidator):
     INVERT_LOGIC = True
 
 
+# Keywords a schema for an array can have and still be checked one element at a time: `items`, plus those that
+# don't constrain the array
+ARRAY_SCHEMA_KEYWORDS = {
+    "$schema", "$id", "id", "$comment", "title", "description", "default", "examples", "definitions", "$defs",
+    "type", "items",
+}
+
+
 class JsonschemaValidator(Validator):
-    def validate(self, source, content_type):
-        if content_type != "application/json":
-            raise UnsupportedContentTypeException(content_type, type(self).__name__)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Find the correct version of the validator to use for this schema, and check the schema, once rather
+        # than for every source; the validator keeps the `$ref`s it has resolved
+        validator_class = jsonschema.validators.validator_for(self.validator)
+        try:
+            validator_class.check_schema(self.validator)
+        except jsonschema.exceptions.SchemaError as e:
+            raise exceptions.ImproperlyConfigured(
+                "validator {} {} is not a valid JSON Schema: {}".format(self.name, self.filename, e.message)
+            )
+        self.json_validator = validator_class(self.validator)
+        self.item_schema = self.element_schema(self.validator)
+
+    @staticmethod
+    def element_schema(schema):
+        """
+        The schema every element of an array must match, if that is all the schema checks, so that an array can
+        be validated one element at a time (see `element_errors`)
+
+        Returns:
+        the `items` schema, or None if the schema checks anything about the array as a whole
+        """
+        if not isinstance(schema, dict) or not isinstance(schema.get("items"), dict):
+            return None
+        if schema.get("type", "array") != "array" or set(schema) - ARRAY_SCHEMA_KEYWORDS:
+            return None
+        return schema["items"]
 
-        # Find the correct version of the validator to use for this schema
-        json_validator = jsonschema.validators.validator_for(self.validator)(
-            self.validator
-        )
+    def element_errors(self, index, element):
+        """
+        Validate one element of an array against `item_schema`; the errors are those `validate` finds for it
+        in the whole array, with `$ref`s resolved against the whole schema
 
-        # Check the schema to make sure there's no error
-        json_validator.check_schema(self.validator)
+        Returns:
+        an iterator of (severity, code, message, fields) for each error
+        """
+        for error in self.json_validator.descend(element, self.item_schema, path=index):
+            yield ("Error", error.validator, error.message, list(error.path)[1:])
+
+    def validate_table(self, table, max_errors=None, known_errors=None):
+        result = self.validate(table.source, table.content_type, max_errors=max_errors)
+        if table.positions is not None:
+            # elements are numbered by their index, so a preview's are numbered by their place in the whole source
+            for row in result["tables"][0]["rows"]:
+                if isinstance(row["row_number"], int) and row["row_number"] < len(table.positions):
+                    row["row_number"] = table.positions[row["row_number"]]
+        return result
+
+    def validate(self, source, content_type, max_errors=None):
+        if content_type != "application/json":
+            raise UnsupportedContentTypeException(content_type, type(self).__name__)
 
         if type(source) is list:  # validating an array (list) of objects
-            output = ValidatorOutput(source)
+            output = ValidatorOutput(source, max_errors=max_errors)
         else:  # validating only one object but making it a list of objects
-            output = ValidatorOutput([source])
+            output = ValidatorOutput([source], max_errors=max_errors)
 
-        errors = json_validator.iter_errors(source)
+        errors = self.json_validator.iter_errors(source)
 
         for error in errors:
+            if output.full:
+                output.truncated = True
+                break
             if error.path:
                 output.add_row_error(
                     error.path[0],
@@ -0,0 +1,205 @@
+"""
+Compile JsonLogic rules into Python callables.
+
+`json_logic.jsonLogic(rule, data)` walks the rule, and looks up every operator, every time it is applied.
+`compile_logic(rule)` does that walk once, and returns a function of `data` made of closures that each
+apply one operation.  The operations themselves are json_logic's own, so results are the same; operations
+that are rarely used in rule files (unsupported or custom ones, and odd numbers of arguments) are handed
+to `jsonLogic` as they are.  So is every rule, if json_logic's internals (which aren't part of its API)
+aren't what this module expects.
+"""
+import json_logic
+
+try:
+    from json_logic import (
+        _common_operations,
+        _custom_operations,
+        _data_operations,
+        _get_operator,
+        _get_values,
+        _logical_operations,
+        _scoped_operations,
+        _truthy,
+        _var,
+    )
+except ImportError:
+    _get_operator = None
+
+
+def compile_logic(logic):
+    """
+    Compile a JsonLogic rule
+
+    :param logic: a JsonLogic rule, i.e. {"<=": [{"var": "spent"}, {"var": "budget"}]}
+    :return: a function of data that returns the same as `json_logic.jsonLogic(logic, data)`
+    """
+    if _get_operator is None:
+        return _interpreted(logic)
+
+    if isinstance(logic, (list, tuple)):
+        items = [compile_logic(item) for item in logic]
+        return lambda data: [item(data) for item in items]
+
+    if not json_logic.is_logic(logic):
+        return lambda data: logic
+
+    operator = _get_operator(logic)
+    values = _get_values(logic, operator)
+
+    if operator in _logical_operations:
+        return _compile_logical(logic, operator, [compile_logic(value) for value in values])
+    if operator in _scoped_operations:
+        return _compile_scoped(logic, operator, values)
+    if operator == "var":
+        return _compile_var(logic, values)
+    if operator in _data_operations:
+        operation = _data_operations[operator]
+        args = [compile_logic(value) for value in values]
+        return lambda data: operation(data or {}, *[arg(data) for arg in args])
+    if operator in _common_operations and operator not in _custom_operations:
+        return _compile_common(_common_operations[operator], [compile_logic(value) for value in values])
+
+    # custom, unsupported (which warn on every use) or unknown operations
+    return _interpreted(logic)
+
+
+def _interpreted(logic):
+    return lambda data: json_logic.jsonLogic(logic, data)
+
+
+def _compile_common(operation, args):
+    # evaluate every argument, in order, before applying the operation, like jsonLogic does
+    if len(args) == 1:
+        (a,) = args
+        return lambda data: operation(a(data))
+    if len(args) == 2:
+        (a, b) = args
+        return lambda data: operation(a(data), b(data))
+    if len(args) == 3:
+        (a, b, c) = args
+        return lambda data: operation(a(data), b(data), c(data))
+    return lambda data: operation(*[arg(data) for arg in args])
+
+
+def _compile_var(logic, values):
+    if not values or any(json_logic.is_logic(value) or isinstance(value, (list, tuple)) for value in values):
+        args = [compile_logic(value) for value in values]
+        return lambda data: _var(data or {}, *[arg(data) for arg in args])
+
+    if len(values) > 2:
+        # jsonLogic raises a TypeError
+        return _interpreted(logic)
+    name = values[0]
+    default = values[1] if len(values) > 1 else None
+    if name is None or name == "":
+        return lambda data: data or {}
+
+    keys = str(name).split(".")
+    if len(keys) > 1:
+        return lambda data: _var(data or {}, name, default)
+
+    (key,) = keys
+
+    def var(data):
+        try:
+            return (data or {})[key]
+        except KeyError:
+            return default
+        except (TypeError, ValueError):
+            return _var(data or {}, name, default)
+
+    return var
+
+
+def _compile_logical(logic, operator, args):
+    truthy = _truthy
+
+    if operator == "and":
+
+        def and_(data):
+            current = False
+            for arg in args:
+                current = arg(data)
+                if not truthy(current):
+                    return current
+            return current
+
+        return and_
+
+    if operator == "or":
+
+        def or_(data):
+            current = False
+            for arg in args:
+                current = arg(data)
+                if truthy(current):
+                    return current
+            return current
+
+        return or_
+
+    if operator == "?:" and len(args) != 3:
+        return _interpreted(logic)
+
+    # "if", and "?:" which is an "if" with three arguments
+    pairs = [(args[i], args[i + 1]) for i in range(0, len(args) - 1, 2)]
+    otherwise = args[-1] if len(args) % 2 else None
+
+    def if_(data):
+        for (condition, then) in pairs:
+            if truthy(condition(data)):
+                return then(data)
+        if otherwise is not None:
+            return otherwise(data)
+        return None
+
+    return if_
+
+
+def _compile_scoped(logic, operator, values):
+    truthy = _truthy
+    arity = {"reduce": (2, 3)}.get(operator, (2,))
+    if len(values) not in arity:
+        return _interpreted(logic)
+
+    scoped_data = compile_logic(values[0])
+    scoped_logic = compile_logic(values[1])
+
+    def items(data):
+        items = scoped_data(data or {})
+        return items if isinstance(items, (list, tuple)) else None
+
+    if operator == "filter":
+        return lambda data: [datum for datum in (items(data) or []) if truthy(scoped_logic(datum))]
+    if operator == "map":
+        return lambda data: [scoped_logic(datum) for datum in (items(data) or [])]
+    if operator == "none":
+        return lambda data: not any([truthy(scoped_logic(datum)) for datum in (items(data) or [])])
+    if operator == "some":
+        return lambda data: any([truthy(scoped_logic(datum)) for datum in (items(data) or [])])
+    if operator == "all":
+
+        def all_(data):
+            scoped = items(data)
+            if not scoped:
+                return False
+            for datum in scoped:
+                if not truthy(scoped_logic(datum)):
+                    return False
+            return True
+
+        return all_
+
+    # reduce
+    initial = values[2] if len(values) > 2 else None
+
+    def reduce_(data):
+        scoped = items(data)
+        if scoped is None:
+            return initial
+        accumulator = initial
+        for current in scoped:
+            accumulator = scoped_logic({"accumulator": accumulator, "current": current})
+        return accumulator
+
+    return reduce_
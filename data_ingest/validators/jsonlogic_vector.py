@@ -0,0 +1,453 @@
+"""
+Evaluate JsonLogic rules over whole columns at once, with NumPy.
+
+`compile_vector(rule)` turns a rule into a function of a `Columns` table that returns, for every row, whether
+the rule holds, and which rows it couldn't decide: rows with missing values, values that json_logic would
+raise an error on, or numbers too large to be exact as floats.  Those rows are left to `json_logic.jsonLogic`,
+as are rules with operators this module doesn't know, so results are the same as evaluating row by row.
+
+Supported operators are `==`, `!=`, `<`, `<=`, `>`, `>=`, `+`, `-`, `*`, `/`, `!`, `!!`, `and`, `or`, `if`,
+`?:` and `in` (with a list of constants, or a string constant within a column).
+"""
+import json_logic
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from json_logic import _custom_operations, _get_operator, _get_values, _to_numeric as _json_logic_numeric
+except ImportError:
+    # json_logic's internals, which aren't part of its API, aren't what this module expects
+    _get_operator = None
+
+# integers smaller than this are exact as floats
+EXACT = 2 ** 53
+
+
+class Unvectorizable(Exception):
+    """The rule, or the values it is applied to, can't be evaluated over columns"""
+
+
+class Vector:
+    """
+    Values of an expression for every row (or one value, for constants)
+
+    `kind` is "str", "num" or "bool"; `unknown` marks rows whose value can't be relied on, and `text`
+    returns what `str()` of each value would be, for JsonLogic's string comparisons.
+    """
+
+    def __init__(self, kind, values, unknown=False, text=None):
+        self.kind = kind
+        self.values = numpy.asarray(values, dtype=bool) if kind == "bool" else values
+        self.unknown = numpy.asarray(unknown, dtype=bool)
+        self._text = text
+
+    @property
+    def text(self):
+        if callable(self._text):
+            self._text = self._text()
+        elif self._text is None:
+            self._text = self.format()
+        return self._text
+
+    def format(self):
+        if self.kind == "bool":
+            return numpy.where(self.values, "True", "False")
+        # results of arithmetic, which json_logic turns into ints when they are whole numbers
+        if numpy.ndim(self.values) == 0:
+            return _format_number(float(self.values))
+        return numpy.array([_format_number(value) for value in self.values.tolist()], dtype=str)
+
+    @property
+    def truth(self):
+        if self.kind == "str":
+            return numpy.asarray(self.values != "", dtype=bool)
+        if self.kind == "num":
+            return numpy.asarray(self.values != 0, dtype=bool)
+        return self.values
+
+    def numeric(self):
+        """(float values, unknown) as json_logic would convert them for arithmetic and comparisons"""
+        if self.kind == "num":
+            return (self.values, self.unknown)
+        if self.kind != "str":
+            raise Unvectorizable(f"{self.kind} values aren't converted to numbers")
+        if getattr(self, "_numeric", None) is None:
+            if numpy.ndim(self.values) == 0:
+                (value, bad) = _to_numeric(self.values)
+                if bad:
+                    raise Unvectorizable(f"{self.values!r} isn't a number")
+                self._numeric = (numpy.float64(value), self.unknown)
+            else:
+                (values, bad) = _to_numerics(self.values)
+                self._numeric = (values, self.unknown | bad)
+        return self._numeric
+
+
+def _format_number(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _to_numeric(value):
+    """(json_logic's numeric value as a float, whether that fails or isn't exact)"""
+    try:
+        number = _json_logic_numeric(value)
+    except (TypeError, ValueError, OverflowError):
+        return (0.0, True)
+    if not abs(number) < EXACT:
+        return (0.0, True)
+    return (float(number), False)
+
+
+def _to_numerics(strings):
+    """
+    `_to_numeric` of an array of strings, as (floats, whether each fails or isn't exact)
+
+    json_logic converts strings with a "." with `float`, and others with `int`; each group is converted in one
+    go, and only converted string by string if one of them fails.
+    """
+    values = numpy.zeros(len(strings))
+    bad = strings == ""
+    dotted = numpy.char.find(strings, ".") >= 0
+    for (group, convert) in ((dotted & ~bad, float), (~dotted & ~bad, int)):
+        if not group.any():
+            continue
+        try:
+            values[group] = numpy.array(list(map(convert, strings[group].tolist())), dtype=float)
+        except (ValueError, OverflowError):
+            converted = [_to_numeric(string) for string in strings[group].tolist()]
+            values[group] = [value for (value, failed) in converted]
+            bad[group] = [failed for (value, failed) in converted]
+    return (values, bad | _inexact(values))
+
+
+class Columns:
+    """The columns of a list of row dictionaries, built as rules ask for them"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.length = len(rows)
+        self._columns = {}
+
+    def column(self, name):
+        if name not in self._columns:
+            self._columns[name] = self.build(name)
+        return self._columns[name]
+
+    def build(self, name):
+        raw = [row.get(name) for row in self.rows]
+        types = set(map(type, raw))
+        if type(None) in types:
+            types.discard(type(None))
+            missing = numpy.fromiter((value is None for value in raw), bool, count=self.length)
+            present = [value for value in raw if value is not None]
+        else:
+            (missing, present) = (False, raw)
+
+        if types <= {str}:
+            # NumPy strings can't end with a null character
+            if "\0" in "".join(present):
+                raise Unvectorizable(f"{name} has null characters")
+            if present is not raw:
+                raw = ["" if value is None else value for value in raw]
+            values = numpy.array(raw, dtype=str)
+            return Vector("str", values, missing, text=values)
+
+        if types <= {int, float}:
+            try:
+                values = numpy.array([0 if value is None else value for value in raw], dtype=float)
+            except OverflowError:
+                raise Unvectorizable(f"{name} has numbers too large for floats")
+            with numpy.errstate(invalid="ignore"):
+                unknown = missing | _inexact(values)
+            return Vector(
+                "num", values, unknown, text=lambda: numpy.array([str(value) for value in raw], dtype=str)
+            )
+
+        raise Unvectorizable(f"{name} has values of types {types}")
+
+
+def compile_vector(logic, boolean=True):
+    """
+    Compile a JsonLogic rule for evaluation over columns
+
+    :param logic: a JsonLogic rule
+    :param boolean: whether only the truth of the result matters (true for a whole rule)
+    :return: function of a `Columns` table, returning (list of results, with None for rows that have to be
+      evaluated on their own)
+    :raises Unvectorizable: if the rule uses operators that aren't supported, NumPy isn't installed, or the
+      installed json_logic isn't one this module knows
+    """
+    if numpy is None:
+        raise Unvectorizable("NumPy isn't installed")
+    if _get_operator is None:
+        raise Unvectorizable("json_logic's internals aren't as expected")
+    expression = _compile(logic, boolean)
+
+    def evaluate(columns):
+        with numpy.errstate(all="ignore"):
+            result = expression(columns)
+            truth = numpy.broadcast_to(result.truth, (columns.length,))
+            unknown = numpy.broadcast_to(result.unknown, (columns.length,))
+        return numpy.where(unknown, None, truth).tolist()
+
+    return evaluate
+
+
+def _compile(logic, boolean=False):
+    if isinstance(logic, (list, tuple)):
+        raise Unvectorizable("lists are only supported by `in`")
+    if not json_logic.is_logic(logic):
+        return _constant(logic)
+
+    operator = _get_operator(logic)
+    values = _get_values(logic, operator)
+    if operator in _custom_operations:
+        raise Unvectorizable(f"{operator} is a custom operation")
+
+    if operator == "var":
+        return _compile_var(values)
+    if operator in ("and", "or") and boolean and values:
+        return _compile_logical(operator, [_compile(value, True) for value in values])
+    if operator == "if" or (operator == "?:" and len(values) == 3):
+        # conditions only need their truth; branches give the value of the `if`
+        conditions = {i for i in range(0, len(values) - 1, 2)}
+        return _compile_if([_compile(value, boolean or i in conditions) for (i, value) in enumerate(values)], boolean)
+    if operator in ("!", "!!") and len(values) == 1:
+        return _compile_not(_compile(values[0], True), operator == "!")
+    if operator == "in" and len(values) == 2:
+        return _compile_in(values)
+    if operator in _comparisons and len(values) == 2:
+        return _compile_binary(_comparisons[operator], [_compile(value) for value in values])
+    if operator in _arithmetic and len(values) in _arithmetic[operator][1]:
+        return _compile_arithmetic(_arithmetic[operator][0], [_compile(value) for value in values])
+
+    raise Unvectorizable(f"{operator} with {len(values)} arguments isn't supported")
+
+
+def _constant(value):
+    if isinstance(value, str):
+        if value.endswith("\0"):
+            raise Unvectorizable("null characters aren't supported")
+        vector = Vector("str", value, text=value)
+    elif isinstance(value, bool):
+        vector = Vector("bool", value, text=str(value))
+    elif isinstance(value, (int, float)) and abs(value) < EXACT:
+        vector = Vector("num", numpy.float64(value), text=str(value))
+    else:
+        raise Unvectorizable(f"{value!r} isn't supported")
+    return lambda columns: vector
+
+
+def _compile_var(values):
+    if len(values) != 1 or not isinstance(values[0], (str, int)) or isinstance(values[0], bool):
+        raise Unvectorizable("only `var`s with a name are supported")
+    name = str(values[0])
+    if name == "" or "." in name:
+        raise Unvectorizable("only `var`s of a column are supported")
+    return lambda columns: columns.column(name)
+
+
+def _compile_logical(operator, args):
+    def logical(columns):
+        # rows stop at the first falsy (`and`) or truthy (`or`) value, like json_logic does
+        result = numpy.zeros(columns.length, bool) if operator == "or" else numpy.ones(columns.length, bool)
+        undecided = numpy.ones(columns.length, bool)
+        unknown = numpy.zeros(columns.length, bool)
+        for arg in args:
+            vector = arg(columns)
+            truth = vector.truth if operator == "and" else ~vector.truth
+            unknown |= undecided & vector.unknown
+            stopped = undecided & ~vector.unknown & ~truth
+            result[stopped] = operator == "or"
+            undecided &= ~vector.unknown & truth
+        return Vector("bool", result, unknown)
+
+    return logical
+
+
+def _compile_if(args, boolean):
+    pairs = [(args[i], args[i + 1]) for i in range(0, len(args) - 1, 2)]
+    otherwise = args[-1] if len(args) % 2 else None
+
+    def if_(columns):
+        undecided = numpy.ones(columns.length, bool)
+        unknown = numpy.zeros(columns.length, bool)
+        chosen = []
+        for (condition, then) in pairs:
+            vector = condition(columns)
+            unknown |= undecided & vector.unknown
+            take = undecided & ~vector.unknown & vector.truth
+            undecided &= ~vector.unknown & ~vector.truth
+            chosen.append((take, then(columns)))
+        if otherwise is not None:
+            chosen.append((undecided, otherwise(columns)))
+        elif undecided.any():
+            raise Unvectorizable("`if` without an `else` is only supported when a branch is always taken")
+
+        kinds = {branch.kind for (take, branch) in chosen}
+        if len(kinds) == 1:
+            (kind,) = kinds
+            values = [branch.values for (take, branch) in chosen]
+        elif boolean:
+            # only the truth of branches of different kinds can be combined
+            kind = "bool"
+            values = [branch.truth for (take, branch) in chosen]
+        else:
+            raise Unvectorizable(f"`if` with branches of kinds {kinds} isn't supported")
+        conditions = [take for (take, branch) in chosen]
+        for (take, branch) in chosen:
+            unknown |= take & branch.unknown
+
+        def select(choices):
+            # rows that no branch was chosen for are unknown, so any default will do
+            choices = [numpy.broadcast_to(choice, (columns.length,)) for choice in choices]
+            return numpy.select(conditions, choices, choices[-1])
+
+        return Vector(kind, select(values), unknown, text=lambda: select([branch.text for (take, branch) in chosen]))
+
+    return if_
+
+
+def _compile_not(arg, negate):
+    def not_(columns):
+        vector = arg(columns)
+        return Vector("bool", ~vector.truth if negate else vector.truth, vector.unknown)
+
+    return not_
+
+
+def _compile_in(values):
+    (needle, haystack) = values
+    if isinstance(haystack, list):
+        if any(json_logic.is_logic(item) or isinstance(item, (list, dict)) for item in haystack):
+            raise Unvectorizable("only lists of constants are supported by `in`")
+        needle = _compile(needle)
+
+        def in_list(columns):
+            vector = needle(columns)
+            if vector.kind == "str":
+                candidates = [item for item in haystack if isinstance(item, str)]
+            elif vector.kind == "num":
+                candidates = [float(item) for item in haystack if isinstance(item, (int, float)) and abs(item) < EXACT]
+                if len(candidates) != len([item for item in haystack if isinstance(item, (int, float))]):
+                    raise Unvectorizable("numbers too large for floats")
+            else:
+                raise Unvectorizable(f"`in` of {vector.kind} values isn't supported")
+            if not candidates:
+                return Vector("bool", numpy.zeros(columns.length, bool), vector.unknown)
+            return Vector("bool", numpy.isin(vector.values, candidates), vector.unknown)
+
+        return in_list
+
+    if isinstance(needle, str) and not json_logic.is_logic(needle):
+        haystack = _compile(haystack)
+
+        def in_string(columns):
+            vector = haystack(columns)
+            if vector.kind != "str":
+                raise Unvectorizable(f"`in` of {vector.kind} values isn't supported")
+            return Vector("bool", numpy.char.find(vector.values, needle) >= 0, vector.unknown)
+
+        return in_string
+
+    raise Unvectorizable("`in` is only supported with a list of constants, or a string constant")
+
+
+def _less(a, b, or_equal):
+    # json_logic's _less_than and _less_than_or_equal_to, for one pair of values
+    if a.kind == "bool" or b.kind == "bool":
+        raise Unvectorizable("booleans can't be ordered")
+    unknown = a.unknown | b.unknown
+    if a.kind == "str" and b.kind == "str":
+        return Vector("bool", a.values <= b.values if or_equal else a.values < b.values, unknown)
+    (x, x_unknown) = a.numeric()
+    (y, y_unknown) = b.numeric()
+    result = x < y
+    unknown = unknown | x_unknown | y_unknown
+    if or_equal:
+        result = result | _equal(a, b).values
+    return Vector("bool", result, unknown)
+
+
+def _equal(a, b):
+    # json_logic's _equal_to
+    unknown = a.unknown | b.unknown
+    if a.kind == "str" or b.kind == "str":
+        return Vector("bool", a.text == b.text, unknown)
+    if a.kind == "bool" or b.kind == "bool":
+        return Vector("bool", a.truth == b.truth, unknown)
+    return Vector("bool", a.values == b.values, unknown)
+
+
+def _not_equal(a, b):
+    equal = _equal(a, b)
+    return Vector("bool", ~equal.values, equal.unknown)
+
+
+_comparisons = {
+    "==": _equal,
+    "!=": _not_equal,
+    "<": lambda a, b: _less(a, b, False),
+    "<=": lambda a, b: _less(a, b, True),
+    ">": lambda a, b: _less(b, a, False),
+    ">=": lambda a, b: _less(b, a, True),
+}
+
+
+def _compile_binary(operation, args):
+    (a, b) = args
+    return lambda columns: operation(a(columns), b(columns))
+
+
+def _inexact(values):
+    # json_logic's integers are exact however large they get, and it raises OverflowError for floats
+    return ~(numpy.abs(values) < EXACT)
+
+
+def _add(*values):
+    (result, unknown) = (values[0], False)
+    for value in values[1:]:
+        result = result + value
+        unknown = unknown | _inexact(result)
+    return (result, unknown)
+
+
+def _subtract(a, b=None):
+    return (-a if b is None else a - b, False)
+
+
+def _multiply(*values):
+    (result, unknown) = (values[0], False)
+    for value in values[1:]:
+        result = result * value
+        unknown = unknown | _inexact(result)
+    return (result, unknown)
+
+
+def _divide(a, b):
+    # json_logic raises ZeroDivisionError
+    return (a / b, b == 0)
+
+
+# operator: (operation returning (values, unknown), numbers of arguments)
+_arithmetic = {
+    "+": (_add, range(1, 100)),
+    "-": (_subtract, (1, 2)),
+    "*": (_multiply, range(1, 100)),
+    "/": (_divide, (2,)),
+}
+
+
+def _compile_arithmetic(operation, args):
+    def arithmetic(columns):
+        numbers = [arg(columns).numeric() for arg in args]
+        (values, unknown) = operation(*[values for (values, unknown) in numbers])
+        unknown = unknown | _inexact(values)
+        for (arg_values, arg_unknown) in numbers:
+            unknown = unknown | arg_unknown
+        return Vector("num", values, unknown)
+
+    return arithmetic
@@ -0,0 +1,251 @@
+import re
+from functools import lru_cache
+
+from .validator import UnsupportedException
+from .. import utils
+
+
+# Pattern that will match everything that looks like this: {...}
+FIELD = re.compile(r"\{.*?\}")
+# (operand1 operator operand2 rest), where rest may specify a precision
+EXPRESSION = re.compile(r"^\s*(\S+)\s*([\+\-\*/])\s*([^:\s]+)(\S*)\s*$")
+
+# only supporting int/float operations
+NUMBER_TYPES = (float, int)
+
+
+class Unevaluable(Exception):
+    """A field of a message that can't be evaluated for a row"""
+
+
+class MessageTemplate:
+    """
+    A rule's message, parsed once, to be rendered for every row that breaks the rule
+
+    Rendering gives just what `substitute_fields` gives, which parses the message again for every row.
+    """
+
+    def __init__(self, message):
+        self.message = message
+        self.fields = FIELD.findall(message)
+        self.literals = FIELD.split(message)
+        self.placeholders = [self.placeholder(field) for field in self.fields]
+        # `substitute_fields` replaces each field everywhere it appears so far, so rendering fields one by one
+        # is only the same if no field appears anywhere else, i.e. inside another field
+        self.independent = all(message.count(field) == self.fields.count(field) for field in set(self.fields))
+
+    def params(self, row_dict):
+        """
+        The values of a row that the message uses, enough to render it later just as for the whole row
+
+        Returns:
+        dictionary of key(field name) / value(field data) pair
+        """
+        params = {}
+        for (field, key, operation) in self.placeholders:
+            if key in row_dict:
+                params[key] = row_dict[key]
+            elif operation:
+                for (constant, operand) in operation[1]:
+                    if not constant and operand in row_dict:
+                        params[operand] = row_dict[operand]
+        return params
+
+    @staticmethod
+    def placeholder(field):
+        """
+        Parse one field
+
+        Returns:
+        (field, key, operation or None if the field isn't an expression); an operation is
+        (operator, operands, precision), where each operand is a number or a column name, and precision
+        is None, a number of decimal places, or Unevaluable if the precision is malformed
+        """
+        key = field[1:-1].strip()
+        expression = EXPRESSION.match(key)
+        if not expression:
+            return (field, key, None)
+
+        (operand1, operator, operand2, rest) = expression.groups()
+        operands = []
+        for operand in (operand1, operand2):
+            value = utils.cast_value(operand)
+            operands.append((True, value) if isinstance(value, NUMBER_TYPES) else (False, operand))
+
+        precision = None
+        if rest:
+            try:
+                if len(rest) > 1 and rest[0] == ":":
+                    precision = int(rest[1:])
+                else:
+                    raise ValueError
+            except ValueError:
+                precision = Unevaluable
+        return (field, key, (operator, operands, precision))
+
+    def render(self, row_dict, typed_row=None):
+        """
+        Render the message for a row
+
+        Parameters:
+        row_dict - a dictionary of key(field name) / value(field data) pair
+        typed_row - (optional) the same row with values cast by `cast_value`, so they aren't cast again
+
+        Returns:
+        string - the message with content in {} replaced
+        """
+        if not self.placeholders:
+            return self.message
+        if not self.independent:
+            return substitute_fields(self.message, row_dict, typed_row)
+
+        parts = [self.literals[0]]
+        for ((field, key, operation), literal) in zip(self.placeholders, self.literals[1:]):
+            if key in row_dict:
+                value = row_dict[key]
+                # a value that isn't a string raises a TypeError, and one with braces could be replaced again
+                if type(value) is not str or "{" in value or "}" in value:
+                    return substitute_fields(self.message, row_dict, typed_row)
+            elif operation is None:
+                return f"Unable to evaluate {field}"
+            else:
+                try:
+                    value = self.evaluate(field, operation, row_dict, typed_row)
+                except Unevaluable:
+                    return f"Unable to evaluate {field}"
+            parts.append(value)
+            parts.append(literal)
+        return "".join(parts)
+
+    @staticmethod
+    def evaluate(field, operation, row_dict, typed_row):
+        """The text an expression field is replaced with: its result, or the field itself if it isn't numeric"""
+        (operator, operands, precision) = operation
+        values = []
+        try:
+            for (constant, operand) in operands:
+                if not constant:
+                    operand = (
+                        typed_row[operand] if typed_row is not None else utils.cast_value(row_dict[operand])
+                    )
+                values.append(operand)
+        except KeyError:
+            raise Unevaluable()
+        (value1, value2) = values
+        if not (isinstance(value1, NUMBER_TYPES) and isinstance(value2, NUMBER_TYPES)):
+            return field
+
+        if operator == "+":
+            result = value1 + value2
+        elif operator == "-":
+            result = value1 - value2
+        elif operator == "*":
+            result = value1 * value2
+        else:
+            result = value1 / value2
+
+        if precision is Unevaluable:
+            raise Unevaluable()
+        if precision is not None:
+            try:
+                return f"{result:.{precision}f}"
+            except ValueError:
+                raise Unevaluable()
+        return str(result)
+
+
+@lru_cache(maxsize=1024)
+def message_template(message):
+    """The MessageTemplate for a message, parsed only the first time"""
+    return MessageTemplate(message)
+
+
+def substitute_fields(message, row_dict, typed_row=None):
+    """
+    Replace the fields of a message one at a time, each everywhere it appears in the message so far; see
+    `RowwiseValidator.replace_message`.  MessageTemplate does the same from a message parsed once, and
+    falls back to this where the order of replacements could make a difference.
+    """
+    # create message
+    new_message = message
+    fields = FIELD.findall(new_message)
+    for field in fields:
+        # Remove { }
+        key = field[1:-1].strip()
+        # Direct Substitution
+        if key in row_dict.keys():
+            new_message = new_message.replace(field, row_dict[key])
+        # Expression Calculation and Substitution
+        else:
+            # This will put out the two field names (strip out any spaces), and the operator
+            # and the rest of field to check for precision specification
+            # (operand1 operator operand2 rest)
+            # current supported operator is seen in the 2nd parenthesis
+            expression = EXPRESSION.match(key)
+
+            try:
+                # only supporting int/float operations
+                supported_type = (float, int)
+                operand1, operator, operand2, rest = expression.groups()
+
+                # If operands are numbers
+                value1 = utils.cast_value(operand1)
+                value2 = utils.cast_value(operand2)
+
+                # If operands are not numbers, they may be key to row_dict, get the real values
+                if not any(isinstance(value1, t) for t in supported_type):
+                    value1 = (
+                        typed_row[operand1]
+                        if typed_row is not None
+                        else utils.cast_value(row_dict[operand1])
+                    )
+
+                if not any(isinstance(value2, t) for t in supported_type):
+                    value2 = (
+                        typed_row[operand2]
+                        if typed_row is not None
+                        else utils.cast_value(row_dict[operand2])
+                    )
+
+                # If they are all supported type, then this expression can be evaluated
+                if any(isinstance(value1, t) for t in supported_type) and any(
+                    isinstance(value2, t) for t in supported_type
+                ):
+                    # Right now being super explicit about which operator we support
+                    if operator == "+":
+                        result = value1 + value2
+                    elif operator == "-":
+                        result = value1 - value2
+                    elif operator == "*":
+                        result = value1 * value2
+                    elif operator == "/":
+                        result = value1 / value2
+                    else:
+                        # it really shouldn't have gotten here because we are only matching the allowed
+                        # operation above
+                        raise UnsupportedException()
+
+                    # Will only use this when we are very sure there is no issue
+                    # result = eval(f'{value1} {operator} {value2}')
+
+                    # If precision is supplied, the "rest" should include this information in the following form:
+                    # ':number_of_digits_after_decimal_place'
+                    if rest:
+                        if len(rest) > 1 and rest[0] == ":":
+                            precision = int(rest[1:])
+                            result = f"{result:.{precision}f}"
+                        else:
+                            # This means this is malformed
+                            raise ValueError
+
+                    new_message = new_message.replace(field, str(result))
+
+            except (KeyError, AttributeError, ValueError):
+                # This means the expression is malformed or key are misspelled
+                new_message = f"Unable to evaluate {field}"
+                break
+            except UnsupportedException:
+                new_message = f"Unsupported operation in {field}"
+                break
+
+    return new_message
@@ -0,0 +1,146 @@
+import csv
+import io
+import itertools
+import json
+import random
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .validator import UnsupportedContentTypeException, Validator, apply_validators_to, validate_source
+from .. import utils
+from ..ingest_settings import UPLOAD_SETTINGS
+
+PREVIEW_MODES = ("head", "sample")
+
+
+def pick_rows(records, count, mode):
+    """
+    Choose up to `count` rows for a preview
+
+    Parameters:
+    records - iterable of rows
+    count - number of rows to choose
+    mode - "head" for the first rows, "sample" for a sample that is the same every time for the same rows
+
+    Returns:
+    (list of (position, row) pairs in their original order, total number of rows or None if not all were read)
+    """
+    if mode == "head":
+        # read one row more than needed, to tell whether the preview covers everything
+        picked = list(itertools.islice(enumerate(records), count + 1))
+        if len(picked) > count:
+            return (picked[:count], None)
+        return (picked, len(picked))
+    if mode == "sample":
+        # reservoir sampling, with a fixed seed so that a preview can be reproduced
+        rng = random.Random(0)
+        picked = []
+        total = 0
+        for (position, record) in enumerate(records):
+            total += 1
+            if len(picked) < count:
+                picked.append((position, record))
+            else:
+                replace = rng.randrange(total)
+                if replace < count:
+                    picked[replace] = (position, record)
+        return (sorted(picked, key=lambda pair: pair[0]), total)
+    raise ImproperlyConfigured(f"preview mode should be one of {PREVIEW_MODES}, not {mode!r}")
+
+
+def readable_source(source):
+    """
+    The source with a memoryview or bytearray "source" (i.e. an upload's `raw`, as read from Postgres) as
+    bytes, so it is parsed just like bytes
+    """
+    if isinstance(source, dict) and isinstance(source.get("source"), (bytearray, memoryview)):
+        return dict(source, source=bytes(source["source"]))
+    return source
+
+
+def preview_source(source, content_type, count, mode):
+    """
+    Cut a source down to the rows of a preview
+
+    CSV is read as it is for a full validation (see `ParsedTable.data`), so STREAM_ARGS apply; the preview
+    has the ordered headers on its first line and the chosen rows after it.
+
+    Parameters:
+    source - raw source, as passed to `apply_validators_to`
+    content_type - "text/csv" or "application/json"
+    count - number of rows
+    mode - "head" or "sample", see `pick_rows`
+
+    Returns:
+    (source with only the chosen rows, their positions in the original source, their row numbers in the
+    original source or None if told by their positions, total number of rows or None)
+    """
+    source = readable_source(source)
+    if content_type == "text/csv":
+        records = (
+            (row_number, headers, row)
+            for (row_number, headers, row) in Validator.iter_rows(utils.reorder_csv(source))
+            # This is to leave out the header row
+            if row_number != UPLOAD_SETTINGS["OLD_HEADER_ROW"]
+        )
+        (picked, total) = pick_rows(records, count, mode)
+        headers = picked[0][1][1] if picked else utils.get_ordered_headers([])
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(headers)
+        writer.writerows(list(row.values()) for (position, (row_number, _, row)) in picked)
+        # already read with STREAM_ARGS, so they mustn't apply again
+        preview = {"source": output.getvalue().encode("utf-8"), "format": "csv", "headers": 1}
+        row_numbers = [row_number for (position, (row_number, _, row)) in picked]
+    elif content_type == "application/json":
+        row_numbers = None
+        if isinstance(source, dict) and source.get("source") is not None:
+            rows = source["source"]
+            if isinstance(rows, (bytes, str)):
+                rows = json.loads(rows)
+            (picked, total) = pick_rows(rows, count, mode)
+            preview = dict(source, source=[row for (position, row) in picked])
+        elif isinstance(source, list):
+            (picked, total) = pick_rows(source, count, mode)
+            preview = [row for (position, row) in picked]
+        else:
+            # a single object is its own preview
+            return (source, [0], None, 1)
+    else:
+        raise UnsupportedContentTypeException(content_type, "preview")
+
+    return (preview, [position for (position, record) in picked], row_numbers, total)
+
+
+def preview_validators_to(source, content_type, rows=None, mode=None, row_results=None):
+    """
+    Apply the validators in UPLOAD_SETTINGS['VALIDATORS'] to the first rows, or a sample of the rows, of a source
+
+    This gives quick, provisional feedback on a large upload; row numbers in the result are those of the
+    whole source.  A provisional result has a `preview` item with the `mode`, the number of `rows` checked
+    and the `total_rows` in the source (None if unknown).  If the preview covers every row, the result is
+    final and has no `preview` item.
+
+    :param source: raw source
+    :param content_type: content type of the source
+    :param rows: number of rows to check; defaults to UPLOAD_SETTINGS['PREVIEW_ROWS']
+    :param mode: "head" or "sample"; defaults to UPLOAD_SETTINGS['PREVIEW_MODE']
+    :param row_results: (optional) RowResults of the upload being replaced, used as `apply_validators_to`
+      uses it if the preview covers every row; a provisional result records nothing in it
+    :return: validation output, see `ValidatorOutput.get_output`
+    """
+    rows = rows or UPLOAD_SETTINGS["PREVIEW_ROWS"]
+    mode = mode or UPLOAD_SETTINGS["PREVIEW_MODE"]
+
+    source = readable_source(source)
+    (preview, positions, row_numbers, total) = preview_source(source, content_type, rows, mode)
+    if total == len(positions):
+        return apply_validators_to(source, content_type, row_results=row_results)
+
+    # validated with every row numbered as in the whole source, so row numbers in messages are right too; not
+    # cached, since the same rows can come from different sources
+    result = validate_source(
+        preview, content_type, UPLOAD_SETTINGS["MAX_ERRORS"], positions=positions, row_numbers=row_numbers
+    )
+    result["preview"] = {"mode": mode, "rows": len(positions), "total_rows": total}
+    return result
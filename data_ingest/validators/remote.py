@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .. import utils
+from ..ingest_settings import UPLOAD_SETTINGS
+
+logger = logging.getLogger("ReVAL")
+
+
+class RemoteDocumentCache:
+    """
+    On-disk cache for rule files and schemas that are configured by URL.
+
+    A cached document is served without any network traffic for `ttl` seconds.  After that it is
+    revalidated with `If-None-Match`/`If-Modified-Since`, so an unchanged document costs one 304 response.
+    If the host cannot be reached (or answers with an error), the last good copy is served instead.
+
+    Without a `directory`, documents are kept in a directory of the system's temporary directory that
+    is private to the current user (see `utils.private_directory`), or only in memory if there is none.
+    """
+
+    def __init__(self, directory=None, ttl=300, timeout=10, pool_size=4):
+        if not directory:
+            try:
+                directory = utils.private_directory("data_ingest_remote_cache")
+            except ImproperlyConfigured as e:
+                logger.warning(f"Keeping remote documents in memory only: {e}")
+        self.directory = directory
+        self.ttl = ttl
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._memory = {}
+
+    def _path(self, url, extension):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + extension)
+
+    def _read(self, url):
+        if url in self._memory or not self.directory:
+            return self._memory.get(url, (None, None))
+        try:
+            with open(self._path(url, ".json")) as infile:
+                meta = json.load(infile)
+            with open(self._path(url, ".body"), encoding="utf-8") as infile:
+                body = infile.read()
+        except (OSError, ValueError):
+            return (None, None)
+        self._memory[url] = (meta, body)
+        return (meta, body)
+
+    def _write(self, url, meta, body):
+        self._memory[url] = (meta, body)
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for (extension, content) in ((".body", body), (".json", json.dumps(meta))):
+                utils.write_atomically(self._path(url, extension), content)
+        except OSError as e:
+            logger.warning(f"Unable to write remote cache for {url}: {e}")
+
+    def fetch(self, url):
+        """
+        Return the text of the document at `url`
+
+        :param url: URL of the document
+        :return: text of the document
+        :raises: requests.RequestException if the document can't be fetched and no copy is cached
+        """
+        (meta, body) = self._read(url)
+        if body is not None and time.time() - meta["fetched_at"] < self.ttl:
+            return body
+
+        headers = {}
+        if meta and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            resp = self.session.get(url, headers=headers, timeout=self.timeout)
+            if resp.status_code == 304 and body is not None:
+                meta = dict(meta, fetched_at=time.time())
+                self._write(url, meta, body)
+                return body
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            if body is None:
+                raise
+            logger.warning(f"Serving cached copy of {url}: {e}")
+            return body
+
+        meta = {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "sha256": hashlib.sha256(resp.content).hexdigest(),
+        }
+        self._write(url, meta, resp.text)
+        return resp.text
+
+    def signature(self, url):
+        """
+        Return a value that changes whenever the document at `url` changes
+
+        :param url: URL of the document
+        :return: hash of the (possibly revalidated) document, None if it can't be fetched
+        """
+        try:
+            self.fetch(url)
+        except requests.RequestException:
+            return None
+        return self._read(url)[0].get("sha256")
+
+    def prefetch(self, urls):
+        """
+        Fetch several documents at once, i.e. at startup
+
+        :param urls: list of URLs
+        :return: dictionary of URL -> True if the document is available
+        """
+
+        def available(url):
+            try:
+                self.fetch(url)
+                return True
+            except requests.RequestException as e:
+                logger.warning(f"Unable to prefetch {url}: {e}")
+                return False
+
+        urls = list(urls)
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(urls))) as executor:
+            return dict(zip(urls, executor.map(available, urls)))
+
+
+remote_cache = RemoteDocumentCache(
+    directory=UPLOAD_SETTINGS["REMOTE_CACHE_DIR"],
+    ttl=UPLOAD_SETTINGS["REMOTE_CACHE_TTL"],
+    timeout=UPLOAD_SETTINGS["REMOTE_TIMEOUT"],
+    pool_size=UPLOAD_SETTINGS["REMOTE_POOL_SIZE"],
+)
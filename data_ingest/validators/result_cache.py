@@ -0,0 +1,267 @@
+import abc
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from django.core import exceptions
+from django.utils.module_loading import import_string
+
+from .. import utils
+from ..ingest_settings import UPLOAD_SETTINGS
+
+logger = logging.getLogger("ReVAL")
+
+
+class ResultCache(abc.ABC):
+    """
+    Base class for caches of validation results, keyed by a hash of the source and of the rules.
+
+    Subclasses implement `load` and `store`; this class counts hits and misses.
+    """
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached entry for `key`, or None"""
+        try:
+            entry = self.load(key)
+        except Exception as e:
+            logger.warning(f"Unable to read cached validation result: {e}")
+            entry = None
+        with self._stats_lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key, entry):
+        """Cache `entry`, which must be JSON serializable, for `key`"""
+        try:
+            self.store(key, entry)
+        except Exception as e:
+            logger.warning(f"Unable to cache validation result: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    @abc.abstractmethod
+    def load(self, key):
+        """Return the entry stored for `key`, or None"""
+
+    @abc.abstractmethod
+    def store(self, key, entry):
+        """Keep `entry` for `key`"""
+
+    @abc.abstractmethod
+    def clear(self):
+        """Remove every entry"""
+
+
+class MemoryResultCache(ResultCache):
+    """Keeps the `size` most recently used results in this process"""
+
+    def __init__(self, size=128):
+        super().__init__()
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def load(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            entry = self._entries[key]
+        # kept pickled, so that callers may modify the results they store and get
+        return pickle.loads(entry)
+
+    def store(self, key, entry):
+        entry = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileResultCache(ResultCache):
+    """
+    Keeps the `size` most recently used results as JSON files in `directory`, so that they are shared
+    between processes.  A file's modification time is its last use.
+
+    Cached results are trusted as they are, so without a `directory` they are kept in one of the system's
+    temporary directory that is private to the current user (see `utils.private_directory`).
+    """
+
+    def __init__(self, directory=None, size=128):
+        super().__init__()
+        self.directory = directory or utils.private_directory("data_ingest_result_cache")
+        self.size = size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as infile:
+                entry = json.load(infile)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def store(self, key, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        utils.write_atomically(self._path(key), json.dumps(entry))
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used results beyond `size`"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    entries.append((os.stat(os.path.join(self.directory, name)).st_mtime_ns, name))
+                except OSError:
+                    pass
+        entries.sort()
+        for (mtime, name) in entries[: max(len(entries) - self.size, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else ():
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+
+
+class DjangoResultCache(ResultCache):
+    """
+    Keeps results in one of the project's Django caches (settings.CACHES); how many are kept,
+    and for how long, is up to that cache's configuration.
+    """
+
+    prefix = "data_ingest_result:"
+
+    def __init__(self, alias="default"):
+        super().__init__()
+        self.alias = alias
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+
+        return caches[self.alias]
+
+    def load(self, key):
+        return self.cache.get(self.prefix + key)
+
+    def store(self, key, entry):
+        self.cache.set(self.prefix + key, entry)
+
+    def clear(self):
+        self.cache.clear()
+
+
+BACKENDS = {
+    "memory": lambda: MemoryResultCache(size=UPLOAD_SETTINGS["RESULT_CACHE_SIZE"]),
+    "file": lambda: FileResultCache(
+        directory=UPLOAD_SETTINGS["RESULT_CACHE_DIR"], size=UPLOAD_SETTINGS["RESULT_CACHE_SIZE"]
+    ),
+    "django": lambda: DjangoResultCache(alias=UPLOAD_SETTINGS["RESULT_CACHE_ALIAS"]),
+}
+
+_result_caches = {}
+
+
+def result_cache():
+    """
+    Return the cache configured by UPLOAD_SETTINGS['RESULT_CACHE'], or None if results are not cached
+
+    The setting is one of "memory", "file" or "django", or the dotted path of a ResultCache subclass.
+    """
+    backend = UPLOAD_SETTINGS["RESULT_CACHE"]
+    if not backend:
+        return None
+    key = (
+        backend,
+        UPLOAD_SETTINGS["RESULT_CACHE_SIZE"],
+        UPLOAD_SETTINGS["RESULT_CACHE_DIR"],
+        UPLOAD_SETTINGS["RESULT_CACHE_ALIAS"],
+    )
+    if key not in _result_caches:
+        if backend in BACKENDS:
+            _result_caches[key] = BACKENDS[backend]()
+        else:
+            try:
+                _result_caches[key] = import_string(backend)()
+            except ImportError:
+                raise exceptions.ImproperlyConfigured(
+                    "DATA_INGEST['RESULT_CACHE'] should be None, 'memory', 'file', 'django' "
+                    "or the path of a ResultCache subclass, not {}".format(backend)
+                )
+    return _result_caches[key]
+
+
+def source_digest(source, content_type):
+    """
+    SHA-256 of a source; None if the source can't be hashed (i.e. a file object)
+
+    Parsed JSON is hashed with its keys sorted, so that the order of keys in an object doesn't matter.
+    Bytes are hashed as they are, since even line endings can change the values in a CSV file.
+    """
+    digest = hashlib.sha256(content_type.encode())
+    if isinstance(source, dict) and isinstance(source.get("source"), bytes):
+        digest.update(source["source"])
+        source = dict(source, source=None)
+    try:
+        digest.update(json.dumps(source, sort_keys=True).encode())
+    except (TypeError, ValueError):
+        return None
+    return digest.hexdigest()
+
+
+def rules_fingerprint(validators):
+    """
+    Hash of the validator classes and the rules they loaded, and of the settings that affect their results
+
+    :param validators: tuple of validators, as returned by `ValidatorRegistry.validators`; each hashed its
+      rules when it was built (see `Validator.rules_digest`)
+    """
+    rules = [v.rules_digest for v in validators]
+    return hashlib.sha256(json.dumps([rules, settings_fingerprint()], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def settings_fingerprint():
+    """
+    The settings, besides the rules, that change validation results: how sources are read, how values are
+    cast (with CAST_BY_SCHEMA, by the Table Schema's rules), and whether messages are rendered
+    """
+    schema = utils.get_schema_validator() if UPLOAD_SETTINGS["CAST_BY_SCHEMA"] else None
+    return [
+        UPLOAD_SETTINGS["STREAM_ARGS"],
+        UPLOAD_SETTINGS["OLD_HEADER_ROW"],
+        UPLOAD_SETTINGS["CAST_BY_SCHEMA"],
+        schema.rules_digest if schema else None,
+        UPLOAD_SETTINGS["LAZY_ERROR_MESSAGES"],
+    ]
@@ -1,16 +1,49 @@
 import abc
-import re
-from decimal import Decimal, InvalidOperation
+from concurrent.futures import ProcessPoolExecutor
 from django.core import exceptions
 
+from .messages import message_template
 from .validator import (
+    DeferredMessage,
+    ParsedTable,
     Validator,
     ValidatorOutput,
-    UnsupportedException,
     UnsupportedContentTypeException,
+    registry,
 )
-from ..ingest_settings import UPLOAD_SETTINGS
 from .. import utils
+from ..ingest_settings import UPLOAD_SETTINGS
+
+
+_shard_pools = {}
+
+
+def warm_worker(validator_class, filename):
+    """Build the validator (and compile its rules) once, when the worker process starts"""
+    registry.get(filename, validator_class)
+
+
+def shard_pool(validator_class, filename, workers):
+    """Return the pool of pre-warmed worker processes for one validator"""
+    key = (validator_class, filename, workers)
+    if key not in _shard_pools:
+        _shard_pools[key] = ProcessPoolExecutor(
+            max_workers=workers, initializer=warm_worker, initargs=(validator_class, filename)
+        )
+    return _shard_pools[key]
+
+
+def validate_shard(validator_class, filename, headers, numbered_rows, max_errors=None, known_errors=None):
+    """
+    Validate a shard of rows in a worker process
+
+    Returns:
+    dictionary of row number -> list of errors
+    """
+    validator = registry.get(filename, validator_class)
+    output = ValidatorOutput(numbered_rows, headers=headers, max_errors=max_errors)
+    validator.validate_rows(headers, numbered_rows, output, known_errors)
+    return dict(output.error_records)
 
 
 class RowwiseValidator(Validator):
@@ -23,6 +56,11 @@ class RowwiseValidator(Validator):
     """
 
     SUPPORTS_HEADER_OVERRIDE = True
+    ROW_INDEPENDENT = True
+    # Set this for subclasses that want `evaluate_typed` (which is `evaluate` unless overridden) and
+    # `evaluate_rows` to get rows with values already cast by `cast_value`; messages are still made from the
+    # values as received
+    TYPED_ROWS = False
 
     if "headers" not in UPLOAD_SETTINGS["STREAM_ARGS"]:
         raise exceptions.ImproperlyConfigured(
@@ -49,26 +87,7 @@ class RowwiseValidator(Validator):
         Returns:
         a value that has been processed and casted to its type (string, integer, or float)
         """
-        newval = value
-        if type(newval) == str:
-            newval = newval.strip()
-            try:
-                dnewval = Decimal(newval.replace(",", ""))
-                try:
-                    inewval = int(dnewval)
-                    fnewval = float(dnewval)
-                    if inewval == fnewval:
-                        newval = inewval
-                    else:
-                        newval = fnewval
-                except ValueError:
-                    # will take the newval.strip() as the value
-                    pass
-            except InvalidOperation:
-                # will take the newval.strip() as the value
-                pass
-
-        return newval
+        return utils.cast_value(value)
 
     @staticmethod
     def cast_values(row_values):
@@ -81,10 +100,10 @@ class RowwiseValidator(Validator):
         Returns:
         a list of casted values
         """
-        return [RowwiseValidator.cast_value(value) for value in row_values]
+        return [utils.cast_value(value) for value in row_values]
 
     @staticmethod
-    def replace_message(message, row_dict):
+    def replace_message(message, row_dict, typed_row=None):
         """
         String Intepolation for message.  Anything that is included inside the curly brackets {} will
         be evaluated and replaced by its value.
@@ -98,153 +117,240 @@ class RowwiseValidator(Validator):
         Parameters:
         message - a string
         row_dict - a dictionary of key(field name) / value(field data) pair
+        typed_row - (optional) the same row with values cast by `cast_value`, so they aren't cast again
 
         Returns:
         string - a new message with content in {} replaced
 
         """
-        # create message
-        new_message = message
-        # Pattern that will match everything that looks like this: {...}
-        pattern = re.compile(r"\{.*?\}")
-        fields = pattern.findall(new_message)
-        for field in fields:
-            # Remove { }
-            key = field[1:-1].strip()
-            # Direct Substitution
-            if key in row_dict.keys():
-                new_message = new_message.replace(field, row_dict[key])
-            # Expression Calculation and Substitution
-            else:
-                # This will put out the two field names (strip out any spaces), and the operator
-                # and the rest of field to check for precision specification
-                # (operand1 operator operand2 rest)
-                # current supported operator is seen in the 2nd parenthesis
-                expression = re.match(
-                    r"^\s*(\S+)\s*([\+\-\*/])\s*([^:\s]+)(\S*)\s*$", key
-                )
-
-                try:
-                    # only supporting int/float operations
-                    supported_type = (float, int)
-                    operand1, operator, operand2, rest = expression.groups()
-
-                    # If operands are numbers
-                    value1 = RowwiseValidator.cast_value(operand1)
-                    value2 = RowwiseValidator.cast_value(operand2)
-
-                    # If operands are not numbers, they may be key to row_dict, get the real values
-                    if not any(isinstance(value1, t) for t in supported_type):
-                        value1 = RowwiseValidator.cast_value(row_dict[operand1])
-
-                    if not any(isinstance(value2, t) for t in supported_type):
-                        value2 = RowwiseValidator.cast_value(row_dict[operand2])
-
-                    # If they are all supported type, then this expression can be evaluated
-                    if any(isinstance(value1, t) for t in supported_type) and any(
-                        isinstance(value2, t) for t in supported_type
-                    ):
-                        # Right now being super explicit about which operator we support
-                        if operator == "+":
-                            result = value1 + value2
-                        elif operator == "-":
-                            result = value1 - value2
-                        elif operator == "*":
-                            result = value1 * value2
-                        elif operator == "/":
-                            result = value1 / value2
-                        else:
-                            # it really shouldn't have gotten here because we are only matching the allowed
-                            # operation above
-                            raise UnsupportedException()
-
-                        # Will only use this when we are very sure there is no issue
-                        # result = eval(f'{value1} {operator} {value2}')
-
-                        # If precision is supplied, the "rest" should include this information in the following form:
-                        # ':number_of_digits_after_decimal_place'
-                        if rest:
-                            if len(rest) > 1 and rest[0] == ":":
-                                precision = int(rest[1:])
-                                result = f"{result:.{precision}f}"
-                            else:
-                                # This means this is malformed
-                                raise ValueError
-
-                        new_message = new_message.replace(field, str(result))
-
-                except (KeyError, AttributeError, ValueError):
-                    # This means the expression is malformed or key are misspelled
-                    new_message = f"Unable to evaluate {field}"
-                    break
-                except UnsupportedException:
-                    new_message = f"Unsupported operation in {field}"
-                    break
-
-        return new_message
+        return message_template(message).render(row_dict, typed_row)
 
     def validate(self, source, content_type):
         """
         Implemented validate method
         """
+        return self.validate_table(ParsedTable(source, content_type))
+
+    def validate_table(self, table, max_errors=None, known_errors=None):
+        """
+        Implemented validate_table method
+        """
 
-        if content_type == "application/json":
-            data = utils.to_tabular(source)
-        elif content_type == "text/csv":
-            data = utils.reorder_csv(source)
+        if table.content_type not in ("application/json", "text/csv"):
+            raise UnsupportedContentTypeException(table.content_type, type(self).__name__)
+
+        (headers, numbered_rows) = (table.headers, table.rows)
+        output = ValidatorOutput(numbered_rows, headers=headers, max_errors=max_errors)
+
+        shards = self.shards(numbered_rows)
+        if len(shards) > 1:
+            pool = shard_pool(self.class_path(), self.filename, UPLOAD_SETTINGS["ROWWISE_WORKERS"])
+            known_errors = known_errors or {}
+            futures = [
+                pool.submit(
+                    validate_shard,
+                    self.class_path(),
+                    self.filename,
+                    headers,
+                    shard,
+                    max_errors,
+                    {rn: known_errors[rn] for (rn, row) in shard if rn in known_errors},
+                )
+                for shard in shards
+            ]
+            # shards are contiguous and in order, so errors stay in row order, and
+            # each shard's errors count towards max_errors until the output is full
+            for future in futures:
+                for (rn, errors) in future.result().items():
+                    for error in errors:
+                        if output.count_error():
+                            output.error_records[rn].append(error)
         else:
-            raise UnsupportedContentTypeException(content_type, type(self).__name__)
+            self.validate_rows(
+                headers, numbered_rows.items(), output, known_errors, table.typed_rows if self.TYPED_ROWS else None
+            )
+        return output.get_output()
+
+    def class_path(self):
+        return f"{type(self).__module__}.{type(self).__qualname__}"
+
+    @staticmethod
+    def shards(numbered_rows):
+        """
+        Split rows into contiguous shards for UPLOAD_SETTINGS['ROWWISE_WORKERS'] worker processes
+
+        Parameters:
+        numbered_rows - ordered dictionary of row number -> row
+
+        Returns:
+        a list of lists of (row number, row) pairs; only one when sharding is off or the upload is small
+        """
+        workers = UPLOAD_SETTINGS["ROWWISE_WORKERS"]
+        min_rows = max(UPLOAD_SETTINGS["ROWWISE_MIN_SHARD_ROWS"], 1)
+        count = min(workers or 1, len(numbered_rows) // min_rows)
+        if count <= 1:
+            return [numbered_rows.items()]
+
+        items = list(numbered_rows.items())
+        size = -(-len(items) // count)
+        return [items[i:i + size] for i in range(0, len(items), size)]
 
-        (headers, numbered_rows) = Validator.rows_from_source(data)
-        output = ValidatorOutput(numbered_rows, headers=headers)
+    def validate_rows(self, headers, numbered_rows, output, known_errors=None, typed_rows=None):
+        """
+        Apply every rule to every row, adding errors to `output`, until `output` is full
 
-        for (rn, row) in numbered_rows.items():
+        Parameters:
+        headers - list of header names
+        numbered_rows - iterable of (row number, row dictionary) pairs
+        output - ValidatorOutput that collects the errors
+        known_errors - (optional) dictionary of row number -> errors, for rows that are not evaluated again
+        typed_rows - (optional) dictionary of row number -> row cast by `cast_value` (see `TYPED_ROWS`),
+                     i.e. `ParsedTable.typed_rows`; rows are cast here if it isn't given
+
+        Returns:
+        None
+        """
+        received_columns = set(headers)
+        known_errors = known_errors or {}
+        old_header_row = UPLOAD_SETTINGS["OLD_HEADER_ROW"]
+        numbered_rows = list(numbered_rows)
+        # rows with known errors, and the header row, aren't evaluated
+        evaluated = [(rn, row) for (rn, row) in numbered_rows if rn not in known_errors and rn != old_header_row]
+        typed = None
+        if self.TYPED_ROWS:
+            if typed_rows is None:
+                typed = utils.cast_rows([row for (rn, row) in evaluated], utils.get_schema_casts())
+            else:
+                typed = [typed_rows[rn] for (rn, row) in evaluated]
+        rows = typed or [row for (rn, row) in evaluated]
+        results = self.evaluate_rows(headers, rows) if rows else {}
+        passed = self.passed_rows(results, len(evaluated))
+        # the output can only fill up when errors are added
+        full = output.full
+        # index of the row in `evaluated`
+        index = -1
+        for (rn, row) in numbered_rows:
 
             # This is to remove the header row
-            if rn == UPLOAD_SETTINGS["OLD_HEADER_ROW"]:
+            if rn == old_header_row:
                 continue
 
-            # Check for columns required by validator
-            received_columns = set(headers)
-            for rule in self.validator:
-                expected_columns = set(rule["columns"])
-                missing_columns = expected_columns.difference(received_columns)
-                if missing_columns:
+            if full:
+                output.truncated = True
+                break
+
+            if rn in known_errors:
+                for error in known_errors[rn]:
                     output.add_row_error(
-                        rn,
-                        "Error",
-                        rule.get("error_code"),
-                        f"Unable to evaluate, missing columns: {missing_columns}",
-                        [],
+                        rn, error["severity"], error["code"], ValidatorOutput.stored_message(error), error["fields"]
                     )
-                    continue
-                try:
-                    if rule["code"] and not self.invert_if_needed(
-                        self.evaluate(rule["code"], row)
-                    ):
-
-                        output.add_row_error(
-                            rn,
-                            rule.get("severity", "Error"),
-                            rule.get("error_code"),
-                            RowwiseValidator.replace_message(
-                                rule.get("message", ""), row
-                            ),
-                            [
-                                k
-                                for (idx, k) in enumerate(row.keys())
-                                if k in rule["columns"]
-                            ],
-                        )
-                except Exception as e:
-                    output.add_row_error(
-                        rn,
-                        "Error",
+                full = output.full
+                continue
+
+            index += 1
+            if passed[index]:
+                continue
+
+            row_results = {rule: rule_results[index] for (rule, rule_results) in results.items()}
+            for error in self.row_errors(received_columns, row, row_results, typed[index] if typed else None):
+                output.add_row_error(rn, *error)
+            full = output.full
+
+    def evaluate_rows(self, headers, rows):
+        """
+        Evaluate rules over many rows at once, for subclasses that can do that faster than row by row
+
+        Parameters:
+        headers - list of header names
+        rows - list of row dictionaries, with values cast by `cast_value` if `TYPED_ROWS` is set
+
+        Returns:
+        dictionary of rule index -> list with the result of `evaluate` for each row, or None for rows
+        that must be evaluated on their own; rules that aren't in the dictionary are evaluated row by row
+        """
+        return {}
+
+    def passed_rows(self, results, row_count):
+        """
+        Find the rows that `evaluate_rows` showed to pass every rule
+
+        Returns:
+        list of True/False, one for each row
+        """
+        if not results or len(results) < len(self.validator):
+            return [False] * row_count
+        if any(index not in results for index in range(len(self.validator))):
+            return [False] * row_count
+        # as `invert_if_needed` would have it
+        passed = [
+            [result is not None and bool(result) is not self.INVERT_LOGIC for result in results[index]]
+            for index in range(len(self.validator))
+        ]
+        return [all(row) for row in zip(*passed)]
+
+    def row_errors(self, received_columns, row, results=None, typed_row=None):
+        """
+        Apply every rule to one row
+
+        Parameters:
+        received_columns - set of header names in the source
+        row - the dictionary of key(field name)/value(field data) pair
+        results - (optional) dictionary of rule index -> result of `evaluate` for this row, if already known
+        typed_row - (optional) the row with values cast by `cast_value`, given to `evaluate_typed` if `TYPED_ROWS`
+                    is set, and to messages unless CAST_BY_SCHEMA is
+
+        Returns:
+        an iterator of (severity, code, message, fields) for each rule the row breaks
+        """
+        if self.TYPED_ROWS and typed_row is None:
+            typed_row = utils.cast_row(row, utils.get_schema_casts())
+        # messages cast the values they use as `cast_value` does, whether rendered now or later from the
+        # values received; values cast by the Table Schema would render differently
+        message_row = None if UPLOAD_SETTINGS["CAST_BY_SCHEMA"] else typed_row
+        lazy = UPLOAD_SETTINGS["LAZY_ERROR_MESSAGES"]
+        for (index, rule) in enumerate(self.validator):
+            # Check for columns required by validator
+            expected_columns = set(rule["columns"])
+            missing_columns = expected_columns.difference(received_columns)
+            if missing_columns:
+                yield (
+                    "Error",
+                    rule.get("error_code"),
+                    f"Unable to evaluate, missing columns: {missing_columns}",
+                    [],
+                )
+                continue
+            try:
+                result = results.get(index) if results else None
+                if result is None and rule["code"]:
+                    if self.TYPED_ROWS:
+                        result = self.evaluate_typed(rule["code"], typed_row)
+                    else:
+                        result = self.evaluate(rule["code"], row)
+                if rule["code"] and not self.invert_if_needed(result):
+                    message = rule.get("message", "")
+                    if lazy:
+                        message = DeferredMessage(message, message_template(message).params(row))
+                    else:
+                        message = RowwiseValidator.replace_message(message, row, message_row)
+
+                    yield (
+                        rule.get("severity", "Error"),
                         rule.get("error_code"),
-                        f"{type(e).__name__}: {e.args[0]}",
-                        [],
+                        message,
+                        [
+                            k
+                            for (idx, k) in enumerate(row.keys())
+                            if k in rule["columns"]
+                        ],
                     )
-        return output.get_output()
+            except Exception as e:
+                yield (
+                    "Error",
+                    rule.get("error_code"),
+                    f"{type(e).__name__}: {e.args[0]}",
+                    [],
+                )
 
     @abc.abstractmethod
     def evaluate(self, rule, row):
@@ -258,3 +364,19 @@ class RowwiseValidator(Validator):
         Returns:
         Boolean - True/False
         """
+
+    def evaluate_typed(self, rule, typed_row):
+        """
+        Evaluate a row whose values were already cast, for subclasses that set `TYPED_ROWS`
+
+        Subclasses whose `evaluate` takes rows as received, and casts them itself, can override this to skip
+        casting them again; by default, it is `evaluate`.
+
+        Parameters:
+        rule - the rule that needs to apply to the row
+        typed_row - the dictionary of key(field name)/value(field data) pair, with values cast by `cast_value`
+
+        Returns:
+        Boolean - True/False
+        """
+        return self.evaluate(rule, typed_row)
@@ -1,15 +1,75 @@
+import os
+import re
 import sqlite3
+import threading
 
 from .rowwise import RowwiseValidator
+from .. import utils
+from ..ingest_settings import UPLOAD_SETTINGS
+
+# Whether Python's bool() of a rule's result, as returned by sqlite3, is true
+TRUTHY = (
+    "CASE typeof(result) WHEN 'null' THEN 0 WHEN 'text' THEN length(result) > 0 "
+    "WHEN 'blob' THEN length(result) > 0 ELSE result != 0 END"
+)
+
+# Rules that mean something else over a whole table than over a single row
+ROW_DEPENDENT = re.compile(r"\b(rowid|oid|_rowid_|over)\b|;", re.IGNORECASE)
+
+# Names in a rule: "quoted", [bracketed] or `backquoted` identifiers, or words
+NAMES = re.compile(r'"((?:[^"]|"")*)"|\[([^\]]*)\]|`((?:[^`]|``)*)`|(\w+)')
 
 
 class SqlValidator(RowwiseValidator):
+
+    # rows come with their values already cast, by `cast_value`
+    TYPED_ROWS = True
+
     def __init__(self, *args, **kwargs):
 
-        self.db = sqlite3.connect(":memory:")
-        self.db_cursor = self.db.cursor()
+        # SQLite connections can't be shared between threads, and validator instances are shared
+        self.local = threading.local()
+        # (rule, columns of the row) -> (SQL, columns to bind, or None for all of them)
+        self.statements = {}
         return super().__init__(*args, **kwargs)
 
+    def __getstate__(self):
+        # connections stay with the thread that opened them; a copy opens its own
+        state = self.__dict__.copy()
+        del state["local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+    def thread_local(self):
+        """
+        This thread's connection to its own in-memory database, and its cursor, in `self.local`
+
+        The connection is opened on first use in each thread and kept for the thread's lifetime, along
+        with its statement cache.  A connection inherited from a parent process (i.e. by a forked worker)
+        is never used; the worker opens its own.
+        """
+        pid = os.getpid()
+        if getattr(self.local, "pid", None) != pid:
+            # room for every rule's statement, for rows with a couple of different sets of columns
+            cached_statements = max(128, 2 * len(self.validator) + 8)
+            self.local.db = sqlite3.connect(":memory:", cached_statements=cached_statements)
+            self.local.db_cursor = self.local.db.cursor()
+            self.local.pid = pid
+        return self.local
+
+    @property
+    def db(self):
+        """This thread's connection (see `thread_local`)"""
+        return self.thread_local().db
+
+    @property
+    def db_cursor(self):
+        """This thread's cursor on `db`"""
+        return self.thread_local().db_cursor
+
     def first_statement_only(self, sql):
         "Discard any second sql statement, just as from a sql injection"
 
@@ -19,21 +79,158 @@ class SqlValidator(RowwiseValidator):
         return sql.split(";")[0]
 
     def evaluate(self, rule, row):
+        "Run a rule for one row, as received; its values are cast by `cast_value` first"
+        return self.evaluate_typed(rule, utils.cast_row(row))
+
+    def evaluate_typed(self, rule, row):
+        "Run a rule for one row, whose values were already cast"
         if not rule:
             return True  # rule not implemented
 
-        aliases = [" ? as {} ".format(col_name) for col_name in row.keys()]
+        key = (rule, tuple(row.keys()))
+        statement = self.statements.get(key)
+        if statement is None:
+            # shared by every thread; another thread may clear it at any time, so only look it up once
+            if len(self.statements) > 4 * len(self.validator) + 64:
+                self.statements.clear()
+            statement = self.statements[key] = self.prepare(rule, key[1])
+        (sql, bound) = statement
+
+        values = tuple(row.values()) if bound is None else tuple(row[col] for col in bound)
+
+        self.db_cursor.execute(sql, values)
+        result = self.db_cursor.fetchone()[0]
+
+        return bool(result)
+
+    def aliased_sql(self, rule, columns):
+        aliases = [" ? as {} ".format(col_name) for col_name in columns]
         aliases = ",".join(aliases)
 
         sql = f"select {rule} from ( select {aliases} )"
-        sql = self.first_statement_only(sql)
+        return self.first_statement_only(sql)
 
-        cvalues = SqlValidator.cast_values(row.values())
+    def prepare(self, rule, columns):
+        """
+        Build the SQL that evaluates `rule` for rows with `columns`
 
-        self.db_cursor.execute(sql, tuple(cvalues))
-        result = self.db_cursor.fetchone()[0]
+        Only the columns the rule names are bound, as long as that compiles just as binding every
+        column does; so a rule that fails to compile still fails the same way.
 
-        return bool(result)
+        Returns:
+        (SQL, list of the columns to bind, or None to bind all of them)
+        """
+        sql = self.aliased_sql(rule, columns)
+        if ";" in rule:
+            return (sql, None)
+
+        names = {
+            "".join(name).replace('""', '"').replace("``", "`").lower() for name in NAMES.findall(rule)
+        }
+        bound = [col for col in columns if col.lower() in names]
+        if len(bound) == len(columns):
+            return (sql, None)
+
+        projected = self.aliased_sql(rule, bound) if bound else f"select {rule}"
+        try:
+            # EXPLAIN compiles a statement without running it
+            self.db_cursor.execute("EXPLAIN " + sql, (None,) * len(columns))
+            self.db_cursor.execute("EXPLAIN " + projected, (None,) * len(bound))
+        except sqlite3.Error:
+            return (sql, None)
+        return (projected, bound)
+
+    def evaluate_rows(self, headers, rows):
+        """
+        Load the rows into a SQLite table and run each rule once over it, if UPLOAD_SETTINGS['SQL_SET_BASED']
+        is set
+
+        Rules that can't be run over the whole table (i.e. aggregates, window functions, references to
+        rowid, or errors) are left to `evaluate`, as are rows whose columns differ from the first row's.
+        """
+        if not UPLOAD_SETTINGS["SQL_SET_BASED"] or not isinstance(self.validator, list):
+            return {}
+
+        columns = list(rows[0].keys())
+        names = {column.lower() for column in columns}
+        if len(names) < len(columns) or names & {"rowid", "oid", "_rowid_"}:
+            return {}
+        cursor = self.db_cursor
+        try:
+            loaded = self.load_rows(cursor, columns, rows)
+        except (sqlite3.Error, OverflowError):
+            cursor.execute("DROP TABLE IF EXISTS upload_rows")
+            return {}
+
+        try:
+            results = {}
+            for (index, rule) in enumerate(self.validator):
+                code = rule["code"]
+                if not code:
+                    results[index] = [not self.INVERT_LOGIC] * len(rows)
+                elif (
+                    isinstance(code, str)
+                    and set(rule["columns"]).issubset(headers)
+                    and not ROW_DEPENDENT.search(code)
+                ):
+                    try:
+                        failing = self.failing_rows(cursor, code, len(loaded))
+                    except (sqlite3.Error, OverflowError):
+                        continue
+                    if failing is None:
+                        continue
+                    # the result `evaluate` would give: passing by default, and failing for `failing` rows
+                    results[index] = [None] * len(rows)
+                    for position in loaded:
+                        results[index][position] = not self.INVERT_LOGIC
+                    for rowid in failing:
+                        results[index][loaded[rowid - 1]] = self.INVERT_LOGIC
+            return results
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS upload_rows")
+
+    def load_rows(self, cursor, columns, rows):
+        """
+        Load rows into a new `upload_rows` table
+
+        Columns are named just as in the query `evaluate` runs for one row, and have no type affinity,
+        so values keep the types `cast_value` gave them.  Rows with other columns than `columns`
+        are left out.
+
+        Returns:
+        list of the positions of the rows loaded; the row with rowid n is at position loaded[n - 1]
+        """
+        aliases = ",".join(" NULL as {} ".format(column) for column in columns)
+        if ";" in aliases:
+            raise sqlite3.OperationalError("a column name can't be used in SQL")
+        cursor.execute("DROP TABLE IF EXISTS upload_rows")
+        cursor.execute(f"CREATE TABLE upload_rows AS SELECT * FROM ( select {aliases} ) WHERE 0")
+
+        keys = rows[0].keys()
+        loaded = [position for (position, row) in enumerate(rows) if row.keys() == keys]
+        cursor.executemany(
+            f"INSERT INTO upload_rows VALUES ({', '.join('?' * len(columns))})",
+            ([rows[position][column] for column in columns] for position in loaded),
+        )
+        return loaded
+
+    def failing_rows(self, cursor, rule, row_count):
+        """
+        Run a rule over `upload_rows`
+
+        Returns:
+        list of the rowids of rows that fail the rule, or None if the rule aggregates rows
+        """
+        # an aggregate gives one result for several rows
+        cursor.execute(f"SELECT count(*) FROM (SELECT ({rule}) FROM (SELECT * FROM upload_rows LIMIT 2))")
+        if cursor.fetchone()[0] != min(row_count, 2):
+            return None
+
+        condition = TRUTHY if self.INVERT_LOGIC else f"NOT ({TRUTHY})"
+        cursor.execute(
+            f"SELECT rowid FROM (SELECT rowid, ({rule}) AS result FROM upload_rows) WHERE {condition}"
+        )
+        return [rowid for (rowid,) in cursor.fetchall()]
 
 
 class SqlValidatorFailureConditions(SqlValidator):
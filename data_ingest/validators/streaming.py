@@ -0,0 +1,308 @@
+import io
+import json
+import os
+import tempfile
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from .validator import Validator, ValidatorOutput, UnsupportedContentTypeException, validators
+from .json import JsonschemaValidator
+from .rowwise import RowwiseValidator
+from .. import utils
+from ..ingest_settings import UPLOAD_SETTINGS
+
+
+def open_source(raw):
+    """A binary file object for a source's "source": bytes, a file path or a file object"""
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        return io.BytesIO(raw)
+    if isinstance(raw, str):
+        return open(raw, "rb")
+    return raw
+
+
+def prepared_csv(source):
+    """
+    A CSV source with its columns in order, as `ParsedTable.data` prepares it for `apply_validators_to` (see
+    `utils.reorder_csv`)
+
+    Bytes are prepared in memory.  A file path or file object is read one line at a time into a temporary
+    file, whose path takes its place; the caller removes that file once done.
+
+    Returns:
+    (the prepared source, path of the temporary file or None)
+    """
+    raw = source["source"]
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        return (utils.reorder_csv(dict(source, source=bytes(raw))), None)
+
+    infile = open_source(raw)
+    (handle, path) = tempfile.mkstemp(suffix=".csv")
+    try:
+        with open(handle, "w", encoding="utf-8", newline="\n") as output:
+            reader = io.TextIOWrapper(infile, encoding="utf-8", newline="\n")
+            utils.write_reordered_csv(reader, output)
+            # leave the file to its owner
+            reader.detach()
+    except BaseException:
+        os.remove(path)
+        raise
+    finally:
+        if infile is not raw:
+            infile.close()
+    return (dict(source, source=path), path)
+
+
+def read_json(source):
+    """
+    Read a JSON document, one element at a time if it is an array
+
+    The document is read incrementally with ijson (`pip install ReVal[ijson]`); without it, it is read whole.
+    Numbers with a fraction are floats, as `json.load` gives them.
+
+    Parameters:
+    source - dictionary whose "source" is bytes, a file path or a file object
+
+    Returns:
+    (True, iterator of the array's elements), or (False, the document) if it isn't an array
+    """
+    raw = source["source"]
+    infile = open_source(raw)
+    streaming = False
+    try:
+        if ijson is None:
+            document = json.load(infile)
+            return (True, iter(document)) if isinstance(document, list) else (False, document)
+
+        events = ijson.basic_parse(infile, use_float=True)
+        (event, value) = next(events)
+        if event != "start_array":
+            return (False, build_value(event, value, events))
+        streaming = True
+        return (True, array_elements(events, infile if infile is not raw else None))
+    finally:
+        if not streaming and infile is not raw:
+            infile.close()
+
+
+def array_elements(events, infile=None):
+    """The elements of an array whose start_array ijson event was read; closes `infile` once done"""
+    try:
+        for (event, value) in events:
+            if event == "end_array":
+                break
+            yield build_value(event, value, events)
+    finally:
+        if infile is not None:
+            infile.close()
+
+
+def build_value(event, value, events):
+    """Build the JSON value that starts with an ijson event, reading the rest of it from `events`"""
+    if event not in ("start_map", "start_array"):
+        return value
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    for (event, value) in events:
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+            if not depth:
+                break
+    return builder.value
+
+
+class StreamingValidatorOutput(ValidatorOutput):
+    """
+    A ValidatorOutput that hands out each row's result as soon as the row is validated, instead of
+    building the whole output.  It keeps only the errors of the current row, and running totals.
+    """
+
+    def __init__(self, headers=[], max_errors=None):
+        super().__init__(None, headers=headers, max_errors=max_errors)
+        self.valid_row_count = 0
+        self.invalid_row_count = 0
+
+    def finish_row(self, row_number, row_data, errors=()):
+        """
+        Return the result for a row, in the format of `create_rows`, and count it
+
+        Parameters:
+        row_number - the number of the row
+        row_data - a dictionary of key (field name) / value (data for that field) pairs
+        errors - errors from validators that were run before streaming started, already counted (see
+                 `add_errors`)
+
+        Returns:
+        row dictionary with row_number, errors and data
+        """
+        row_errors = list(errors) + [self.error_dict(error) for error in self.error_records.pop(row_number, [])]
+        if row_errors:
+            self.invalid_row_count += 1
+        else:
+            self.valid_row_count += 1
+        return {"row_number": row_number, "errors": row_errors, "data": row_data}
+
+    def get_output(self):
+        """
+        Generate the validation output from the running totals; it has no `rows`, since they were
+        already handed out by `finish_row`.  A truncated output is marked as `ValidatorOutput.truncate`
+        marks it.
+        """
+        table = {}
+        table["headers"] = self.headers
+        table["whole_table_errors"] = [self.error_dict(error) for error in self.whole_table_errors]
+        table["valid_row_count"] = self.valid_row_count
+        table["invalid_row_count"] = self.invalid_row_count
+
+        result = {}
+        result["tables"] = [table]
+        result["valid"] = (table["invalid_row_count"] == 0) and not table["whole_table_errors"]
+        if self.truncated:
+            table["whole_table_errors"].append(
+                self.create_error("Error", "max-errors", f"Validation stopped after {self.max_errors} errors", [])
+            )
+            result["valid"] = False
+            result["truncated"] = True
+        return result
+
+    def add_errors(self, row_errors, whole_table_errors, indexed):
+        """
+        Count the errors of a validator that was run before streaming started, as long as there is room for
+        them: whole table errors first, then row errors in row order, as `ValidatorOutput.truncate` keeps them
+
+        Parameters:
+        row_errors - dictionary of row number -> list of errors, in the format of `create_error`
+        whole_table_errors - list of errors
+        indexed - dictionary of row number -> list of errors to add the row errors that are kept to
+        """
+        for error in whole_table_errors:
+            self.add_whole_table_error(error["severity"], error["code"], self.stored_message(error), error["fields"])
+        for row_number in sorted(row_errors):
+            for error in row_errors[row_number]:
+                if self.count_error():
+                    indexed.setdefault(row_number, []).append(error)
+
+
+class ValidationStream:
+    """
+    Validate a source row by row, with memory use that doesn't grow with the size of the source.
+
+    Iterating over a ValidationStream reads one row at a time and yields its result (in the format of
+    `ValidatorOutput.create_rows`).  Once every row has been read, `get_output()` returns the headers,
+    whole table errors and row counts.
+
+    Row-wise validators are applied to each row as it is read.  Other validators are run first, and only
+    their errors are kept (see `Validator.errors_by_row`); their errors count first towards `max_errors`.
+    A CSV source is prepared as for `apply_validators_to` first (see `prepared_csv`), and its "source" can be
+    bytes, a file path or a file object:
+
+        stream = ValidationStream({"source": "big.csv", "format": "csv", "headers": 1}, "text/csv")
+        for row in stream:
+            ...
+        summary = stream.get_output()
+
+    A JSON source can only be checked by JsonschemaValidators.  A top-level array is read one element at a
+    time (see `read_json`), and each element is a row, numbered from 0 as `JsonschemaValidator.validate`
+    numbers them.  If a schema checks the array as a whole (see `JsonschemaValidator.element_schema`), or the
+    document isn't an array, it is read whole and validated with `validate` instead.
+    """
+
+    def __init__(self, source, content_type, validators, max_errors=None):
+        """
+        :param max_errors: stop checking rows after this many errors, as `apply_validators_to` does; defaults to
+          UPLOAD_SETTINGS['MAX_ERRORS'], 0 means no limit
+        """
+        if content_type not in ("text/csv", "application/json"):
+            raise UnsupportedContentTypeException(content_type, type(self).__name__)
+        if max_errors is None:
+            max_errors = UPLOAD_SETTINGS["MAX_ERRORS"]
+        self.source = source
+        self.content_type = content_type
+        self.validators = list(validators)
+        self.output = StreamingValidatorOutput(max_errors=max_errors)
+
+    def __iter__(self):
+        if self.content_type == "application/json":
+            yield from self.iter_json()
+            return
+
+        (source, prepared) = prepared_csv(self.source)
+        try:
+            yield from self.iter_csv(source)
+        finally:
+            if prepared:
+                os.remove(prepared)
+
+    def iter_csv(self, source):
+        output = self.output
+        rowwise = [v for v in self.validators if isinstance(v, RowwiseValidator)]
+        # validators that aren't row-wise are run first, so their errors count first, in their order
+        other_errors = {}
+        for validator in self.validators:
+            if validator not in rowwise:
+                output.add_errors(*validator.errors_by_row(source, self.content_type), other_errors)
+
+        # rows are cast once, for every validator that wants typed values
+        casts = utils.get_schema_casts() if any(validator.TYPED_ROWS for validator in rowwise) else None
+        received_columns = None
+        for (row_number, headers, row) in Validator.iter_rows(source):
+            if received_columns is None:
+                output.headers = headers
+                received_columns = set(headers)
+
+            # This is to skip the header row
+            if rowwise and row_number != UPLOAD_SETTINGS["OLD_HEADER_ROW"]:
+                if output.full:
+                    # rows are no longer checked, as validators stop once the output is full
+                    output.truncated = True
+                else:
+                    typed_row = utils.cast_row(row, casts) if casts is not None else None
+                    for validator in rowwise:
+                        for error in validator.row_errors(received_columns, row, typed_row=typed_row):
+                            output.add_row_error(row_number, *error)
+
+            yield output.finish_row(row_number, row, other_errors.pop(row_number, ()))
+
+    def iter_json(self):
+        for validator in self.validators:
+            if not isinstance(validator, JsonschemaValidator):
+                raise UnsupportedContentTypeException(self.content_type, type(validator).__name__)
+
+        (is_array, document) = read_json(self.source)
+        if is_array and all(validator.item_schema is not None for validator in self.validators):
+            for (index, element) in enumerate(document):
+                if self.output.full:
+                    self.output.truncated = True
+                else:
+                    for validator in self.validators:
+                        for error in validator.element_errors(index, element):
+                            self.output.add_row_error(index, *error)
+                yield self.output.finish_row(index, element)
+            return
+
+        document = list(document) if is_array else document
+        other_errors = {}
+        for validator in self.validators:
+            self.output.add_errors(*validator.errors_by_row(document, self.content_type), other_errors)
+        for (index, element) in enumerate(document if is_array else [document]):
+            yield self.output.finish_row(index, element, other_errors.pop(index, ()))
+
+    def get_output(self):
+        return self.output.get_output()
+
+
+def stream_validators_to(source, content_type, max_errors=None):
+    """
+    Streaming counterpart of `apply_validators_to`, using the validators in UPLOAD_SETTINGS['VALIDATORS']
+
+    :param max_errors: stop checking rows after this many errors; defaults to UPLOAD_SETTINGS['MAX_ERRORS']
+    :return: a ValidationStream
+    """
+    return ValidationStream(source, content_type, validators(), max_errors)
@@ -1,10 +1,15 @@
 import abc
+import hashlib
 import io
+import os
 import re
+import threading
 import json
 import yaml
 import requests
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict, defaultdict, namedtuple
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from django.core import exceptions
 from django.utils.module_loading import import_string
@@ -12,34 +17,348 @@ import tabulator
 
 from .. import utils
 from ..ingest_settings import UPLOAD_SETTINGS
+from .remote import remote_cache
+from .result_cache import result_cache, rules_fingerprint, settings_fingerprint, source_digest
 
 
 ###########################################
 #  Helper functions to manage validators
 ###########################################
+class ValidatorRegistry:
+    """
+    Process-wide cache of Validator instances.
+
+    Building a validator reads and parses its rule file (or downloads it), so instances are built once per
+    (validator class, rule file) and reused across uploads.  Local rule files are re-checked by mtime and size
+    on every lookup; when one changes, a new set of validators is built and swapped in as a whole, so a caller
+    never sees a mix of old and new rules.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sets = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @staticmethod
+    def signature(filename):
+        """
+        Return a value that changes whenever the rule file changes
+
+        :param filename: rule file name, URL or None
+        :return: (mtime, size) for local files, a content hash for URLs, None when there is nothing to check
+        """
+        if not filename:
+            return None
+        if Validator.url_pattern.search(filename):
+            return remote_cache.signature(filename)
+        try:
+            stat = os.stat(filename)
+        except (OSError, TypeError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def build(filename, validator_type):
+        return import_string(validator_type)(name=validator_type, filename=filename)
+
+    def validators(self, config):
+        """
+        Return the validators for a VALIDATORS setting, building them only when needed
+
+        :param config: dictionary of rule file name -> validator class path
+        :return: tuple of Validator instances, in the order of `config`
+        """
+        key = tuple(config.items())
+        signatures = tuple(self.signature(filename) for (filename, _) in key)
+
+        current = self._sets.get(key)
+        if current and current[0] == signatures:
+            with self._lock:
+                self.hits += 1
+            return current[1]
+
+        # Build outside of the lock; reuse any validator whose rule file did not change
+        built = []
+        for (idx, (filename, validator_type)) in enumerate(key):
+            if current and current[0][idx] == signatures[idx]:
+                built.append(current[1][idx])
+            else:
+                built.append(self.build(filename, validator_type))
+        built = tuple(built)
+
+        with self._lock:
+            if current:
+                self.reloads += 1
+            else:
+                self.misses += 1
+            self._sets[key] = (signatures, built)
+        return built
+
+    def get(self, filename, validator_type):
+        """Return a single cached validator"""
+        return self.validators({filename: validator_type})[0]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "reloads": self.reloads}
+
+    def clear(self):
+        with self._lock:
+            self._sets = {}
+
+
+registry = ValidatorRegistry()
+
+
 def validators():
     """
     Generates Validator instances based on settings.py:UPLOAD_SETTINGS['VALIDATORS']
 
+    Instances come from the process-wide `registry`, so rule files are only read when they change.
+
     :return: Iterator of Validator instances
 
     """
-    for (filename, validator_type) in UPLOAD_SETTINGS["VALIDATORS"].items():
-        validator = import_string(validator_type)(
-            name=validator_type, filename=filename
-        )
-        yield validator
+    yield from registry.validators(UPLOAD_SETTINGS["VALIDATORS"])
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def executor(mode, workers=None):
+    """
+    Return the shared thread or process pool used to run validators concurrently
+
+    :param mode: "thread" or "process"
+    :param workers: maximum number of workers, defaults to what `concurrent.futures` picks
+    :return: an Executor
+    """
+    key = (mode, workers)
+    with _executors_lock:
+        if key not in _executors:
+            if mode == "thread":
+                _executors[key] = ThreadPoolExecutor(max_workers=workers)
+            elif mode == "process":
+                _executors[key] = ProcessPoolExecutor(max_workers=workers)
+            else:
+                raise exceptions.ImproperlyConfigured(
+                    "DATA_INGEST['VALIDATION_EXECUTOR'] should be None, 'thread' or 'process', not {}".format(mode)
+                )
+        return _executors[key]
 
 
-def apply_validators_to(source, content_type):
+def validate_with_registry(config, index, table, max_errors=None, known_errors=None):
+    """
+    Run the validator at `index` of a VALIDATORS setting, in a worker process, whose registry builds the
+    validators of the setting as a set, as the parent process does
+    """
+    return registry.validators(config)[index].validate_table(
+        table, max_errors=max_errors, known_errors=known_errors
+    )
+
+
+def failed_validator_output(table, validator, error):
+    """
+    Validation output for a validator that raised an exception, so that it doesn't take down the others
+    """
+    try:
+        output = ValidatorOutput(table.rows, headers=table.headers)
+    except Exception:
+        output = ValidatorOutput([])
+    output.add_whole_table_error(
+        "Error", "validator-error", f"{validator}: {type(error).__name__}: {error}", []
+    )
+    return output.get_output()
 
-    overall_result = {}
-    for validator in validators():
-        validation_results = validator.validate(source, content_type)
-        overall_result = ValidatorOutput.combine(overall_result, validation_results)
+
+def apply_validators_concurrently(table, mode, workers=None, max_errors=None, row_results=None):
+    """
+    Run all validators at the same time in a thread or process pool
+
+    Outputs are combined in the order of UPLOAD_SETTINGS['VALIDATORS'], so the result is the same as
+    running them one after another.  A validator that fails is reported as a whole-table error instead
+    of failing the whole validation; unsupported content types are still raised.
+    """
+    pool = executor(mode, workers)
+    config = dict(UPLOAD_SETTINGS["VALIDATORS"])
+    # one set of validators for the whole validation, even if a rule file changes meanwhile
+    validator_set = registry.validators(config)
+    if mode == "process":
+        # parse here once, rather than in every worker
+        table.preload()
+
+    keys = [row_results.key(validator, table) if row_results else None for validator in validator_set]
+    futures = []
+    for (index, (validator, key)) in enumerate(zip(validator_set, keys)):
+        known_errors = row_results.known_errors(key, table) if key else None
+        if mode == "process":
+            # validators hold compiled rules, which can't be pickled; workers build their own
+            futures.append(pool.submit(validate_with_registry, config, index, table, max_errors, known_errors))
+        else:
+            futures.append(
+                pool.submit(validator.validate_table, table, max_errors=max_errors, known_errors=known_errors)
+            )
+
+    overall_result = MergedOutput()
+    for (validator_type, key, future) in zip(config.values(), keys, futures):
+        try:
+            validation_results = future.result()
+            if key:
+                row_results.record(key, table, validation_results)
+        except UnsupportedException:
+            raise
+        except Exception as e:
+            validation_results = failed_validator_output(table, validator_type, e)
+        overall_result.add(validation_results)
+    return overall_result.get_output()
+
+
+def apply_validators_to(source, content_type, max_errors=None, row_results=None):
+    """
+    Apply every validator in UPLOAD_SETTINGS['VALIDATORS'] to the source
+
+    :param source: raw source
+    :param content_type: content type of the source
+    :param max_errors: stop validating after this many errors; defaults to UPLOAD_SETTINGS['MAX_ERRORS'],
+      0 means no limit
+    :param row_results: (optional) a RowResults; results of row-wise validators for rows it already knows are
+      reused rather than evaluated again, and the results of this validation are recorded in it
+    :return: combined validation output, see `ValidatorOutput.get_output`
+    """
+    if max_errors is None:
+        max_errors = UPLOAD_SETTINGS["MAX_ERRORS"]
+
+    cache = result_cache()
+    digest = source_digest(source, content_type) if cache else None
+    if not digest:
+        return validate_source(source, content_type, max_errors, row_results)
+
+    fingerprint = rules_fingerprint(registry.validators(UPLOAD_SETTINGS["VALIDATORS"]))
+    key = hashlib.sha256(f"{digest}:{fingerprint}:{max_errors or 0}".encode()).hexdigest()
+    entry = cache.get(key)
+    if entry is None:
+        if row_results is None:
+            row_results = RowResults()
+        result = validate_source(source, content_type, max_errors, row_results)
+        entry = {"result": result, "row_hashes": row_results.recorded}
+        cache.set(key, entry)
+    elif row_results is not None:
+        row_results.recorded = entry["row_hashes"]
+    return entry["result"]
+
+
+def validate_source(source, content_type, max_errors, row_results=None, positions=None, row_numbers=None):
+    """
+    Apply every validator in UPLOAD_SETTINGS['VALIDATORS'] to the source, without looking up the result cache
+    (see `apply_validators_to`); rows are numbered by their `positions` and `row_numbers`, if given (see
+    `ParsedTable`)
+    """
+    table = ParsedTable(source, content_type, positions, row_numbers)
+    mode = UPLOAD_SETTINGS["VALIDATION_EXECUTOR"]
+    if mode and len(UPLOAD_SETTINGS["VALIDATORS"]) > 1:
+        overall_result = apply_validators_concurrently(
+            table, mode, UPLOAD_SETTINGS["VALIDATION_WORKERS"], max_errors, row_results
+        )
+    else:
+        merged = MergedOutput()
+        for validator in validators():
+            remaining = None
+            if max_errors:
+                remaining = max_errors - merged.error_total
+                if remaining <= 0:
+                    merged.truncated = True
+                    break
+            key = row_results.key(validator, table) if row_results else None
+            validation_results = validator.validate_table(
+                table,
+                max_errors=remaining,
+                known_errors=row_results.known_errors(key, table) if key else None,
+            )
+            if key:
+                row_results.record(key, table, validation_results)
+            merged.add(validation_results)
+        overall_result = merged.get_output()
+
+    if max_errors:
+        overall_result = ValidatorOutput.truncate(overall_result, max_errors)
     return overall_result
 
 
+class RowResults:
+    """
+    Errors found by row-independent validators (see `Validator.ROW_INDEPENDENT`), by the content of each row.
+
+    Stored with an upload (`Upload.row_hashes`), they let the validation of an upload that replaces it reuse
+    the errors of every row that did not change, as long as the rules did not change either.  The recorded
+    form is
+
+        {"rows": [hash of each row],
+         "validators": {hash of validator and its rules: {row hash: errors, for rows with errors}}}
+    """
+
+    def __init__(self, previous=None):
+        """
+        :param previous: (optional) the recorded form of an earlier validation, to reuse
+        """
+        previous = previous or {}
+        self.previous_rows = set(previous.get("rows", ()))
+        self.previous_errors = previous.get("validators", {})
+        self.recorded = {"rows": [], "validators": {}}
+        self.reused = 0
+        self._hashes = None
+
+    def row_hashes(self, table):
+        """Return an ordered dictionary of row number -> hash of the row's content"""
+        if self._hashes is None:
+            self._hashes = OrderedDict(
+                (rn, self.hash(list(row.values()))) for (rn, row) in table.rows.items()
+            )
+            self.recorded["rows"] = list(self._hashes.values())
+        return self._hashes
+
+    @staticmethod
+    def hash(value):
+        return hashlib.blake2b(json.dumps(value, default=str).encode(), digest_size=16).hexdigest()
+
+    def key(self, validator, table):
+        """
+        Identify a validator, its rules, the settings that change its results and the table's headers, or
+        return None if the validator's results can't be reused
+        """
+        if not validator.ROW_INDEPENDENT:
+            return None
+        return self.hash([validator.rules_digest, settings_fingerprint(), table.headers])
+
+    def known_errors(self, key, table):
+        """
+        Return a dictionary of row number -> list of errors, for the rows whose errors are already known
+        """
+        if key not in self.previous_errors:
+            return None
+        errors = self.previous_errors[key]
+        known = {
+            rn: errors.get(row_hash, [])
+            for (rn, row_hash) in self.row_hashes(table).items()
+            if row_hash in self.previous_rows
+        }
+        self.reused += len(known)
+        return known
+
+    def record(self, key, table, output):
+        """Record the errors of one validator"""
+        if not output or output.get("truncated"):
+            # rows after the truncation were not checked
+            return
+        hashes = self.row_hashes(table)
+        self.recorded["validators"][key] = {
+            hashes[row["row_number"]]: row["errors"]
+            for row in output["tables"][0]["rows"]
+            if row["errors"] and row["row_number"] in hashes
+        }
+
+
 ###########################################
 #  Exception
 ###########################################
@@ -58,9 +377,163 @@ class UnsupportedContentTypeException(UnsupportedException):
         self.validator_name = validator_name
 
 
+###########################################
+#  Parsed Table
+###########################################
+class ParsedTable:
+    """
+    A source parsed once and shared by every validator in `apply_validators_to`, instead of each validator
+    reordering and parsing the same bytes again.
+
+    Parsing happens on first use, so validators that work on the raw source (i.e. JsonschemaValidator) don't
+    pay for it.  Validators must treat what they get from it as read-only.
+    """
+
+    __slots__ = (
+        "_source", "_content_type", "_positions", "_numbers", "_data", "_headers", "_rows", "_row_numbers",
+        "_typed_rows",
+    )
+
+    def __init__(self, source, content_type, positions=None, row_numbers=None):
+        """
+        :param source: raw source, as given to `Validator.validate`
+        :param content_type: content type of the source, "text/csv" or "application/json"
+        :param positions: (optional) for a source cut down to some rows of a larger one (i.e. a preview), the
+          position of each of its rows in the larger source; rows are then numbered as they are there
+        :param row_numbers: (optional) with `positions`, the number of each row in the larger source, if it
+          can't be told from its position (i.e. CSV, where the header needn't be the first line)
+        """
+        self._source = source
+        self._content_type = content_type
+        self._positions = positions
+        self._numbers = row_numbers
+        self._row_numbers = None
+        self._data = None
+        self._headers = None
+        self._rows = None
+        self._typed_rows = None
+
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def content_type(self):
+        return self._content_type
+
+    @property
+    def positions(self):
+        return self._positions
+
+    @property
+    def data(self):
+        """The source with its columns in order (see `utils.get_ordered_headers`), ready for tabulator"""
+        if self._data is None:
+            if self._content_type == "application/json":
+                self._data = utils.to_tabular(self._source)
+            elif self._content_type == "text/csv":
+                self._data = utils.reorder_csv(self._source)
+            else:
+                raise UnsupportedContentTypeException(self._content_type, type(self).__name__)
+        return self._data
+
+    def _parse(self):
+        if self._rows is None:
+            (headers, rows) = Validator.rows_from_source(self.data)
+            if self._positions is not None and rows:
+                numbers = self._numbers
+                if numbers is None:
+                    # the first row is numbered just like the first row of the larger source
+                    first = next(iter(rows))
+                    numbers = [first + position for position in self._positions]
+                self._row_numbers = dict(zip(rows, numbers))
+                rows = OrderedDict((self._row_numbers.get(number, number), row) for (number, row) in rows.items())
+            (self._headers, self._rows) = (tuple(headers), rows)
+
+    def row_number(self, number):
+        """The number a row numbered `number` in the source is reported with; see `positions`"""
+        self._parse()
+        return self._row_numbers.get(number, number) if self._row_numbers else number
+
+    def preload(self):
+        """
+        Parse now, i.e. before the table is sent to other processes.  Errors are left for the validators
+        that need the parsed table to report.
+        """
+        try:
+            self._parse()
+        except Exception:
+            pass
+
+    @property
+    def headers(self):
+        """List of ordered header names"""
+        self._parse()
+        return list(self._headers)
+
+    @property
+    def rows(self):
+        """Ordered dictionary of row number -> ordered dictionary of header -> value"""
+        self._parse()
+        return self._rows
+
+    @property
+    def typed_rows(self):
+        """
+        Ordered dictionary of row number -> dictionary of header -> value cast by `utils.cast_value`, or
+        by the Table Schema's column types (see `utils.get_schema_casts`)
+
+        Built on first use, so every validator that wants typed values shares one copy, and casts each
+        value only once per upload.
+        """
+        if self._typed_rows is None:
+            rows = self.rows
+            typed = utils.cast_rows(list(rows.values()), utils.get_schema_casts())
+            self._typed_rows = OrderedDict(zip(rows.keys(), typed))
+        return self._typed_rows
+
+
 ###########################################
 #  Validator Output
 ###########################################
+# A message kept as its template and the values it uses, to be rendered only when it is read (see
+# UPLOAD_SETTINGS['LAZY_ERROR_MESSAGES'] and `ValidatorOutput.message`)
+DeferredMessage = namedtuple("DeferredMessage", ("template", "params"))
+
+
+class ErrorRecord(Mapping):
+    """
+    An error as `ValidatorOutput` keeps it until the output is generated.  It takes a fraction of the memory of
+    the dictionary from `create_error`, but reads (and compares) just like it.
+    """
+
+    __slots__ = ("severity", "code", "message", "fields")
+
+    def __init__(self, severity, code, message, fields):
+        self.severity = severity
+        self.code = code
+        self.message = message
+        self.fields = fields
+
+    def as_dict(self):
+        """The error as a dictionary, see `ValidatorOutput.create_error`"""
+        if type(self.message) is DeferredMessage:
+            return ValidatorOutput.create_error(self.severity, self.code, self.message, list(self.fields))
+        return {"severity": self.severity, "code": self.code, "message": self.message, "fields": list(self.fields)}
+
+    def __getitem__(self, key):
+        return self.as_dict()[key]
+
+    def __iter__(self):
+        return iter(self.as_dict())
+
+    def __len__(self):
+        return len(self.as_dict())
+
+    def __repr__(self):
+        return f"ErrorRecord({self.as_dict()!r})"
+
+
 class ValidatorOutput:
     """
     This class will be used to create a standard validator output.  Validator should make use of this class
@@ -68,7 +541,10 @@ class ValidatorOutput:
     than one validator at a time
     """
 
-    def __init__(self, rows_in_dict, headers=[]):
+    # `version` of outputs in the compact format; outputs without a version are in the `get_output` format
+    COMPACT_VERSION = 2
+
+    def __init__(self, rows_in_dict, headers=[], max_errors=None):
         """
         Init - Initiate objects to generate output later
 
@@ -77,33 +553,288 @@ class ValidatorOutput:
                        Each row dictionary consists of `row_number` which is integer, and `row_data` which is
                        an ordered dictionary the data (key - header/field name, value - data of that field)
         headers - (optional) a list of field names in the source (if relevant, i.e. tabular data)
+        max_errors - (optional) errors past this number are dropped, and the output is marked as truncated
         """
         self.rows_in_dict = rows_in_dict
         self.headers = headers
-        self.row_errors = defaultdict(list)
+        # row number -> errors; each error is an ErrorRecord, or a dictionary from `create_error` (see `row_errors`)
+        self.error_records = defaultdict(list)
         self.whole_table_errors = []
+        self.max_errors = max_errors
+        self.error_total = 0
+        self.truncated = False
+        # one copy of each code, message and list of fields, however many errors share it
+        self.interned = {}
+        # bitmap of the rows (by index) with errors, set by `create_rows`
+        self.invalid_rows = bytearray()
+
+    @property
+    def row_errors(self):
+        """Dictionary of row number -> list of errors, as dictionaries from `create_error`"""
+        error_dict = self.error_dict
+        return defaultdict(
+            list, ((rn, [error_dict(error) for error in errors]) for (rn, errors) in self.error_records.items())
+        )
 
-    def create_error(self, severity, code, message, fields):
+    @row_errors.setter
+    def row_errors(self, row_errors):
+        self.error_records = defaultdict(list, row_errors)
+
+    @property
+    def full(self):
+        """True once `max_errors` errors have been added; validators should stop checking then"""
+        return bool(self.max_errors) and self.error_total >= self.max_errors
+
+    def count_error(self):
+        """Count one more error; returns False if it should be dropped"""
+        if self.full:
+            self.truncated = True
+            return False
+        self.error_total += 1
+        return True
+
+    @staticmethod
+    def create_error(severity, code, message, fields):
         """
         Create standardized error dictionary
 
         Parameters:
         severity - severity of this error, right now "Error" or "Warning"
         code - error code
-        message - error message that describe what the error is
+        message - error message that describe what the error is, or a DeferredMessage
         fields - a list of all the field names that are associated with this error
 
         Returns:
-        Dictionary with the following items: severity, code, message, fields
+        Dictionary with the following items: severity, code, message, fields; for a DeferredMessage,
+        template and params take the place of message
         """
         error = {}
         error["severity"] = severity
         error["code"] = code
-        error["message"] = message
+        if isinstance(message, DeferredMessage):
+            error["template"] = message.template
+            error["params"] = message.params
+        else:
+            error["message"] = message
         error["fields"] = fields
 
         return error
 
+    @staticmethod
+    def message(error):
+        """The text of an error's message, rendered now if it was deferred"""
+        return ValidatorOutput.rendered_error(error)["message"]
+
+    @staticmethod
+    def rendered_error(error):
+        """
+        An error with its message rendered now if it was deferred, just as `RowwiseValidator.row_errors` would
+        have rendered it: a message that fails to render is an error of its own
+        """
+        if "message" in error:
+            return error
+        # imported here since the messages module imports this one
+        from .messages import message_template
+
+        try:
+            message = message_template(error["template"]).render(error["params"])
+        except Exception as e:
+            return ValidatorOutput.create_error("Error", error["code"], f"{type(e).__name__}: {e.args[0]}", [])
+        return ValidatorOutput.create_error(error["severity"], error["code"], message, error["fields"])
+
+    @staticmethod
+    def stored_message(error):
+        """An error's message as `create_error` takes it, without rendering a deferred message"""
+        if "message" in error:
+            return error["message"]
+        return DeferredMessage(error["template"], error["params"])
+
+    @staticmethod
+    def rendered(output):
+        """
+        A validation output with every deferred message rendered, as it would be without
+        UPLOAD_SETTINGS['LAZY_ERROR_MESSAGES'].  Outputs without deferred messages are returned as they are.
+
+        Parameters:
+        output - validation output that follows the spec in `get_output`
+
+        Returns:
+        A dictionary with the same specification as `get_output` output
+        """
+
+        def rendered_errors(errors):
+            return [ValidatorOutput.rendered_error(error) for error in errors]
+
+        if not output or not output.get("tables"):
+            return output
+        tables = []
+        for table in output["tables"]:
+            errors = table.get("whole_table_errors", [])
+            # the rows of a compact output (see `compact`) are listed only if they have errors
+            key = "invalid_rows" if "invalid_rows" in table else "rows"
+            rows = table.get(key, [])
+            if all("message" in error for error in errors) and all(
+                "message" in error for row in rows for error in row["errors"]
+            ):
+                tables.append(table)
+                continue
+            tables.append(
+                dict(
+                    table,
+                    whole_table_errors=rendered_errors(errors),
+                    **{key: [dict(row, errors=rendered_errors(row["errors"])) if row["errors"] else row
+                             for row in rows]},
+                )
+            )
+        if all(new is old for (new, old) in zip(tables, output["tables"])):
+            return output
+        return dict(output, tables=tables)
+
+    @staticmethod
+    def compact(output, omit_data=False):
+        """
+        A validation output in the compact format, to be stored (see UPLOAD_SETTINGS['COMPACT_VALIDATION_RESULTS'])
+
+        Each table keeps its headers, whole table errors and row counts, but instead of `rows` it has
+        - row_numbers - the row numbers, in order, as a list of [first, last] ranges
+        - data - each row's data, as a list of values in the order of the headers (or the row's data as it is,
+          if the table isn't `aligned`, i.e. the rows of a JSON Schema validated source); left out of aligned
+          tables with `omit_data`, to be read from the source again
+        - aligned - whether the data is a list of values for each row
+        - invalid_rows - a list of dictionaries with the row_number and errors of each row that has errors;
+          every other row is valid
+        and the output has `version` COMPACT_VERSION.  Read rows with `table_rows`, or use `expanded`.
+
+        Parameters:
+        output - validation output that follows the spec in `get_output`
+        omit_data - (optional) leave out row data that can be read from the source again
+
+        Returns:
+        A dictionary in the compact format; outputs already in it are returned as they are
+        """
+        if not output or output.get("version") == ValidatorOutput.COMPACT_VERSION or "tables" not in output:
+            return output
+        tables = []
+        for table in output["tables"]:
+            headers = list(table["headers"])
+            rows = table["rows"]
+            aligned = all(isinstance(row["data"], dict) and list(row["data"]) == headers for row in rows)
+            row_numbers = []
+            for row in rows:
+                if row_numbers and row_numbers[-1][1] + 1 == row["row_number"]:
+                    row_numbers[-1][1] = row["row_number"]
+                else:
+                    row_numbers.append([row["row_number"], row["row_number"]])
+            compact = {key: value for (key, value) in table.items() if key != "rows"}
+            compact["row_numbers"] = row_numbers
+            compact["aligned"] = aligned
+            if not (aligned and omit_data):
+                compact["data"] = [list(row["data"].values()) if aligned else row["data"] for row in rows]
+            compact["invalid_rows"] = [
+                {"row_number": row["row_number"], "errors": row["errors"]} for row in rows if row["errors"]
+            ]
+            tables.append(compact)
+        return dict(output, tables=tables, version=ValidatorOutput.COMPACT_VERSION)
+
+    @staticmethod
+    def has_row_data(output):
+        """False if row data was left out of a validation output (see `compact`), and must be read from the source"""
+        return not output or all("rows" in table or "data" in table for table in output.get("tables", []))
+
+    @staticmethod
+    def table_rows(table, rows=None):
+        """
+        The rows of one table of a validation output, in either the `get_output` or the `compact` format
+
+        Parameters:
+        table - a table of a validation output
+        rows - (optional) dictionary of row number -> row data, i.e. `ParsedTable.rows` of the source; required
+               if row data was left out of the output
+
+        Returns:
+        an iterator of row dictionaries, as in `create_rows`
+        """
+        if "rows" in table:
+            yield from table["rows"]
+            return
+        headers = table["headers"]
+        errors = {row["row_number"]: row["errors"] for row in table["invalid_rows"]}
+        if "data" in table:
+            data = iter(table["data"])
+        elif rows is None:
+            raise ValueError("row data was left out of these validation results; pass the rows of the source")
+        for (first, last) in table["row_numbers"]:
+            for row_number in range(first, last + 1):
+                if "data" not in table:
+                    row_data = rows[row_number]
+                elif table["aligned"]:
+                    row_data = OrderedDict(zip(headers, next(data)))
+                else:
+                    row_data = next(data)
+                yield {"row_number": row_number, "errors": errors.get(row_number, []), "data": row_data}
+
+    @staticmethod
+    def expanded(output, rows=None):
+        """
+        A validation output in the `get_output` format, whichever format it was stored in
+
+        Parameters:
+        output - validation output that follows the spec in `get_output` or `compact`
+        rows - (optional) dictionary of row number -> row data, as for `table_rows`
+
+        Returns:
+        A dictionary with the same specification as `get_output` output
+        """
+        if not output or output.get("version") != ValidatorOutput.COMPACT_VERSION:
+            return output
+        tables = []
+        for table in output["tables"]:
+            expanded = {
+                key: value
+                for (key, value) in table.items()
+                if key not in ("row_numbers", "aligned", "data", "invalid_rows")
+            }
+            expanded["rows"] = list(ValidatorOutput.table_rows(table, rows))
+            tables.append(expanded)
+        expanded_output = dict(output, tables=tables)
+        del expanded_output["version"]
+        return expanded_output
+
+    @staticmethod
+    def stored(output, omit_data=False):
+        """
+        A validation output as it should be saved to `Upload.validation_results`
+
+        Parameters:
+        output - validation output that follows the spec in `get_output`
+        omit_data - (optional) leave out row data, since it can be read from the upload again; only with
+                    UPLOAD_SETTINGS['OMIT_ROW_DATA']
+
+        Returns:
+        A dictionary with the same specification as `get_output` output, or the `compact` format
+        """
+        omit_data = omit_data and UPLOAD_SETTINGS["OMIT_ROW_DATA"]
+        if omit_data or UPLOAD_SETTINGS["COMPACT_VALIDATION_RESULTS"]:
+            return ValidatorOutput.compact(output, omit_data)
+        return output
+
+    def record(self, severity, code, message, fields):
+        """An ErrorRecord, sharing its code, message and fields with earlier records that have the same"""
+        interned = self.interned
+        code = interned.setdefault(code, code) if isinstance(code, str) else code
+        if isinstance(message, str):
+            message = interned.setdefault(message, message)
+        elif isinstance(message, DeferredMessage):
+            message = DeferredMessage(interned.setdefault(message.template, message.template), message.params)
+        fields = tuple(fields)
+        fields = interned.setdefault(fields, fields)
+        return ErrorRecord(severity, code, message, fields)
+
+    @staticmethod
+    def error_dict(error):
+        """An error as a dictionary from `create_error`, whether it was kept as one or as an ErrorRecord"""
+        return error.as_dict() if type(error) is ErrorRecord else error
+
     def add_row_error(self, row_number, severity, code, message, fields):
         """
         Add row specific error to the list of row errors
@@ -118,9 +849,9 @@ class ValidatorOutput:
         Returns:
         None
         """
-        error = self.create_error(severity, code, message, fields)
-
-        self.row_errors[row_number].append(error)
+        if not self.count_error():
+            return
+        self.error_records[row_number].append(self.record(severity, code, message, fields))
 
     def add_whole_table_error(self, severity, code, message, fields):
         """
@@ -135,9 +866,9 @@ class ValidatorOutput:
         Returns:
         None
         """
-        error = self.create_error(severity, code, message, fields)
-
-        self.whole_table_errors.append(error)
+        if not self.count_error():
+            return
+        self.whole_table_errors.append(self.record(severity, code, message, fields))
 
     def create_rows(self):
         """
@@ -155,6 +886,8 @@ class ValidatorOutput:
           - data - a dictionary of key (field name) / value (data for that field) pairs
         """
         result = []
+        row_errors = self.error_records
+        invalid_rows = bytearray()
 
         # Right now if we are using JsonschemaValidator, the rows_in_dict is a raw source and it will always be a list
         # of JSON object.  See validate method in JsonschemaValidator when instantiating the ValidatorOutput.  This is
@@ -169,14 +902,16 @@ class ValidatorOutput:
             else enumerate(self.rows_in_dict)
         )
         for (row_number, row_data) in rows:
-            result.append(
-                {
-                    "row_number": row_number,
-                    "errors": self.row_errors.get(row_number, []),
-                    "data": row_data,
-                }
-            )
+            errors = row_errors.get(row_number)
+            if errors:
+                errors = [error.as_dict() if type(error) is ErrorRecord else error for error in errors]
+                invalid_rows.append(1)
+            else:
+                errors = []
+                invalid_rows.append(0)
+            result.append({"row_number": row_number, "errors": errors, "data": row_data})
 
+        self.invalid_rows = invalid_rows
         return result
 
     def get_output(self):
@@ -196,15 +931,15 @@ class ValidatorOutput:
             - valid_row_count - an integer indicates the number of valid rows in the data
             - invalid_row_count - an integer indicates the number of invalid rows in the data
         - valid - boolean to indicates whether the data is valid or not
+        - truncated - only present (and True) if validation stopped at `max_errors`
         """
         table = {}
         table["headers"] = self.headers
-        table["whole_table_errors"] = self.whole_table_errors
-        table["rows"] = self.create_rows()
-        table["valid_row_count"] = [(not row["errors"]) for row in table["rows"]].count(
-            True
-        )
-        table["invalid_row_count"] = len(table["rows"]) - table["valid_row_count"]
+        table["whole_table_errors"] = [self.error_dict(error) for error in self.whole_table_errors]
+        with utils.gc_paused():
+            table["rows"] = self.create_rows()
+        table["invalid_row_count"] = self.invalid_rows.count(1)
+        table["valid_row_count"] = len(table["rows"]) - table["invalid_row_count"]
 
         # This needs to evaluate again at some point if this is even possible to run validator for more than
         # one table other than using GoodTables, the old code didn't allow more than one table, so should we
@@ -214,14 +949,73 @@ class ValidatorOutput:
         result["valid"] = (table["invalid_row_count"] == 0) and not table[
             "whole_table_errors"
         ]
+        if self.truncated:
+            result["truncated"] = True
 
         return result
 
+    @staticmethod
+    def error_count(output):
+        """Number of errors in a validation output"""
+        if not output:
+            return 0
+        table = output["tables"][0]
+        return len(table["whole_table_errors"]) + sum(len(row["errors"]) for row in table["rows"])
+
+    @staticmethod
+    def truncate(output, max_errors):
+        """
+        Drop errors past `max_errors` (in whole table, then row order) from a validation output.  A truncated
+        output is marked with `truncated` and a whole table error saying so.
+
+        Parameters:
+        output - validation output that follows the spec in `get_output`
+        max_errors - maximum number of errors to keep
+
+        Returns:
+        A dictionary with the same specification as `get_output` output
+        """
+        if not output:
+            return output
+        truncated = output.get("truncated", False) or ValidatorOutput.error_count(output) > max_errors
+        if not truncated:
+            return output
+
+        table = output["tables"][0]
+        remaining = max_errors
+        whole_table_errors = table["whole_table_errors"][:remaining]
+        remaining -= len(whole_table_errors)
+        rows = []
+        for row in table["rows"]:
+            errors = row["errors"][:remaining]
+            remaining -= len(errors)
+            rows.append(dict(row, errors=errors))
+
+        whole_table_errors.append(
+            ValidatorOutput.create_error(
+                "Error", "max-errors", f"Validation stopped after {max_errors} errors", []
+            )
+        )
+        valid_row_count = [(not row["errors"]) for row in rows].count(True)
+        return {
+            "tables": [
+                dict(
+                    table,
+                    whole_table_errors=whole_table_errors,
+                    rows=rows,
+                    valid_row_count=valid_row_count,
+                    invalid_row_count=len(rows) - valid_row_count,
+                )
+            ],
+            "valid": False,
+            "truncated": True,
+        }
+
     @staticmethod
     def combine(output1, output2):
         """
         Combine two validation outputs together.  This function expects validation outputs that follows
-        the specification indicated in `get_output`
+        the specification indicated in `get_output`; rows are matched by row number (see `MergedOutput`)
 
         Parameters:
         output1 - validation output that follows the spec in `get_output`
@@ -230,40 +1024,106 @@ class ValidatorOutput:
         Returns:
         A dictionary with the same specification as `get_output` output
         """
-        if not output1:
-            return output2
-        elif not output2:
-            return output1
+        return ValidatorOutput.merge([output1, output2])
 
-        table = {}
-        table["headers"] = output1["tables"][0]["headers"]
-        table["whole_table_errors"] = (
-            output1["tables"][0]["whole_table_errors"]
-            + output2["tables"][0]["whole_table_errors"]
-        )
-        table["rows"] = []
-
-        # Will assume output1 and output2 have the same number of rows, else you will get unexpected behaviors
-        for (row_number, row) in enumerate(output1["tables"][0]["rows"]):
-            table["rows"].append(
-                {
-                    "row_number": row["row_number"],
-                    "errors": row["errors"]
-                    + output2["tables"][0]["rows"][row_number]["errors"],
-                    "data": row["data"],
-                }
-            )
+    @staticmethod
+    def merge(outputs):
+        """
+        Combine any number of validation outputs together in one pass (see `MergedOutput`)
 
-        table["valid_row_count"] = [(not row["errors"]) for row in table["rows"]].count(
-            True
-        )
-        table["invalid_row_count"] = len(table["rows"]) - table["valid_row_count"]
+        Parameters:
+        outputs - iterable of validation outputs that follow the spec in `get_output`
+
+        Returns:
+        A dictionary with the same specification as `get_output` output
+        """
+        merged = MergedOutput()
+        for output in outputs:
+            merged.add(output)
+        return merged.get_output()
+
+
+class MergedOutput:
+    """
+    Validation outputs merged as they are added, matching rows by row number rather than by position, so that
+    each row is only looked up once per output.  Errors are kept in the order the outputs were added, and each
+    row's data is taken from the first output that has the row.
+    """
+
+    def __init__(self):
+        self.headers = None
+        self.whole_table_errors = []
+        # row number -> merged row
+        self.rows = {}
+        self.invalid_row_count = 0
+        self.error_total = 0
+        self.truncated = False
+        self.in_order = True
+
+    def add(self, output):
+        """
+        Merge one more validation output
+
+        Parameters:
+        output - validation output that follows the spec in `get_output`; empty outputs are skipped
+
+        Returns:
+        None
+        """
+        if not output:
+            return
+        if output.get("truncated"):
+            self.truncated = True
+        table = output["tables"][0]
+        if not self.headers:
+            self.headers = table["headers"]
+        self.whole_table_errors.extend(table["whole_table_errors"])
+        self.error_total += len(table["whole_table_errors"])
+
+        rows = self.rows
+        first = not rows
+        for row in table["rows"]:
+            row_number = row["row_number"]
+            errors = row["errors"]
+            merged = rows.get(row_number)
+            if merged is None:
+                # rows that only later outputs have go after the others until they are sorted
+                self.in_order = self.in_order and first
+                rows[row_number] = {"row_number": row_number, "errors": list(errors), "data": row["data"]}
+                if errors:
+                    self.invalid_row_count += 1
+            elif errors:
+                if not merged["errors"]:
+                    self.invalid_row_count += 1
+                merged["errors"].extend(errors)
+            self.error_total += len(errors)
+
+    def get_output(self):
+        """
+        Generate the merged validation output
+
+        Returns:
+        A dictionary with the same specification as `ValidatorOutput.get_output` output, or an empty dictionary
+        if no output was added
+        """
+        if self.headers is None:
+            return {}
+        rows = list(self.rows.values())
+        if not self.in_order:
+            rows.sort(key=lambda row: row["row_number"])
+
+        table = {}
+        table["headers"] = self.headers
+        table["whole_table_errors"] = self.whole_table_errors
+        table["rows"] = rows
+        table["valid_row_count"] = len(rows) - self.invalid_row_count
+        table["invalid_row_count"] = self.invalid_row_count
 
         result = {}
         result["tables"] = [table]
-        result["valid"] = (table["invalid_row_count"] == 0) and not table[
-            "whole_table_errors"
-        ]
+        result["valid"] = (self.invalid_row_count == 0) and not self.whole_table_errors
+        if self.truncated:
+            result["truncated"] = True
 
         return result
 
@@ -273,12 +1133,14 @@ class ValidatorOutput:
 # structure of `ValidatorOutput.get_output`.
 #
 # You may also toggle the SUPPORTS_HEADER_OVERRIDE (ignore any
-# configured headers) and INVERT_LOGIC (apply a `not` operation to the
-# results) boolean options.
+# configured headers), INVERT_LOGIC (apply a `not` operation to the
+# results) and ROW_INDEPENDENT (a row's errors depend only on that row,
+# and `validate_table` accepts `known_errors`) boolean options.
 class Validator(abc.ABC):
 
     SUPPORTS_HEADER_OVERRIDE = False
     INVERT_LOGIC = False
+    ROW_INDEPENDENT = False
 
     url_pattern = re.compile(r"^\w{3,5}://")
 
@@ -305,6 +1167,12 @@ class Validator(abc.ABC):
         self.name = name
         self.filename = filename
         self.validator = self.get_validator_contents()
+        # the registry builds a new validator when its rule file changes, so the rules are hashed once
+        self.rules_digest = hashlib.sha256(
+            json.dumps(
+                [type(self).__module__, type(self).__qualname__, self.validator], sort_keys=True, default=str
+            ).encode()
+        ).hexdigest()
 
         if isinstance(UPLOAD_SETTINGS["STREAM_ARGS"]["headers"], list) and (
             not self.SUPPORTS_HEADER_OVERRIDE
@@ -327,23 +1195,33 @@ class Validator(abc.ABC):
 
         if self.filename:
             if self.url_pattern.search(self.filename):
-                resp = requests.get(self.filename)
-                if resp.ok:
-                    if self.filename.endswith("yml") or self.filename.endswith(".yaml"):
-                        return yaml.safe_load(resp.text)
-                    return resp.json()
-                else:
+                try:
+                    text = remote_cache.fetch(self.filename)
+                except requests.RequestException as e:
                     raise exceptions.ImproperlyConfigured(
-                        "validator {} {} returned {}".format(
-                            self.name, self.filename, resp.status
-                        )
+                        "validator {} {} returned {}".format(self.name, self.filename, e)
                     )
+                if self.filename.endswith("yml") or self.filename.endswith(".yaml"):
+                    return yaml.safe_load(text)
+                return json.loads(text)
             else:
                 return self.load_file()
         return self.filename
 
     @staticmethod
-    def rows_from_source(raw_source):
+    def iter_rows(raw_source):
+        """
+        Read rows from a source one at a time
+
+        The source's "source" can be bytes, a file path or a file-like object; paths and files are read
+        lazily, so memory use doesn't grow with the size of the file.
+
+        Parameters:
+        raw_source - dictionary of tabulator.Stream arguments, or tabular data from `utils.to_tabular`
+
+        Returns:
+        an iterator of (row number, ordered header names, ordered dictionary of header -> value)
+        """
         source = raw_source.copy()
         try:
             f_source = io.BytesIO(source["source"])
@@ -354,29 +1232,75 @@ class Validator(abc.ABC):
         if byteslike:
             source["source"] = f_source
             stream = tabulator.Stream(**source, encoding="utf-8")
+        elif isinstance(source, dict) and (
+            isinstance(source.get("source"), str) or hasattr(source.get("source"), "read")
+        ):
+            stream = tabulator.Stream(**source, encoding="utf-8")
         else:
             stream = tabulator.Stream(source, headers=1, encoding="utf-8")
 
         stream.open()
 
-        # This will get the first row
+        # Ordered headers are worked out from the first row, so the source is only read once
+        o_headers = None
         try:
-            hs = next(stream.iter(extended=True))[1]
-        # nothing in the stream
-        except StopIteration:
-            hs = []
-        # Reset the pointer to the beginning
-        stream.reset()
-        o_headers = utils.get_ordered_headers(hs)
+            for (row_num, headers, vals) in stream.iter(extended=True):
+                if o_headers is None:
+                    o_headers = utils.get_ordered_headers(headers)
+                data = dict(zip(headers, vals))
+                yield (row_num, o_headers, OrderedDict((h, data.get(h, "")) for h in o_headers))
+        finally:
+            stream.close()
 
+    @staticmethod
+    def rows_from_source(raw_source):
+        o_headers = None
         result = OrderedDict()
-        for (row_num, headers, vals) in stream.iter(extended=True):
-            data = dict(zip(headers, vals))
-            o_data = OrderedDict((h, data.get(h, "")) for h in o_headers)
+        for (row_num, o_headers, o_data) in Validator.iter_rows(raw_source):
             result[row_num] = o_data
 
+        # nothing in the stream
+        if o_headers is None:
+            o_headers = utils.get_ordered_headers([])
+
         return (o_headers, result)
 
+    def errors_by_row(self, source, content_type):
+        """
+        Validate the source and index the errors by row, for streamed validation
+
+        This default implementation holds the whole validation output in memory while indexing it;
+        validators that can do better (i.e. GoodtablesValidator) override it.
+
+        Parameters:
+        source - raw source
+        content_type - content type of the source
+
+        Returns:
+        (dictionary of row number -> list of errors, list of whole table errors)
+        """
+        table = self.validate(source, content_type)["tables"][0]
+        row_errors = {row["row_number"]: row["errors"] for row in table["rows"] if row["errors"]}
+        return (row_errors, table["whole_table_errors"])
+
+    def validate_table(self, table, max_errors=None, known_errors=None):
+        """
+        Validate a `ParsedTable` and return a standard validation output
+
+        Validators that can work from an already parsed table should override this; by default the
+        table's raw source is handed to `validate`.
+
+        Parameters:
+        table - a ParsedTable
+        max_errors - (optional) validators should stop once they found this many errors
+        known_errors - (optional) dictionary of row number -> errors for rows that need not be evaluated
+                       again; only passed to ROW_INDEPENDENT validators
+
+        Returns:
+        A dictionary object that follows the specification of `ValidatorOutput.get_output`
+        """
+        return self.validate(table.source, table.content_type)
+
     @abc.abstractmethod
     def validate(self, source, content_type):
         """
@@ -7,7 +7,7 @@ from rest_framework.exceptions import APIException
 from rest_framework import status
 
 from .api_views import UploadViewSet
-from . import ingest_settings
+from . import ingest_settings, ingestors
 
 UploadModel = ingest_settings.upload_model_class
 
@@ -88,8 +88,16 @@ def delete_upload(request, upload_id):
 def validate(instance):
 
     ingestor = ingest_settings.ingestor_class(instance)
-    instance.validation_results = ingestor.validate()
+    if ingest_settings.UPLOAD_SETTINGS["PREVIEW"]:
+        instance.validation_results = ingestor.stored_results(ingestor.validate_preview())
+    else:
+        instance.validation_results = ingestor.stored_results(ingestor.validate())
     instance.save()
+    if "preview" in instance.validation_results:
+        source = ingestor.source()
+        ingestors.continue_validation(
+            instance, source, ingestor.content_type(source), ingestor.previous_row_hashes()
+        )
     if instance.validation_results["valid"]:
         return redirect("confirm-upload", instance.id)
     else:
@@ -136,21 +144,28 @@ def review_errors(request, upload_id):
     upload = UploadModel.objects.get(pk=upload_id)
     if upload.validation_results["valid"]:
         return redirect("confirm-upload", upload_id)
-    data = upload.validation_results["tables"][0]
+    results = ingest_settings.ingestor_class(upload).results()
+    data = ingestors.ValidatorOutput.rendered(results)["tables"][0]
     data["file_metadata"] = upload.file_metadata_as_params()
     data["upload_id"] = upload_id
+    data["preview"] = upload.validation_results.get("preview")
     return render(request, "data_ingest/review-errors.html", data)
 
 
 def confirm_upload(request, upload_id):
     upload = UploadModel.objects.get(pk=upload_id)
-    data = upload.validation_results["tables"][0]
+    data = ingest_settings.ingestor_class(upload).results()["tables"][0]
     data["file_metadata"] = upload.file_metadata_as_params()
     data["upload_id"] = upload.id
+    data["preview"] = upload.validation_results.get("preview")
     return render(request, "data_ingest/confirm-upload.html", data)
 
 
 def stage_upload(request, upload_id):
+    upload = UploadModel.objects.get(pk=upload_id)
+    if "preview" in (upload.validation_results or {}):
+        # not every row has been checked yet
+        return redirect("confirm-upload", upload_id)
     Api.call(request, "stage", pk=upload_id)
     return redirect("index")
 
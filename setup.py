@@ -39,9 +39,14 @@ setup(
         'djangorestframework',
         'dj-database-url',
         'goodtables',
-        'json_logic_qubit',
+        # jsonlogic_compiler and jsonlogic_vector reuse json_logic's internal operations, where they are as expected
+        'json_logic_qubit>=0.9.1,<0.10',
         'psycopg2-binary',
         'pyyaml',
         'requests',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+        'ijson': ['ijson'],
+    },
 )